@@ -1,59 +1,346 @@
-from typing import List, Dict, Optional
-from db.config import EMBEDDING_MODEL, OPENAI_API_KEY, BASE_URL
-from openai import OpenAI
+from typing import List, Dict, Optional, Union
+
+import numpy as np
+from db.config import (EMBEDDING_MODEL, OPENAI_API_KEY, BASE_URL, EMBEDDING_DIMENSIONS,
+                       EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_BACKEND,
+                       VECTOR_BACKEND, VECTOR_DTYPE, VECTOR_RERANK, QUANTIZER_TRAIN_SIZE,
+                       IVF_NPROBE, IVF_LISTS, EMBEDDING_CHUNK_TOKENS, CHUNK_POOLING, CHUNK_OVERSAMPLE,
+                       VECTOR_STORE_DOCUMENTS)
+from db.chunking import chunk_records, pool_chunk_hits, stale_chunk_filters
+from db.collection_pointer import CollectionPointer, CollectionVersions, collection_version_of
+from db.embedding_backends import EmbeddingBackend, OpenAIEmbeddingBackend, create_embedding_backend
+from db.embedding_cache import EmbeddingCache
+import os
+import re
+import shutil
 import uuid
-import chromadb
-import chromadb.utils.embedding_functions as embedding_functions
+from pathlib import PurePosixPath
+
+# 版本化集合名的后缀（见 db.collection_pointer）
+_VERSION_SUFFIX_RE = re.compile(r"__v\d+$")
+
+# 向量ID命名空间，保证同一符号在多次索引中得到相同的ID
+VECTOR_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "code-search/symbol-vector")
+
+
+def make_vector_id(project: str, relative_path: str, symbol_name: str) -> str:
+    """
+    由 (项目, 相对路径, 限定符号名) 生成确定性的向量ID
+    
+    Args:
+        project: 项目标识
+        relative_path: 文件相对项目根目录的路径（posix格式）
+        symbol_name: 限定符号名，如 ClassName.method
+        
+    Returns:
+        UUID字符串
+    """
+    return str(uuid.uuid5(VECTOR_ID_NAMESPACE, f"{project}\0{relative_path}\0{symbol_name}"))
+
+
+# 文件扩展名 -> 语言，写入向量元数据的 language 字段
+LANGUAGE_BY_SUFFIX = {
+    ".py": "python",
+    ".pyi": "python",
+}
+
+
+def make_vector_metadata(
+    project: str,
+    relative_path: str,
+    symbol_type: Optional[str] = None,
+    parent_class: Optional[str] = None
+) -> Dict:
+    """
+    构建向量元数据，供查询时在向量检索内部按项目/路径/类型过滤
+
+    元数据值只能是标量（ChromaDB 限制），路径前缀过滤通过逐级目录字段实现：
+    "a/b/c.py" 写入 dir_1="a"、dir_2="a/b"，查询前缀 "a/b" 即等值匹配 dir_2。
+
+    Args:
+        project: 项目标识
+        relative_path: 文件相对项目根目录的路径（posix格式）
+        symbol_type: 可选，符号类型，如 function/class/method
+        parent_class: 可选，成员所属的类（限定名）
+
+    Returns:
+        元数据字典
+    """
+    path = PurePosixPath(relative_path)
+    metadata = {
+        "project": project,
+        "relative_path": relative_path,
+        "language": LANGUAGE_BY_SUFFIX.get(path.suffix.lower(), "unknown"),
+    }
+    if symbol_type:
+        metadata["symbol_type"] = symbol_type
+    if parent_class:
+        metadata["parent_class"] = parent_class
+    directories = path.parts[:-1]
+    for depth in range(1, len(directories) + 1):
+        metadata[f"dir_{depth}"] = "/".join(directories[:depth])
+    return metadata
+
+
+def build_where(
+    where: Optional[Dict] = None,
+    project: Optional[str] = None,
+    path_prefix: Optional[str] = None,
+    symbol_type: Optional[str] = None,
+    parent_class: Optional[str] = None,
+    language: Optional[str] = None
+) -> Optional[Dict]:
+    """
+    将过滤参数合并为 ChromaDB 风格的 where 条件（各条件之间为 AND）
+
+    Args:
+        where: 可选，额外的原始过滤条件
+        project: 项目标识
+        path_prefix: 目录前缀（posix格式，如 "src/db"），也可以是单个文件的相对路径
+        symbol_type: 符号类型，也可以是类型列表
+        parent_class: 所属类
+        language: 语言
+
+    Returns:
+        where 条件，没有任何过滤时为 None
+    """
+    conditions = [where] if where else []
+    for key, value in (("project", project), ("parent_class", parent_class), ("language", language)):
+        if value:
+            conditions.append({key: value})
+    if symbol_type:
+        if isinstance(symbol_type, (list, tuple, set)):
+            conditions.append({"symbol_type": {"$in": list(symbol_type)}})
+        else:
+            conditions.append({"symbol_type": symbol_type})
+    if path_prefix:
+        prefix = PurePosixPath(path_prefix.replace("\\", "/").strip("/")).as_posix()
+        if prefix not in ("", "."):
+            conditions.append({"$or": [
+                {f"dir_{len(PurePosixPath(prefix).parts)}": prefix},
+                {"relative_path": prefix}
+            ]})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
 
 
 class SymbolVectorStore:
     """
-    符号向量存储类，封装ChromaDB操作
+    符号向量存储类，封装向量集合操作
+    
+    向量集合由 vector_backend 决定："chroma" 使用 ChromaDB，
+    "numpy" 使用内存映射的精确检索索引 NumpyVectorIndex（接口与 ChromaDB 集合相同），
+    "int8"/"pq" 使用量化编码检索并从全精度向量重排的 QuantizedVectorIndex，
+    "ivf" 使用按 k-means 聚类、只探测 nprobe 个簇的 IVFVectorIndex。
     """
     
     def __init__(
         self, 
-        collection_name: str = "symbol_docs",
+        collection_name: Optional[str] = None,
         persist_path: str = "symbol_store.db",
         embedding_model: str = EMBEDDING_MODEL,
         api_key: str = OPENAI_API_KEY,
-        base_url: str = BASE_URL
+        base_url: str = BASE_URL,
+        dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        embedding_backend: Optional[EmbeddingBackend] = None,
+        vector_backend: str = VECTOR_BACKEND,
+        store_documents: bool = VECTOR_STORE_DOCUMENTS
     ):
         """
         初始化向量存储
         
         Args:
-            collection_name: 集合名称
+            collection_name: 集合名称，默认 OpenAI 兼容后端为 "symbol_docs"，
+                其他后端为 "symbol_docs_<后端名>"（不同后端的向量维度不兼容）；
+                未指定时打开该基础名的活动版本（见 create_staging / promote）
             persist_path: 持久化存储路径
-            embedding_model: 嵌入模型名称
-            api_key: OpenAI API密钥
-            base_url: API基础URL
-        """
-        self.embedding_model = embedding_model
-        self.api_key = api_key
-        self.base_url = base_url
-        
-        # 初始化OpenAI客户端
-        self.openai_client = OpenAI(api_key=api_key, base_url=base_url)
-        
-        # 初始化嵌入函数
-        self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-            api_key=api_key,
-            model_name=embedding_model,
-            api_base=base_url
-        )
+            embedding_model: 嵌入模型名称（OpenAI 后端）
+            api_key: OpenAI API密钥（OpenAI 后端）
+            base_url: API基础URL（OpenAI 后端）
+            dimensions: 可选，嵌入向量维度（OpenAI 后端，模型支持时生效）
+            embedding_cache: 可选，嵌入缓存；未提供且配置了 EMBEDDING_CACHE_PATH 时自动创建
+            embedding_backend: 可选，嵌入后端；未提供时按 EMBEDDING_BACKEND 配置创建
+            vector_backend: 向量集合后端，"chroma"、"numpy"、"int8"、"pq" 或 "ivf"
+            store_documents: 是否在向量集合中保存描述文本；为 False 时只保存ID、向量和元数据，
+                查询结果的 summary 为 None，需按向量ID从 SQLite 回表（文档已保存在 doc_text 中）
+        """
+        # 初始化嵌入后端
+        if embedding_backend is None:
+            if EMBEDDING_BACKEND == "openai":
+                embedding_backend = OpenAIEmbeddingBackend(embedding_model, api_key, base_url, dimensions)
+            else:
+                embedding_backend = create_embedding_backend(EMBEDDING_BACKEND)
+        self.embedding_backend = embedding_backend
+        self.embedding_model = embedding_backend.name
+        self.dimensions = embedding_backend.dimensions
+        
+        # 初始化嵌入缓存（本地后端计算很快，不使用缓存）
+        if embedding_cache is None and EMBEDDING_CACHE_PATH and embedding_backend.cacheable:
+            embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES)
+        self.embedding_cache = embedding_cache
+        
+        # 本实例写入集合的次数
+        self.writes = 0
+        
+        self.persist_path = persist_path
+        self.vector_backend = vector_backend
+        self.store_documents = store_documents
+        self.pointer = CollectionPointer(persist_path)
+        # 各集合的内容版本（所有进程的写入都会更新），查询缓存据此失效
+        self.versions = CollectionVersions(persist_path)
+        # 按活动指针打开的实例在访问时跟随其他进程的切换
+        self.follow_pointer = collection_name is None
+        
+        if collection_name is None:
+            base_collection_name = "symbol_docs"
+            if not embedding_backend.default_collection:
+                base_collection_name = f"symbol_docs_{embedding_backend.name}"
+            # 按活动指针打开当前版本（蓝绿重建后为 "<基础名>__v<版本>"）
+            collection_name = self.pointer.active(base_collection_name)
+        else:
+            base_collection_name = _VERSION_SUFFIX_RE.sub("", collection_name)
+        self.base_collection_name = base_collection_name
+        self.collection_name = collection_name
         
-        # 初始化ChromaDB客户端
-        self.chroma_client = chromadb.PersistentClient(path=persist_path)
+        self.chroma_client = None
+        self.collection = self._open_collection(collection_name)
+    
+    def _open_collection(self, collection_name: str):
+        """按向量后端打开（或创建）集合"""
+        vector_backend = self.vector_backend
+        persist_path = self.persist_path
+        if vector_backend == "numpy":
+            from db.numpy_index import NumpyVectorIndex
+            return NumpyVectorIndex(os.path.join(persist_path, collection_name), dtype=VECTOR_DTYPE)
+        elif vector_backend in ("int8", "pq"):
+            from db.quantization import QuantizedVectorIndex
+            return QuantizedVectorIndex(
+                os.path.join(persist_path, collection_name),
+                quantizer=vector_backend,
+                rerank=VECTOR_RERANK,
+                train_size=QUANTIZER_TRAIN_SIZE,
+                dtype=VECTOR_DTYPE
+            )
+        elif vector_backend == "ivf":
+            from db.ivf_index import IVFVectorIndex
+            return IVFVectorIndex(
+                os.path.join(persist_path, collection_name),
+                nprobe=IVF_NPROBE,
+                n_lists=IVF_LISTS,
+                train_size=QUANTIZER_TRAIN_SIZE,
+                dtype=VECTOR_DTYPE
+            )
+        elif vector_backend == "chroma":
+            import chromadb
+            
+            # 初始化ChromaDB客户端
+            if self.chroma_client is None:
+                self.chroma_client = chromadb.PersistentClient(path=persist_path)
+            
+            # 获取或创建集合（嵌入向量总是由嵌入后端显式计算后传入）
+            return self.chroma_client.get_or_create_collection(
+                name=collection_name,
+                embedding_function=None,
+                metadata={"hnsw:space": "cosine"}
+            )
+        else:
+            raise ValueError(f"未知的向量后端: {vector_backend}")
+    
+    def _drop_collection(self, collection_name: str, collection=None) -> None:
+        """删除集合（collection 为已打开的本地索引时先关闭）"""
+        if self.vector_backend == "chroma":
+            try:
+                self.chroma_client.delete_collection(collection_name)
+            except Exception:
+                pass  # 集合不存在（不同 ChromaDB 版本抛出的异常类型不同）
+            return
+        if collection is not None:
+            collection.close()
+        shutil.rmtree(os.path.join(self.persist_path, collection_name), ignore_errors=True)
+    
+    def create_staging(self) -> "SymbolVectorStore":
+        """
+        创建用于蓝绿重建的下一版本集合（清除上次未完成重建的残留）
         
-        # 获取或创建集合
-        self.collection = self.chroma_client.get_or_create_collection(
-            name=collection_name,
-            embedding_function=self.embedding_function,
-            metadata={"hnsw:space": "cosine"}
+        返回的存储与本实例共用嵌入后端和嵌入缓存，写入期间本实例继续查询当前集合。
+        
+        Returns:
+            写入新版本集合的向量存储，填充完成后传给 promote
+        """
+        staging_name = self.pointer.next_name(self.base_collection_name)
+        if self.vector_backend == "chroma" and self.chroma_client is None:
+            import chromadb
+            self.chroma_client = chromadb.PersistentClient(path=self.persist_path)
+        self._drop_collection(staging_name)
+        return SymbolVectorStore(
+            collection_name=staging_name,
+            persist_path=self.persist_path,
+            embedding_cache=self.embedding_cache,
+            embedding_backend=self.embedding_backend,
+            vector_backend=self.vector_backend,
+            store_documents=self.store_documents
         )
     
-    def embed_text(self, text: str) -> List[float]:
+    def promote(self, staging: "SymbolVectorStore", expected_count: Optional[int] = None) -> None:
+        """
+        校验新版本集合并原子地切换为活动集合
+        
+        切换前的查询使用旧集合，切换后的查询使用新集合，不存在半填充的中间状态。
+        旧集合保留到下一次切换（其他进程可能仍打开着它，会在下次访问时跟随指针），
+        届时删除再上一代的集合。
+        
+        Args:
+            staging: create_staging 返回并已填充完成的向量存储
+            expected_count: 可选，期望的符号数（如 SQLite 中带向量ID的符号数），不一致时不切换
+            
+        Raises:
+            ValueError: 符号数校验失败
+        """
+        if expected_count is not None:
+            actual = staging.get_symbol_count()
+            if actual != expected_count:
+                raise ValueError(f"新集合 {staging.collection_name} 符号数 {actual} 与期望的 {expected_count} 不一致")
+        self.pointer.flip(self.base_collection_name, staging.collection_name)
+        old_name, old_collection = self.collection_name, self.collection
+        self.collection_name, self.collection = staging.collection_name, staging.collection
+        self.writes += 1
+        if old_name != self.collection_name and self.vector_backend != "chroma":
+            old_collection.close()
+        previous_version = collection_version_of(old_name) - 1
+        if previous_version >= 0:
+            previous_name = (f"{self.base_collection_name}__v{previous_version}" if previous_version
+                             else self.base_collection_name)
+            if previous_name != self.collection_name:
+                self._drop_collection(previous_name)
+    
+    def discard_staging(self, staging: "SymbolVectorStore") -> None:
+        """
+        丢弃 create_staging 返回、未切换的新版本集合（重建取消或失败时）
+        
+        Args:
+            staging: create_staging 返回的向量存储
+        """
+        if staging.collection_name == self.collection_name:
+            raise ValueError(f"集合 {staging.collection_name} 已是活动集合")
+        self._drop_collection(staging.collection_name, staging.collection)
+    
+    def _follow_pointer(self) -> None:
+        """其他进程切换了活动集合时改为打开新集合"""
+        if not self.follow_pointer:
+            return
+        active = self.pointer.active(self.base_collection_name)
+        if active == self.collection_name:
+            return
+        old_collection = self.collection
+        self.collection = self._open_collection(active)
+        self.collection_name = active
+        self.writes += 1
+        if self.vector_backend != "chroma":
+            old_collection.close()
+    
+    def embed_text(self, text: str) -> np.ndarray:
         """
         生成文本的嵌入向量
         
@@ -61,33 +348,94 @@ class SymbolVectorStore:
             text: 要嵌入的文本
             
         Returns:
-            文本的嵌入向量
+            文本的嵌入向量（float32 一维数组）
+        """
+        return self.embed_texts([text])[0]
+    
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         """
-        response = self.openai_client.embeddings.create(
-            model=self.embedding_model, 
-            input=text
+        批量生成文本的嵌入向量
+        
+        先查询嵌入缓存，只有未命中的文本才调用一次嵌入后端，结果写回缓存。
+        缓存命中和新嵌入的向量直接写入预分配的 float32 矩阵，不经过逐元素的 Python 浮点对象。
+        
+        Args:
+            texts: 要嵌入的文本列表
+            
+        Returns:
+            形状为 (len(texts), 维度) 的 float32 数组，行顺序与输入一致
+        """
+        if not texts:
+            return np.empty((0, self.dimensions or 0), dtype=np.float32)
+        cached = {}
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get_many(texts, self.embedding_model, self.dimensions)
+        missing = [i for i in range(len(texts)) if i not in cached]
+        vectors = None
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            vectors = self._request_embeddings(missing_texts)
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(missing_texts, vectors, self.embedding_model, self.dimensions)
+            if not cached:
+                return vectors
+        dim = vectors.shape[1] if vectors is not None else len(next(iter(cached.values())))
+        matrix = np.empty((len(texts), dim), dtype=np.float32)
+        for i, vector in cached.items():
+            matrix[i] = vector
+        if vectors is not None:
+            matrix[missing] = vectors
+        return matrix
+    
+    def _request_embeddings(self, texts: List[str]) -> np.ndarray:
+        """调用嵌入后端（一次请求）"""
+        return self.embedding_backend.embed_array(texts)
+    
+    def upsert_embeddings(
+        self,
+        doc_ids: List[str],
+        embeddings: Union[np.ndarray, List[List[float]]],
+        documents: List[str],
+        metadatas: List[Dict]
+    ) -> None:
+        """
+        写入已计算好的嵌入向量（一次 collection.upsert，ID已存在时覆盖）
+        
+        Args:
+            doc_ids: 文档ID列表
+            embeddings: 嵌入向量矩阵（或向量列表）
+            documents: 文档文本列表（store_documents 为 False 时不写入集合）
+            metadatas: 元数据列表
+        """
+        self.collection.upsert(
+            ids=doc_ids,
+            embeddings=embeddings,
+            documents=documents if self.store_documents else None,
+            metadatas=metadatas
         )
-        return response.data[0].embedding
+        self._written()
     
-    def insert_symbol(self, symbol: str, summary: str) -> str:
+    def insert_symbol(
+        self,
+        symbol: str,
+        summary: str,
+        doc_id: Optional[str] = None,
+        metadata: Optional[Dict] = None
+    ) -> str:
         """
-        插入符号和摘要到向量存储
+        插入符号和摘要到向量存储（ID已存在时覆盖）
         
         Args:
             symbol: 符号名称
             summary: 符号摘要
+            doc_id: 可选，文档ID，建议使用 make_vector_id 生成；未提供时随机生成
+            metadata: 可选，附加元数据（见 make_vector_metadata）
             
         Returns:
             插入的文档ID
         """
-        doc_id = str(uuid.uuid4())
-        
-        self.collection.add(
-            ids=[doc_id],
-            documents=[summary],
-            metadatas=[{"symbol": symbol}]
-        )
-        
+        doc_id = doc_id or str(uuid.uuid4())
+        self._upsert_chunked([(doc_id, symbol, summary, metadata)])
         return doc_id
     
     def batch_insert_symbols(self, symbol_summary_pairs: List[Dict[str, str]]) -> List[str]:
@@ -95,28 +443,57 @@ class SymbolVectorStore:
         批量插入符号和摘要
         
         Args:
-            symbol_summary_pairs: 符号和摘要的字典列表
+            symbol_summary_pairs: 符号和摘要的字典列表，可选 "id" 键指定文档ID
             
         Returns:
             插入的文档ID列表
         """
-        ids = [str(uuid.uuid4()) for _ in symbol_summary_pairs]
-        documents = [pair["summary"] for pair in symbol_summary_pairs]
-        metadatas = [{"symbol": pair["symbol"]} for pair in symbol_summary_pairs]
+        ids = [pair.get("id") or str(uuid.uuid4()) for pair in symbol_summary_pairs]
+        self._upsert_chunked([
+            (doc_id, pair["symbol"], pair["summary"], None) for doc_id, pair in zip(ids, symbol_summary_pairs)
+        ])
+        return ids
+    
+    def _upsert_chunked(self, symbols: List[tuple]) -> None:
+        """
+        切分超长描述后嵌入并写入，再删除块数变少时遗留的旧块
         
-        self.collection.add(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas
+        Args:
+            symbols: [(文档ID, 符号名称, 摘要, 元数据或None)]
+        """
+        records, chunk_counts = [], {}
+        for doc_id, symbol, summary, metadata in symbols:
+            chunks = chunk_records(doc_id, summary, {"symbol": symbol, **(metadata or {})}, EMBEDDING_CHUNK_TOKENS)
+            records.extend(chunks)
+            chunk_counts[doc_id] = len(chunks)
+        documents = [text for _, text, _ in records]
+        self.upsert_embeddings(
+            [chunk_id for chunk_id, _, _ in records],
+            self.embed_texts(documents),
+            documents,
+            [chunk_metadata for _, _, chunk_metadata in records]
         )
+        self.delete_stale_chunks(chunk_counts)
+    
+    def delete_stale_chunks(self, chunk_counts: Dict[str, int]) -> None:
+        """
+        删除重新写入后多余的旧块（序号 >= 新块数）
         
-        return ids
+        Args:
+            chunk_counts: {符号的向量ID: 新的块数}
+        """
+        filters = stale_chunk_filters(chunk_counts)
+        for where in filters:
+            self.collection.delete(where=where)
+        if filters:
+            self._written()
     
     def query_symbols(
         self, 
         query_text: str, 
         top_k: int = 5,
-        where: Optional[Dict] = None
+        where: Optional[Dict] = None,
+        **filters
     ) -> List[Dict]:
         """
         查询相似符号
@@ -125,26 +502,78 @@ class SymbolVectorStore:
             query_text: 查询文本
             top_k: 返回结果数量
             where: 过滤条件
+            **filters: 过滤参数 project/path_prefix/symbol_type/parent_class/language（见 build_where）
             
         Returns:
-            相似符号列表，包含符号、摘要和相似度分数
+            相似符号列表，包含文档ID、符号、摘要（最相似块的文本）、相似度分数和最相似块的ID
         """
-        results = self.collection.query(
-            query_texts=[query_text],
-            n_results=top_k,
-            where=where,
-            include=["documents", "metadatas", "distances"]
-        )
+        return self.query_symbols_batch([query_text], top_k, where, **filters)[0]
+    
+    def query_symbols_batch(
+        self,
+        query_texts: List[str],
+        top_k: int = 5,
+        where: Optional[Dict] = None,
+        **filters
+    ) -> List[List[Dict]]:
+        """
+        批量查询相似符号（一次嵌入调用、一次集合查询）
+        
+        过滤条件在向量检索内部生效（先按元数据限定候选，再取 top_k），
+        不会因为先取 top_k 再过滤而丢失结果。
         
-        return [{
-            "symbol": item["symbol"],
-            "summary": doc,
-            "score": 1 - distance  # 转换为相似度分数
-        } for item, doc, distance in zip(
-            results["metadatas"][0],
-            results["documents"][0],
-            results["distances"][0]
-        )]
+        Args:
+            query_texts: 查询文本列表
+            top_k: 每个查询返回的结果数量
+            where: 过滤条件
+            **filters: 过滤参数 project/path_prefix/symbol_type/parent_class/language（见 build_where）
+            
+        Returns:
+            与 query_texts 顺序一致的结果列表，每项格式同 query_symbols
+        """
+        if not query_texts:
+            return []
+        return self.query_embeddings(self.embed_texts(query_texts), top_k, build_where(where, **filters))
+    
+    def query_embeddings(
+        self,
+        query_embeddings: Union[np.ndarray, List[List[float]]],
+        top_k: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        按查询向量检索，同一符号的多个块聚合为一条结果
+        
+        先取 top_k * CHUNK_OVERSAMPLE 个块；若候选取满而聚合后仍不足 top_k 个符号
+        （命中集中在少数大符号的块上），加倍候选数重查。
+        
+        Args:
+            query_embeddings: 查询向量列表
+            top_k: 每个查询返回的符号数
+            where: 过滤条件（ChromaDB 风格）
+            
+        Returns:
+            与查询顺序一致的结果列表，每项格式同 query_symbols
+        """
+        self._follow_pointer()
+        n_results = top_k * CHUNK_OVERSAMPLE
+        limit = self.collection.count()
+        while True:
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=["documents", "metadatas", "distances"]
+            )
+            pooled = [pool_chunk_hits(ids, metadatas, documents, distances, top_k, CHUNK_POOLING)
+                for ids, metadatas, documents, distances in zip(
+                    results["ids"], results["metadatas"], results["documents"], results["distances"]
+                )]
+            short = any(len(hits) < top_k and len(ids) >= n_results
+                        for hits, ids in zip(pooled, results["ids"]))
+            if not short or n_results >= limit:
+                return pooled
+            n_results *= 2
     
     def delete_symbol(self, doc_id: str) -> None:
         """
@@ -153,37 +582,87 @@ class SymbolVectorStore:
         Args:
             doc_id: 要删除的文档ID
         """
-        self.collection.delete(ids=[doc_id])
+        self.delete_symbols([doc_id])
+    
+    def delete_symbols(self, doc_ids: List[str]) -> None:
+        """
+        批量删除符号（连同其全部块）
+        
+        Args:
+            doc_ids: 要删除的文档ID列表
+        """
+        if doc_ids:
+            doc_ids = list(doc_ids)
+            self.collection.delete(ids=doc_ids)
+            self.collection.delete(where={"parent_id": {"$in": doc_ids}})
+            self._written()
     
     def update_symbol(self, doc_id: str, symbol: str, summary: str) -> None:
         """
-        更新符号信息
+        更新符号信息（按新描述重新切分，ID不存在时新增）
         
         Args:
             doc_id: 要更新的文档ID
             symbol: 新的符号名称
             summary: 新的摘要
         """
-        self.collection.update(
-            ids=[doc_id],
-            documents=[summary],
-            metadatas=[{"symbol": symbol}]
-        )
+        self._upsert_chunked([(doc_id, symbol, summary, None)])
+    
+    def get_embeddings(self, doc_ids: List[str], batch_size: int = 1000) -> Dict[str, List[float]]:
+        """
+        批量读取已存储的嵌入向量
+
+        Args:
+            doc_ids: 文档ID列表
+            batch_size: 每次读取的ID数量
+
+        Returns:
+            {文档ID: 嵌入向量} 字典，不存在的ID不会出现在结果中
+        """
+        embeddings = {}
+        for start in range(0, len(doc_ids), batch_size):
+            results = self.collection.get(
+                ids=doc_ids[start:start + batch_size],
+                include=["embeddings"]
+            )
+            for doc_id, embedding in zip(results["ids"], results["embeddings"]):
+                embeddings[doc_id] = list(embedding)
+        return embeddings
+
+    def _written(self) -> None:
+        """记录一次写入：本实例计数加一，共享的内容版本加一"""
+        self.writes += 1
+        self.versions.bump(self.collection_name)
+    
+    def collection_version(self) -> tuple:
+        """
+        获取集合版本标识，集合内容变化后标识随之改变
+        
+        由活动集合名和其内容版本组成。内容版本保存在持久化目录中，任何实例/进程的写入和删除都会更新，
+        重新索引以相同ID覆盖向量（条数不变）时同样能感知；其他进程切换了活动集合时先改为打开新集合。
+        
+        Returns:
+            可比较的版本元组
+        """
+        self._follow_pointer()
+        return self.collection_name, self.versions.get(self.collection_name)
     
     def get_symbol_count(self) -> int:
         """
-        获取集合中的符号数量
+        获取集合中的符号数量（切分为多块的符号只计一次）
         
         Returns:
             符号数量
         """
-        return self.collection.count()
+        extra_chunks = self.collection.get(where={"chunk": {"$gte": 1}}, include=[])
+        return self.collection.count() - len(extra_chunks["ids"])
     
     def clear_collection(self) -> None:
         """
         清空集合
         """
         self.collection.delete(where={})
+        self._written()
 
 
 # 使用示例
@@ -0,0 +1,345 @@
+"""
+本模块提供基于 asyncio 的并发嵌入客户端（OpenAI 兼容接口）
+
+- 同时在途的批次数由 max_concurrency 限制
+- 请求数和 token 数分别用令牌桶限速（每分钟配额）
+- 429 / 5xx / 超时按指数退避加随机抖动重试，优先遵循响应中的 Retry-After
+- 按观测到的请求延迟自适应调整批次大小：慢则缩小、快则放大；413 时把批次一分为二
+- 以 base64 传输嵌入（比 JSON 浮点列表小约 1/3、解析快），各批次直接解码写入预分配的 float32 矩阵
+
+限流、重试和自适应批次的行为由 tests/test_async_embedding_client.py 对模拟接口验证。
+"""
+import asyncio
+import email.utils
+import random
+import time
+from typing import List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+from db.config import EMBEDDING_MODEL, OPENAI_API_KEY, BASE_URL, EMBEDDING_DIMENSIONS, EMBEDDING_BASE64
+from db.chunking import estimate_tokens
+from db.embedding_backends import decode_embeddings, rejects_encoding_format
+
+# 可重试的状态码
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class EmbeddingRequestError(Exception):
+    """嵌入请求在重试后仍然失败"""
+
+
+class TokenBucket:
+    """
+    令牌桶限速器
+
+    以 rate 个/秒的速度补充令牌，最多积累 capacity 个；acquire 在令牌不足时异步等待。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量，默认等于一分钟的配额的 1/6（允许约10秒的突发）
+        """
+        self.rate = rate
+        self.capacity = capacity or max(rate * 10, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """
+        获取令牌（数量超过桶容量时按容量计，避免永久等待）
+
+        Args:
+            amount: 需要的令牌数
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头（秒数或 HTTP 日期）
+
+    Returns:
+        需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+class AsyncEmbeddingClient:
+    """
+    并发嵌入客户端
+
+    用法：
+        async with AsyncEmbeddingClient() as client:
+            vectors = await client.embed(texts)
+    """
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        api_key: str = OPENAI_API_KEY,
+        base_url: str = BASE_URL,
+        dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = 3000,
+        tokens_per_minute: Optional[float] = 1_000_000,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        timeout: float = 60.0,
+        batch_size: int = 64,
+        min_batch_size: int = 8,
+        max_batch_size: int = 512,
+        max_batch_tokens: int = 8000,
+        target_latency: float = 2.0,
+        use_base64: bool = EMBEDDING_BASE64,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            model: 嵌入模型名称
+            api_key: API密钥
+            base_url: API基础URL（如 https://api.openai.com/v1）
+            dimensions: 可选，嵌入向量维度
+            max_concurrency: 同时在途的批次数
+            requests_per_minute: 每分钟请求数上限，None 表示不限
+            tokens_per_minute: 每分钟 token 数上限，None 表示不限
+            max_retries: 单个批次的最大重试次数
+            base_delay: 退避基准时间（秒）
+            max_delay: 单次退避的最长时间（秒）
+            timeout: 单次请求超时（秒）
+            batch_size: 初始批次大小
+            min_batch_size: 自适应调整的下限
+            max_batch_size: 自适应调整的上限
+            max_batch_tokens: 每批估算 token 数上限
+            target_latency: 期望的单次请求延迟（秒），自适应调整的目标
+            use_base64: 是否请求 encoding_format="base64"（接口因 encoding_format 返回 400 时自动回退为浮点列表）
+            transport: 可选，httpx 传输层（如测试用的 httpx.MockTransport）
+        """
+        self.model = model
+        self.api_key = api_key
+        self.base_url = (base_url or "https://api.openai.com/v1").rstrip("/")
+        self.dimensions = dimensions
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.target_latency = target_latency
+        self.use_base64 = use_base64
+        self._transport = transport
+        self._request_bucket = TokenBucket(requests_per_minute / 60) if requests_per_minute else None
+        self._token_bucket = TokenBucket(tokens_per_minute / 60) if tokens_per_minute else None
+        self._client: Optional[httpx.AsyncClient] = None
+        # 统计
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+
+    async def __aenter__(self):
+        self._open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _open(self):
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency),
+                transport=self._transport
+            )
+
+    async def close(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _next_batch(self, texts: Sequence[str], start: int) -> int:
+        """按当前批次大小和 token 上限确定下一批的结束位置"""
+        end = start
+        tokens = 0
+        while end < len(texts) and end - start < self.batch_size:
+            cost = estimate_tokens(texts[end])
+            if end > start and tokens + cost > self.max_batch_tokens:
+                break
+            tokens += cost
+            end += 1
+        return end
+
+    async def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """
+        并发嵌入全部文本
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入顺序一致的嵌入向量列表
+
+        Raises:
+            EmbeddingRequestError: 某个批次在重试后仍然失败
+        """
+        return (await self.embed_array(texts)).tolist()
+
+    async def embed_array(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        并发嵌入全部文本，结果写入一个预分配的 float32 矩阵
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            形状为 (len(texts), 维度) 的 float32 数组，行顺序与输入一致
+
+        Raises:
+            EmbeddingRequestError: 某个批次在重试后仍然失败
+        """
+        self._open()
+        # 维度未指定时在第一个批次返回后分配
+        matrix: Optional[np.ndarray] = (
+            np.empty((len(texts), self.dimensions), dtype=np.float32) if self.dimensions else None
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = []
+
+        async def run(start: int, end: int):
+            nonlocal matrix
+            try:
+                vectors = await self._embed_batch(texts[start:end])
+                if matrix is None:
+                    matrix = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                matrix[start:end] = vectors
+            finally:
+                semaphore.release()
+
+        # 批次在获得并发槽位时才切分，以便使用最新的自适应批次大小
+        start = 0
+        while start < len(texts):
+            await semaphore.acquire()
+            end = self._next_batch(texts, start)
+            tasks.append(asyncio.create_task(run(start, end)))
+            start = end
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        if matrix is None:
+            matrix = np.empty((0, self.dimensions or 0), dtype=np.float32)
+        return matrix
+
+    async def _embed_batch(self, batch: Sequence[str]) -> np.ndarray:
+        """发送一个批次，失败时退避重试；413 时拆分为两半；返回 (len(batch), 维度) 的 float32 数组"""
+        tokens = sum(estimate_tokens(text) for text in batch)
+        for attempt in range(self.max_retries + 1):
+            if self._request_bucket:
+                await self._request_bucket.acquire(1)
+            if self._token_bucket:
+                await self._token_bucket.acquire(tokens)
+
+            started = time.monotonic()
+            retry_after = None
+            try:
+                response = await self._client.post(f"{self.base_url}/embeddings", json=self._payload(batch))
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = f"{type(e).__name__}: {e}"
+                self._adapt(self.timeout)
+            else:
+                self.requests += 1
+                if response.status_code == 200:
+                    self._adapt(time.monotonic() - started)
+                    data = response.json()["data"]
+                    return decode_embeddings(
+                        [item["embedding"] for item in sorted(data, key=lambda item: item["index"])]
+                    )
+                if response.status_code == 413 and len(batch) > 1:
+                    self.batch_size = max(self.min_batch_size, len(batch) // 2)
+                    middle = len(batch) // 2
+                    first, second = await asyncio.gather(
+                        self._embed_batch(batch[:middle]), self._embed_batch(batch[middle:])
+                    )
+                    return np.concatenate([first, second])
+                if response.status_code == 400 and self.use_base64 and self._rejects_base64(response):
+                    # 兼容接口不支持 encoding_format 时回退为浮点列表并立即重试
+                    self.use_base64 = False
+                    return await self._embed_batch(batch)
+                if response.status_code not in RETRYABLE_STATUS:
+                    raise EmbeddingRequestError(f"HTTP {response.status_code}: {response.text[:200]}")
+                if response.status_code == 429:
+                    self.throttled += 1
+                error = f"HTTP {response.status_code}"
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+
+            if attempt == self.max_retries:
+                raise EmbeddingRequestError(f"嵌入请求重试 {self.max_retries} 次后仍失败: {error}")
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    @staticmethod
+    def _rejects_base64(response: httpx.Response) -> bool:
+        """400 响应是否因为接口不支持 encoding_format"""
+        try:
+            error = response.json().get("error") or {}
+        except ValueError:
+            error = {}
+        if not isinstance(error, dict):
+            error = {"message": str(error)}
+        return rejects_encoding_format(error.get("param"), error.get("message") or response.text)
+
+    def _payload(self, batch: Sequence[str]) -> dict:
+        payload = {"model": self.model, "input": list(batch)}
+        if self.use_base64:
+            payload["encoding_format"] = "base64"
+        if self.dimensions:
+            payload["dimensions"] = self.dimensions
+        return payload
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """计算退避时间：有 Retry-After 时以其为准（加少量抖动），否则指数退避加全抖动"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _adapt(self, latency: float):
+        """按请求延迟调整批次大小（乘性减小、缓慢增大）"""
+        if latency > self.target_latency:
+            self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.7))
+        elif latency < self.target_latency / 2:
+            self.batch_size = min(self.max_batch_size, max(self.batch_size + 1, int(self.batch_size * 1.25)))
+
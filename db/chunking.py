@@ -0,0 +1,213 @@
+"""
+本模块提供按 token 预算切分符号描述以及多向量结果聚合
+
+大类的描述包含完整文档和全部成员摘要，可能超出嵌入模型的上下文长度（被截断或请求失败）。
+超出预算的描述被切成多个块，每块重复描述头部（符号名称、类型）并单独嵌入：
+- 第 0 块沿用符号的向量ID（SQLite 中的 vector_store_id 不变），其余块为 "<ID>#<序号>"
+- 所有块的元数据带有 parent_id（符号的向量ID）、chunk（序号）、chunks（块数）
+
+查询时多取一些候选，再按 parent_id 把同一符号的块聚合为一条结果（max 或 sum 池化）。
+
+token 计数优先使用 tiktoken（可选依赖，编码器只加载一次），未安装时按字节数保守估算。
+"""
+from collections import defaultdict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from db.config import EMBEDDING_TOKENIZER
+
+# 切分时依次尝试的分隔符（从粗到细），都不可用时按字符硬切
+_SEPARATORS = ("\n", ", ", "。", ". ", " ")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数（偏保守）
+
+    英文约 4 字节/token，中文每个字符 3 字节约 1-2 token，按 UTF-8 字节数 / 3 估算。
+    """
+    return len(text.encode('utf-8')) // 3 + 1
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(encoding: str = EMBEDDING_TOKENIZER):
+    """
+    获取 tiktoken 编码器（加载词表较慢，按编码名缓存）
+
+    Args:
+        encoding: 编码名（如 cl100k_base）或模型名
+
+    Returns:
+        编码器；未安装 tiktoken 或编码不可用时为 None
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding(encoding)
+    except ValueError:
+        try:
+            return tiktoken.encoding_for_model(encoding)
+        except KeyError:
+            return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    计算文本的 token 数（有 tiktoken 时精确计数，否则保守估算）
+    """
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode_ordinary(text))
+
+
+def _split_text(text: str, budget: int, count: Callable[[str], int],
+                separators: Sequence[str] = _SEPARATORS) -> List[str]:
+    """按分隔符把文本贪心地打包成不超过 budget 的片段"""
+    tokens = count(text)
+    if tokens <= budget:
+        return [text]
+    for index, separator in enumerate(separators):
+        pieces = text.split(separator)
+        if len(pieces) == 1:
+            continue
+        parts, current, current_tokens = [], [], 0
+        for piece in pieces:
+            piece_tokens = count(piece)
+            if current and current_tokens + piece_tokens + 1 <= budget:
+                current.append(piece)
+                current_tokens += piece_tokens + 1
+                continue
+            if current:
+                parts.append(separator.join(current))
+            if piece_tokens <= budget:
+                current, current_tokens = [piece], piece_tokens
+            else:
+                parts.extend(_split_text(piece, budget, count, separators[index + 1:]))
+                current, current_tokens = [], 0
+        if current:
+            parts.append(separator.join(current))
+        return [part for part in parts if part.strip()]
+    # 没有可用的分隔符：按比例估算每段字符数硬切
+    step = max(1, len(text) * budget // tokens)
+    return [text[start:start + step] for start in range(0, len(text), step)]
+
+
+def split_description(
+    text: str,
+    max_tokens: int,
+    header_lines: int = 2,
+    count: Callable[[str], int] = count_tokens
+) -> List[str]:
+    """
+    把描述文本切分为不超过 max_tokens 的块
+
+    前 header_lines 行（符号名称、类型）作为头部重复出现在每一块中，
+    其余内容依次按换行、逗号、句号、空格切分后贪心打包。
+
+    Args:
+        text: 描述文本
+        max_tokens: 每块 token 上限
+        header_lines: 每块重复的头部行数
+        count: token 计数函数
+
+    Returns:
+        块列表；未超出预算时只有原文一块
+    """
+    if count(text) <= max_tokens:
+        return [text]
+    lines = text.split("\n")
+    header = "\n".join(lines[:header_lines])
+    body = "\n".join(lines[header_lines:])
+    # 头部本身过长时至少给正文留一半预算
+    budget = max(max_tokens - count(header) - 1, max_tokens // 2)
+    if not body:
+        return _split_text(header, max_tokens, count)
+    return [f"{header}\n{part}" for part in _split_text(body, budget, count)]
+
+
+def chunk_records(doc_id: str, text: str, metadata: Dict, max_tokens: int) -> List[Tuple[str, str, Dict]]:
+    """
+    把一个符号的描述展开为待嵌入的块记录
+
+    Args:
+        doc_id: 符号的向量ID
+        text: 描述文本
+        metadata: 符号的元数据
+        max_tokens: 每块 token 上限
+
+    Returns:
+        [(块ID, 块文本, 块元数据)]，未切分时为 [(doc_id, text, metadata)]
+    """
+    chunks = split_description(text, max_tokens)
+    if len(chunks) == 1:
+        return [(doc_id, text, metadata)]
+    return [(
+        doc_id if index == 0 else f"{doc_id}#{index}",
+        chunk,
+        {**metadata, "parent_id": doc_id, "chunk": index, "chunks": len(chunks)}
+    ) for index, chunk in enumerate(chunks)]
+
+
+def stale_chunk_filters(chunk_counts: Dict[str, int]) -> List[Dict]:
+    """
+    构建删除多余旧块的过滤条件（重新索引后块数变少时，序号 >= 新块数的旧块需要删除）
+
+    Args:
+        chunk_counts: {符号的向量ID: 新的块数}
+
+    Returns:
+        where 条件列表，按块数分组（每组一次删除）
+    """
+    groups: Dict[int, List[str]] = defaultdict(list)
+    for doc_id, chunks in chunk_counts.items():
+        groups[chunks].append(doc_id)
+    return [{"$and": [{"parent_id": {"$in": doc_ids}}, {"chunk": {"$gte": chunks}}]}
+            for chunks, doc_ids in sorted(groups.items())]
+
+
+def pool_chunk_hits(
+    ids: Sequence[str],
+    metadatas: Sequence[Optional[Dict]],
+    documents: Sequence[str],
+    distances: Sequence[float],
+    top_k: int,
+    pooling: str = "max"
+) -> List[Dict]:
+    """
+    把同一符号的多个块命中聚合为一条结果
+
+    Args:
+        ids: 命中的块ID
+        metadatas: 块元数据
+        documents: 块文本
+        distances: 余弦距离
+        top_k: 返回的符号数
+        pooling: "max" 取最相似块的分数，"sum" 累加所有命中块的分数（偏向多处匹配的大符号）
+
+    Returns:
+        按池化分数降序的结果，包含符号的向量ID、符号、最相似块的文本（summary）、分数和最相似块的ID
+    """
+    if pooling not in ("max", "sum"):
+        raise ValueError(f"未知的池化方式: {pooling}")
+    pooled: Dict[str, Dict] = {}
+    for chunk_id, metadata, document, distance in zip(ids, metadatas, documents, distances):
+        metadata = metadata or {}
+        score = 1 - distance  # 转换为相似度分数
+        parent = metadata.get("parent_id", chunk_id)
+        hit = pooled.get(parent)
+        if hit is None:
+            pooled[parent] = {
+                "id": parent,
+                "symbol": metadata.get("symbol"),
+                "summary": document,
+                "score": score,
+                "chunk_id": chunk_id
+            }
+            continue
+        # 结果按距离升序，先出现的块即最相似块
+        if pooling == "sum":
+            hit["score"] += score
+    return sorted(pooled.values(), key=lambda hit: hit["score"], reverse=True)[:top_k]
@@ -0,0 +1,151 @@
+"""
+本模块提供向量集合的活动版本指针（蓝绿重建）
+
+重建向量集合时写入一个新的版本化集合（"<基础名>__v<版本>"），旧集合继续提供查询；
+新集合校验通过后原子地切换指针；旧集合保留到下一次切换，
+其他进程打开的旧集合在下次访问时跟随指针切换。指针保存在持久化目录下的 collections.json：
+
+    {"symbol_docs": "symbol_docs__v3"}
+
+写入时先写临时文件再 os.replace，进程在任何时刻崩溃指针都指向一个完整的集合。
+
+同一目录下的 collection_versions.db 记录每个集合的内容版本：任何进程每次写入或删除向量后加一，
+查询缓存比较该版本判断集合是否变化（确定性ID下重新索引覆盖向量时条数不变，不能用条数判断）。
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict
+
+POINTER_FILE = "collections.json"
+VERSIONS_FILE = "collection_versions.db"
+
+_VERSION_RE = re.compile(r"__v(\d+)$")
+
+
+def collection_version_of(name: str) -> int:
+    """从集合名解析版本号（未版本化的集合为 0）"""
+    match = _VERSION_RE.search(name)
+    return int(match.group(1)) if match else 0
+
+
+class CollectionPointer:
+    """
+    基础集合名 -> 活动集合名 的持久化映射
+    """
+
+    def __init__(self, persist_path: str):
+        """
+        Args:
+            persist_path: 向量存储的持久化目录
+        """
+        os.makedirs(persist_path, exist_ok=True)
+        self.path = os.path.join(persist_path, POINTER_FILE)
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+
+    def active(self, base: str) -> str:
+        """
+        获取活动集合名
+
+        Args:
+            base: 基础集合名
+
+        Returns:
+            活动集合名；从未重建过时为基础集合名本身
+        """
+        with self._lock:
+            return self._read().get(base, base)
+
+    def next_name(self, base: str) -> str:
+        """
+        获取下一个版本的集合名
+
+        Args:
+            base: 基础集合名
+
+        Returns:
+            "<基础名>__v<活动版本 + 1>"
+        """
+        return f"{base}__v{collection_version_of(self.active(base)) + 1}"
+
+    def flip(self, base: str, name: str):
+        """
+        原子地把活动集合切换为 name
+
+        Args:
+            base: 基础集合名
+            name: 新的活动集合名
+        """
+        with self._lock:
+            pointers = self._read()
+            pointers[base] = name
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(pointers, fh, ensure_ascii=False, indent=2)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, self.path)
+
+
+class CollectionVersions:
+    """
+    集合名 -> 内容版本 的计数（SQLite，多个进程共享，线程安全）
+    """
+
+    def __init__(self, persist_path: str):
+        """
+        Args:
+            persist_path: 向量存储的持久化目录
+        """
+        os.makedirs(persist_path, exist_ok=True)
+        self.path = os.path.join(persist_path, VERSIONS_FILE)
+        # 自动提交；每条语句都很短，多个线程共用一个连接
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS versions (collection TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+            )
+
+    def bump(self, name: str):
+        """
+        集合内容变化后版本加一
+
+        Args:
+            name: 集合名
+        """
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO versions (collection, version) VALUES (?, 1) '
+                'ON CONFLICT(collection) DO UPDATE SET version = version + 1',
+                (name,)
+            )
+
+    def get(self, name: str) -> int:
+        """
+        获取集合的内容版本
+
+        Args:
+            name: 集合名
+
+        Returns:
+            版本号，从未写入过时为 0
+        """
+        with self._lock:
+            row = self.conn.execute('SELECT version FROM versions WHERE collection = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    def close(self):
+        """关闭连接"""
+        with self._lock:
+            self.conn.close()
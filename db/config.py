@@ -8,4 +8,24 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 BASE_URL= os.getenv("BASE_URL")
 EMBEDDING_MODEL= os.getenv("EMBEDDING_MODEL")
-MODEL_NAME= os.getenv("MODEL_NAME")
\ No newline at end of file
+MODEL_NAME= os.getenv("MODEL_NAME")
+EMBEDDING_DIMENSIONS= int(os.getenv("EMBEDDING_DIMENSIONS")) if os.getenv("EMBEDDING_DIMENSIONS") else None
+EMBEDDING_CACHE_PATH= os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_MAX_ENTRIES= int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1000000"))
+EMBEDDING_BACKEND= os.getenv("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_MODEL_PATH= os.getenv("LOCAL_EMBEDDING_MODEL_PATH", "local_embedding.npz")
+VECTOR_BACKEND= os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_DTYPE= os.getenv("VECTOR_DTYPE", "float32")
+VECTOR_RERANK= int(os.getenv("VECTOR_RERANK", "4"))
+QUANTIZER_TRAIN_SIZE= int(os.getenv("QUANTIZER_TRAIN_SIZE", "10000"))
+IVF_NPROBE= int(os.getenv("IVF_NPROBE", "8"))
+IVF_LISTS= int(os.getenv("IVF_LISTS")) if os.getenv("IVF_LISTS") else None
+EMBEDDING_CONCURRENCY= int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_REQUESTS_PER_MINUTE= float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+EMBEDDING_TOKENS_PER_MINUTE= float(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+EMBEDDING_TOKENIZER= os.getenv("EMBEDDING_TOKENIZER", "cl100k_base")
+EMBEDDING_CHUNK_TOKENS= int(os.getenv("EMBEDDING_CHUNK_TOKENS", "2000"))
+CHUNK_POOLING= os.getenv("CHUNK_POOLING", "max")
+CHUNK_OVERSAMPLE= int(os.getenv("CHUNK_OVERSAMPLE", "3"))
+VECTOR_STORE_DOCUMENTS= os.getenv("VECTOR_STORE_DOCUMENTS", "true").lower() in ("1", "true", "yes")
+EMBEDDING_BASE64= os.getenv("EMBEDDING_BASE64", "true").lower() in ("1", "true", "yes")
\ No newline at end of file
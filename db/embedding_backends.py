@@ -0,0 +1,440 @@
+"""
+本模块提供可插拔的嵌入后端
+
+- OpenAIEmbeddingBackend: 调用 OpenAI 兼容的嵌入接口
+- AsyncOpenAIEmbeddingBackend: 通过 AsyncEmbeddingClient 并发、限速、自动重试地调用同一接口
+- HashingEmbeddingBackend: 纯本地 CPU 实现，无需网络。
+  将文本切分为标识符词元（camelCase/snake_case 拆分）、字符三元组和中文字/二元组，
+  通过特征哈希映射到定长向量，按 TF-IDF 加权，可选再乘以拟合得到的投影矩阵降维。
+
+SymbolVectorStore 只依赖 EmbeddingBackend 接口，通过 create_embedding_backend 按配置选择后端。
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from db.config import (EMBEDDING_MODEL, OPENAI_API_KEY, BASE_URL, EMBEDDING_DIMENSIONS,
+                       EMBEDDING_BACKEND, LOCAL_EMBEDDING_MODEL_PATH, EMBEDDING_CONCURRENCY,
+                       EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_TOKENS_PER_MINUTE, EMBEDDING_BASE64)
+
+
+class EmbeddingBackend(ABC):
+    """嵌入后端接口"""
+
+    # 后端名称，用作嵌入缓存键中的模型名
+    name: str = ""
+    # 结果是否值得写入持久化嵌入缓存（远程接口为True，本地计算为False）
+    cacheable: bool = False
+    # 是否使用默认集合名（OpenAI 兼容接口为True，其他后端的集合名带后端名后缀）
+    default_collection: bool = False
+
+    @property
+    @abstractmethod
+    def dimensions(self) -> Optional[int]:
+        """输出向量维度，None 表示由模型决定"""
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成嵌入向量
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入顺序一致的嵌入向量列表
+        """
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        批量生成嵌入向量（NumPy数组形式）
+
+        Returns:
+            形状为 (len(texts), 维度) 的 float32 数组
+        """
+        return np.asarray(self.embed(texts), dtype=np.float32)
+
+
+def decode_embeddings(embeddings: Sequence[Union[str, Sequence[float]]]) -> np.ndarray:
+    """
+    把接口返回的嵌入解码为 float32 矩阵
+
+    encoding_format="base64" 时每个嵌入是小端 float32 字节的 base64 字符串：
+    整批解码后拼接为一个缓冲区，由 np.frombuffer 直接视为矩阵，不创建逐元素的 Python 浮点对象。
+    不支持 base64 的兼容接口仍返回浮点列表，按普通方式转换。
+
+    Args:
+        embeddings: 与输入顺序一致的嵌入（base64 字符串或浮点列表）
+
+    Returns:
+        形状为 (len(embeddings), 维度) 的 float32 数组
+    """
+    if not embeddings:
+        return np.empty((0, 0), dtype=np.float32)
+    if isinstance(embeddings[0], str):
+        buffer = b"".join(base64.b64decode(embedding) for embedding in embeddings)
+        return np.frombuffer(buffer, dtype="<f4").reshape(len(embeddings), -1)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def rejects_encoding_format(param: Optional[str], message: Optional[str]) -> bool:
+    """
+    判断 400 错误是否因为接口不支持 encoding_format（此时才应回退为浮点列表，其余 400 照常抛出）
+
+    Args:
+        param: 错误响应中的 param 字段
+        message: 错误信息
+
+    Returns:
+        错误是否与 encoding_format 有关
+    """
+    if param == "encoding_format":
+        return True
+    message = (message or "").lower()
+    return "encoding_format" in message or "encoding format" in message
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """OpenAI 兼容接口的嵌入后端"""
+
+    cacheable = True
+    default_collection = True
+
+    def __init__(
+        self,
+        embedding_model: str = EMBEDDING_MODEL,
+        api_key: str = OPENAI_API_KEY,
+        base_url: str = BASE_URL,
+        dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+        use_base64: bool = EMBEDDING_BASE64
+    ):
+        """
+        Args:
+            embedding_model: 嵌入模型名称
+            api_key: OpenAI API密钥
+            base_url: API基础URL
+            dimensions: 可选，嵌入向量维度（模型支持时生效）
+            use_base64: 是否以 base64 传输嵌入（接口拒绝该参数时自动回退为浮点列表）
+        """
+        from openai import OpenAI
+
+        self.name = embedding_model
+        self._dimensions = dimensions
+        self.use_base64 = use_base64
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        return self._dimensions
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        from openai import BadRequestError
+
+        kwargs = {"dimensions": self._dimensions} if self._dimensions else {}
+        if self.use_base64:
+            # 显式指定 base64 时 SDK 不做解码，embedding 字段保持为 base64 字符串
+            try:
+                response = self.client.embeddings.create(
+                    model=self.name, input=texts, encoding_format="base64", **kwargs
+                )
+            except BadRequestError as e:
+                if not rejects_encoding_format(getattr(e, "param", None), str(e)):
+                    raise
+                self.use_base64 = False
+                return self.embed_array(texts)
+        else:
+            response = self.client.embeddings.create(model=self.name, input=texts, **kwargs)
+        return decode_embeddings([item.embedding for item in sorted(response.data, key=lambda item: item.index)])
+
+
+class AsyncOpenAIEmbeddingBackend(EmbeddingBackend):
+    """
+    并发的 OpenAI 兼容接口嵌入后端
+
+    在后台线程中运行一个长期存在的事件循环，AsyncEmbeddingClient 的连接池和限速状态在多次调用间保持；
+    embed 为同步接口，可直接用于 SymbolVectorStore 和 EmbeddingBatchWriter。
+    """
+
+    cacheable = True
+    default_collection = True
+
+    def __init__(
+        self,
+        embedding_model: str = EMBEDDING_MODEL,
+        api_key: str = OPENAI_API_KEY,
+        base_url: str = BASE_URL,
+        dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+        **client_options
+    ):
+        """
+        Args:
+            embedding_model: 嵌入模型名称
+            api_key: OpenAI API密钥
+            base_url: API基础URL
+            dimensions: 可选，嵌入向量维度
+            client_options: 传给 AsyncEmbeddingClient 的其他参数（并发数、限速、重试等）
+        """
+        from db.async_embedding_client import AsyncEmbeddingClient
+
+        self.name = embedding_model
+        self._dimensions = dimensions
+        self.client = AsyncEmbeddingClient(embedding_model, api_key, base_url, dimensions, **client_options)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="embedding-client", daemon=True)
+        self._thread.start()
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        return self._dimensions
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        return asyncio.run_coroutine_threadsafe(self.client.embed_array(texts), self._loop).result()
+
+    def close(self):
+        """关闭连接池并停止后台事件循环"""
+        asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+# 标识符整体 / 中文连续片段
+_CHUNK_RE = re.compile(r"[A-Za-z0-9_]+|[一-鿿]+")
+# 标识符内部按 camelCase、缩写、数字拆分
+_IDENT_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_TRIGRAM_WEIGHT = 0.3
+
+
+def tokenize(text: str) -> List[Tuple[str, float]]:
+    """
+    将文本切分为带权重的词元
+
+    Returns:
+        [(词元, 权重), ...]，词元带有类型前缀：w 完整标识符、t 标识符片段、g 字符三元组、c 中文
+    """
+    tokens = []
+    for chunk in _CHUNK_RE.findall(text):
+        if '一' <= chunk[0] <= '鿿':
+            tokens.extend((f"c:{ch}", 1.0) for ch in chunk)
+            tokens.extend((f"c:{chunk[i:i + 2]}", 1.0) for i in range(len(chunk) - 1))
+            continue
+        tokens.append((f"w:{chunk.lower()}", 1.0))
+        parts = [p.lower() for p in _IDENT_PART_RE.findall(chunk)]
+        if len(parts) > 1:
+            tokens.extend((f"t:{p}", 1.0) for p in parts)
+        for part in parts:
+            padded = f"^{part}$"
+            tokens.extend((f"g:{padded[i:i + 3]}", _TRIGRAM_WEIGHT) for i in range(len(padded) - 2))
+    return tokens
+
+
+@lru_cache(maxsize=200_000)
+def _hash_token(token: str, n_features: int) -> Tuple[int, float]:
+    """特征哈希：返回 (特征下标, 符号)"""
+    h = zlib.crc32(token.encode('utf-8'))
+    return h % n_features, (1.0 if (h >> 31) & 1 else -1.0)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    本地哈希 TF-IDF 嵌入后端
+
+    未拟合时 IDF 全为1、不做投影；调用 fit 或加载模型文件后使用语料的 IDF 和投影矩阵。
+    拟合参数的指纹是 name 的一部分，重新拟合后写入新的集合，嵌入缓存也不会返回旧参数的向量。
+    """
+
+    def __init__(self, n_features: int = 2048, model_path: Optional[str] = None):
+        """
+        Args:
+            n_features: 哈希特征维度（未投影时即输出维度）
+            model_path: 可选，fit 保存的模型文件(.npz)路径，存在时自动加载
+        """
+        self.n_features = n_features
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self.projection: Optional[np.ndarray] = None
+        self._fingerprint: Optional[str] = None
+        if model_path and os.path.exists(model_path):
+            self.load(model_path)
+
+    @property
+    def name(self) -> str:
+        suffix = f"-p{self.projection.shape[1]}" if self.projection is not None else ""
+        if self._fingerprint:
+            suffix += f"-{self._fingerprint}"
+        return f"local-hash-{self.n_features}{suffix}"
+
+    def _update_fingerprint(self):
+        """由 IDF 和投影矩阵计算拟合参数的指纹"""
+        digest = hashlib.sha1(np.ascontiguousarray(self.idf, dtype=np.float32).tobytes())
+        if self.projection is not None:
+            digest.update(np.ascontiguousarray(self.projection, dtype=np.float32).tobytes())
+        self._fingerprint = digest.hexdigest()[:8]
+
+    @property
+    def dimensions(self) -> int:
+        return self.projection.shape[1] if self.projection is not None else self.n_features
+
+    def _term_frequencies(self, texts: Iterable[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """将文本批量转换为 (行号, 特征下标, 带符号的对数词频) 三元组数组"""
+        rows, cols, values = [], [], []
+        count = 0
+        for row, text in enumerate(texts):
+            count += 1
+            weights: Dict[int, float] = {}
+            signs: Dict[int, float] = {}
+            for token, weight in tokenize(text):
+                idx, sign = _hash_token(token, self.n_features)
+                weights[idx] = weights.get(idx, 0.0) + weight
+                signs[idx] = sign
+            for idx, tf in weights.items():
+                rows.append(row)
+                cols.append(idx)
+                values.append(signs[idx] * (1.0 + math.log(tf)) if tf >= 1.0 else signs[idx] * tf)
+        return (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+                np.asarray(values, dtype=np.float32), count)
+
+    def _tfidf_matrix(self, texts: List[str]) -> np.ndarray:
+        rows, cols, values, count = self._term_frequencies(texts)
+        matrix = np.zeros((count, self.n_features), dtype=np.float32)
+        np.add.at(matrix, (rows, cols), values * self.idf[cols])
+        return matrix
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        批量生成嵌入向量（NumPy数组形式）
+
+        Returns:
+            形状为 (len(texts), dimensions) 的 float32 数组，每行已L2归一化
+        """
+        matrix = self._tfidf_matrix(texts)
+        if self.projection is not None:
+            matrix = matrix @ self.projection
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def fit(self, texts: List[str], projection_dim: Optional[int] = None, max_samples: int = 10000):
+        """
+        在语料上拟合 IDF 及可选的投影矩阵
+
+        Args:
+            texts: 语料文本
+            projection_dim: 可选，投影后的维度；为None时不降维
+            max_samples: 拟合投影时使用的最大样本数
+        """
+        rows, cols, _, count = self._term_frequencies(texts)
+        doc_freq = np.zeros(self.n_features, dtype=np.float64)
+        # 每个 (文档, 特征) 只计一次
+        unique_pairs = np.unique(rows * self.n_features + cols)
+        np.add.at(doc_freq, unique_pairs % self.n_features, 1.0)
+        self.idf = (np.log((1.0 + count) / (1.0 + doc_freq)) + 1.0).astype(np.float32)
+        self.projection = None
+
+        if projection_dim:
+            sample = texts
+            if len(texts) > max_samples:
+                picks = np.random.default_rng(0).choice(len(texts), max_samples, replace=False)
+                sample = [texts[i] for i in picks]
+            matrix = self._tfidf_matrix(sample)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+            # 特征协方差的前 projection_dim 个主方向
+            eigenvalues, eigenvectors = np.linalg.eigh(matrix.T @ matrix)
+            order = np.argsort(eigenvalues)[::-1][:projection_dim]
+            self.projection = eigenvectors[:, order].astype(np.float32)
+        self._update_fingerprint()
+
+    def save(self, model_path: str):
+        """保存 IDF 和投影矩阵"""
+        arrays = {"n_features": np.asarray(self.n_features), "idf": self.idf}
+        if self.projection is not None:
+            arrays["projection"] = self.projection
+        with open(model_path, 'wb') as fh:
+            np.savez(fh, **arrays)
+
+    def load(self, model_path: str):
+        """加载 fit 保存的模型文件"""
+        with np.load(model_path) as data:
+            self.n_features = int(data["n_features"])
+            self.idf = data["idf"].astype(np.float32)
+            self.projection = data["projection"].astype(np.float32) if "projection" in data else None
+        self._update_fingerprint()
+
+
+def create_embedding_backend(backend: str = EMBEDDING_BACKEND) -> EmbeddingBackend:
+    """
+    按名称创建嵌入后端
+
+    Args:
+        backend: "openai"、"openai-async" 或 "local"
+
+    Returns:
+        嵌入后端实例
+    """
+    if backend == "local":
+        return HashingEmbeddingBackend(model_path=LOCAL_EMBEDDING_MODEL_PATH)
+    if backend == "openai":
+        return OpenAIEmbeddingBackend()
+    if backend == "openai-async":
+        return AsyncOpenAIEmbeddingBackend(
+            max_concurrency=EMBEDDING_CONCURRENCY,
+            requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+            tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE
+        )
+    raise ValueError(f"未知的嵌入后端: {backend}")
+
+
+def _load_corpus(db_path: str) -> List[str]:
+    """从符号数据库读取拟合语料（符号名 + 文档）"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT symbol_name, doc_text, compressed FROM symbols').fetchall()
+    finally:
+        conn.close()
+    corpus = []
+    for name, doc_data, compressed in rows:
+        doc = ""
+        if doc_data:
+            doc = zlib.decompress(doc_data).decode('utf-8') if compressed else bytes(doc_data).decode('utf-8')
+        corpus.append(f"{name}\n{doc}")
+    return corpus
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="本地嵌入模型拟合工具")
+    parser.add_argument("--db", default="symbols.db", help="SQLite 符号数据库路径")
+    parser.add_argument("--out", default=LOCAL_EMBEDDING_MODEL_PATH, help="模型输出路径(.npz)")
+    parser.add_argument("--features", type=int, default=2048, help="哈希特征维度")
+    parser.add_argument("--dim", type=int, help="投影维度，不指定则不降维")
+    args = parser.parse_args()
+
+    corpus = _load_corpus(args.db)
+    backend = HashingEmbeddingBackend(n_features=args.features)
+    backend.fit(corpus, args.dim)
+    backend.save(args.out)
+    print(f"已在 {len(corpus)} 条语料上拟合 {backend.name}，保存到: {args.out}")
+
+
+if __name__ == "__main__":
+    _main()
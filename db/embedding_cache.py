@@ -0,0 +1,180 @@
+"""
+本模块提供持久化的嵌入向量缓存
+
+以 (描述文本哈希, 嵌入模型, 维度) 为键把嵌入向量保存在本地 SQLite 中，
+重建索引时描述文本未变化的符号直接复用缓存，不再调用嵌入API。
+超出条数上限时按最近使用时间淘汰。
+
+查询只读：命中时不立即更新最近使用时间，距上次记录超过 touch_interval 的命中先记在内存中，
+随下一次写入（put_many）或 flush_touches/close 一并写回，淘汰只需要粗粒度的使用时间。
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+
+def text_hash(text: str) -> str:
+    """计算描述文本的哈希"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    嵌入向量缓存
+
+    ## embeddings 表
+
+    | 字段名 | 数据类型 | 描述 |
+    |--------|----------|------|
+    | text_hash | TEXT | 描述文本的SHA-256 |
+    | model | TEXT | 嵌入模型名称 |
+    | dimensions | INTEGER | 向量维度（未指定维度时为0） |
+    | vector | BLOB | float32 向量 |
+    | last_used | REAL | 最近使用时间戳，用于淘汰 |
+
+    主键为 (text_hash, model, dimensions)。
+    """
+
+    def __init__(self, cache_path: str, max_entries: int = 1_000_000, touch_interval: float = 3600):
+        """
+        Args:
+            cache_path: 缓存数据库路径
+            max_entries: 缓存条数上限，超出时淘汰最久未使用的约10%
+            touch_interval: 最近使用时间的精度（秒），记录的时间比此更旧的命中才需要写回
+        """
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        # 待写回的最近使用时间 {(text_hash, model, dimensions): 时间戳}
+        self._touches: Dict[tuple, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS embeddings (
+            text_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            dimensions INTEGER NOT NULL,
+            vector BLOB NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (text_hash, model, dimensions)
+        )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)')
+        self.conn.commit()
+        # 条数上界估计（替换写入也会计入），超过上限时才真正计数并淘汰
+        self._approx_count = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def get_many(self, texts: Sequence[str], model: str, dimensions: Optional[int] = None) -> Dict[int, np.ndarray]:
+        """
+        批量查询缓存
+
+        Args:
+            texts: 描述文本列表
+            model: 嵌入模型名称
+            dimensions: 向量维度，None 表示模型默认维度
+
+        Returns:
+            {文本下标: 嵌入向量（只读 float32 数组）}，未命中的下标不在结果中
+        """
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f'SELECT text_hash, vector, last_used FROM embeddings '
+                    f'WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})',
+                    (model, dimensions or 0, *chunk)
+                ).fetchall()
+                now = time.time()
+                for key, blob, last_used in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                    if now - last_used > self.touch_interval:
+                        self._touches[(key, model, dimensions or 0)] = now
+
+        result = {i: found[key] for i, key in enumerate(hashes) if key in found}
+        self.hits += len(result)
+        self.misses += len(texts) - len(result)
+        return result
+
+    def put_many(self, texts: Sequence[str], vectors: Union[Sequence[Sequence[float]], np.ndarray], model: str,
+                 dimensions: Optional[int] = None):
+        """
+        批量写入缓存
+
+        Args:
+            texts: 描述文本列表
+            vectors: 与 texts 对应的嵌入向量
+            model: 嵌入模型名称
+            dimensions: 向量维度，None 表示模型默认维度
+        """
+        now = time.time()
+        rows = [
+            (text_hash(text), model, dimensions or 0, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._write_touches()
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (text_hash, model, dimensions, vector, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self._approx_count += len(rows)
+            if self._approx_count > self.max_entries:
+                self._evict()
+            self.conn.commit()
+
+    def _write_touches(self):
+        """把待写回的最近使用时间写入当前事务（调用方持有锁并负责提交）"""
+        if self._touches:
+            self.conn.executemany(
+                'UPDATE embeddings SET last_used = ? WHERE text_hash = ? AND model = ? AND dimensions = ?',
+                [(now, key, model, dimensions) for (key, model, dimensions), now in self._touches.items()]
+            )
+            self._touches = {}
+
+    def flush_touches(self):
+        """写回待更新的最近使用时间"""
+        with self._lock:
+            if self._touches:
+                self._write_touches()
+                self.conn.commit()
+
+    def _evict(self):
+        """超出上限时淘汰最久未使用的记录（多淘汰约10%，避免每次写入都触发）"""
+        count = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries + self.max_entries // 10
+            self.conn.execute(
+                'DELETE FROM embeddings WHERE rowid IN '
+                '(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)',
+                (excess,)
+            )
+            count -= excess
+        self._approx_count = count
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取缓存统计
+
+        Returns:
+            {"entries", "hits", "misses"}
+        """
+        with self._lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """关闭缓存数据库"""
+        self.flush_touches()
+        self.conn.close()
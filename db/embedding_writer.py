@@ -0,0 +1,146 @@
+"""
+本模块提供批量嵌入写入器
+
+索引时逐个符号调用 insert_symbol 会为每个符号发起一次嵌入请求。
+EmbeddingBatchWriter 复用同一个 SymbolVectorStore（及其 HTTP 连接池），
+把符号描述按条数和 token 数上限攒成批次，每批一次嵌入请求、一次 collection.upsert。
+超出单块 token 上限的描述切分为多个块向量（见 db.chunking）。
+"""
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db.SymbolVectorStore import SymbolVectorStore
+from db.chunking import chunk_records, count_tokens
+from db.config import EMBEDDING_CHUNK_TOKENS
+
+
+class EmbeddingBatchWriter:
+    """
+    按批次写入符号嵌入
+
+    add 立即返回文档ID，实际的嵌入和写入在批次达到上限或调用 flush 时进行；
+    作为上下文管理器使用时退出时自动 flush。嵌入或写入失败时批次保留，异常抛给调用方，可再次 flush 重试。
+    """
+
+    def __init__(
+        self,
+        store: SymbolVectorStore,
+        max_batch_size: int = 256,
+        max_batch_tokens: int = 8000,
+        max_chunk_tokens: int = EMBEDDING_CHUNK_TOKENS
+    ):
+        """
+        Args:
+            store: 长期复用的向量存储
+            max_batch_size: 每批最多的描述条数（块数）
+            max_batch_tokens: 每批 token 数上限
+            max_chunk_tokens: 单条描述的 token 上限，超出时切分为多个块
+        """
+        self.store = store
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_chunk_tokens = min(max_chunk_tokens, max_batch_tokens)
+        self._pending: Dict[str, Tuple[str, Dict]] = {}
+        # 符号的向量ID -> 其块ID（用于删除尚未写入的块和清理多余的旧块）
+        self._chunks: Dict[str, List[str]] = {}
+        self._pending_tokens = 0
+        self.requests = 0
+        self.embedded = 0
+
+    def add(self, symbol: str, summary: str, metadata: Optional[Dict] = None,
+            doc_id: Optional[str] = None) -> str:
+        """
+        加入一条待嵌入的符号描述
+
+        Args:
+            symbol: 符号名称
+            summary: 符号描述文本
+            metadata: 可选，附加元数据
+            doc_id: 可选，文档ID（建议使用 make_vector_id 生成），未提供时随机生成；
+                同一批次内重复的ID以最后一次为准
+
+        Returns:
+            文档ID（切分为多块时为第 0 块的ID）
+
+        Raises:
+            批次已满时自动 flush 的异常（该批次保留，本条描述未加入或只加入了部分块，可用同一ID重新 add）
+        """
+        doc_id = doc_id or str(uuid.uuid4())
+        self._discard(doc_id)
+        records = chunk_records(doc_id, summary, {"symbol": symbol, **(metadata or {})}, self.max_chunk_tokens)
+        # 先登记块ID，自动 flush 失败时重新 add 能丢弃已加入的部分块
+        self._chunks[doc_id] = [chunk_id for chunk_id, _, _ in records]
+        for chunk_id, text, chunk_metadata in records:
+            tokens = count_tokens(text)
+            if self._pending and (
+                len(self._pending) >= self.max_batch_size
+                or self._pending_tokens + tokens > self.max_batch_tokens
+            ):
+                self.flush()
+            self._pending[chunk_id] = (text, chunk_metadata)
+            self._pending_tokens += tokens
+        return doc_id
+
+    def _discard(self, doc_id: str):
+        """丢弃批次中尚未写入的该符号的块"""
+        for chunk_id in self._chunks.pop(doc_id, ()):
+            if chunk_id in self._pending:
+                text, _ = self._pending.pop(chunk_id)
+                self._pending_tokens -= count_tokens(text)
+
+    def flush(self) -> int:
+        """
+        嵌入并写入当前批次
+
+        Returns:
+            本次写入的条数
+
+        Raises:
+            嵌入或写入的异常；此时批次保持不变，可再次调用 flush 重试
+        """
+        if not self._pending:
+            return 0
+        batch = self._pending
+
+        doc_ids = list(batch)
+        documents = [summary for summary, _ in batch.values()]
+        metadatas = [metadata for _, metadata in batch.values()]
+        embeddings = self.store.embed_texts(documents)
+        self.requests += 1
+        self.store.upsert_embeddings(doc_ids, embeddings, documents, metadatas)
+        # 写入成功后才移出批次
+        self._pending = {}
+        self._pending_tokens = 0
+        # 一个符号的块可能分在两个批次中，只在写入最后一块后清理其多余的旧块
+        completed = {}
+        for doc_id, chunk_ids in list(self._chunks.items()):
+            if chunk_ids[-1] in batch:
+                completed[doc_id] = len(chunk_ids)
+                del self._chunks[doc_id]
+        self.store.delete_stale_chunks(completed)
+        self.embedded += len(batch)
+        return len(batch)
+
+    def delete(self, doc_ids: Iterable[str]):
+        """
+        删除向量（同时丢弃批次中尚未写入的同ID记录）
+
+        Args:
+            doc_ids: 要删除的文档ID
+        """
+        doc_ids = list(doc_ids)
+        for doc_id in doc_ids:
+            self._discard(doc_id)
+        self.store.delete_symbols(doc_ids)
+
+    @property
+    def pending(self) -> int:
+        """尚未写入的条数"""
+        return len(self._pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,519 @@
+"""
+本模块提供基于内存映射 NumPy 矩阵的精确向量检索
+
+中小型仓库的符号数通常在数万级别，精确暴力检索只需一次矩阵乘法，
+没有必要承担 ChromaDB 的启动和单次查询开销。NumpyVectorIndex 实现了
+SymbolVectorStore 用到的 collection 接口子集（upsert/update/query/get/delete/count），
+可直接替换 ChromaDB 集合。
+
+目录布局：
+- vectors-<n>.bin: 连续的 float32/float16 矩阵（行 = 向量，已L2归一化），np.memmap 打开
+- meta.db: SQLite 边车，保存 行号 -> ID/文档/元数据 以及矩阵信息
+
+删除只在边车中移除该行并标记墓碑，墓碑比例超过阈值时压缩到新的矩阵文件，
+新文件名与新行号在同一事务中提交，保证崩溃后矩阵与边车一致。
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 分块计算相似度的行数，控制临时内存
+SEARCH_BLOCK_ROWS = 65536
+# 初始及最小的矩阵容量（行）
+MIN_CAPACITY = 1024
+
+# 建立表达式索引的元数据字段（过滤查询的候选行由 SQLite 索引直接定位，不必扫描整张表）
+INDEXED_METADATA_FIELDS = ("project", "relative_path", "symbol_type", "parent_class", "language", "parent_id")
+
+_WHERE_OPERATORS = {
+    "$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<=",
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _metadata_field(key: str) -> str:
+    """
+    元数据字段的 SQL 表达式
+
+    JSON 路径以字面量写入 SQL（而不是参数），这样才能命中 INDEXED_METADATA_FIELDS 的表达式索引。
+    """
+    if not key or any(ch in key for ch in "\"'\\"):
+        raise ValueError(f"不支持的元数据字段名: {key!r}")
+    return f"json_extract(metadata, '$.\"{key}\"')"
+
+
+def where_to_sql(where: Dict) -> Tuple[str, List]:
+    """
+    将 ChromaDB 风格的元数据过滤条件转换为 SQL 条件
+
+    支持字段等值、$eq/$ne/$gt/$gte/$lt/$lte/$in/$nin 以及 $and/$or 组合。
+
+    Returns:
+        (SQL 条件, 参数列表)
+    """
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(sub) for sub in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            for _, sub_params in parts:
+                params.extend(sub_params)
+            continue
+
+        field = _metadata_field(key)
+        if isinstance(condition, dict):
+            (operator, value), = condition.items()
+        else:
+            operator, value = "$eq", condition
+        if operator in ("$in", "$nin"):
+            values = list(value)
+            placeholders = ",".join("?" * len(values))
+            negate = "NOT " if operator == "$nin" else ""
+            clauses.append(f"{field} {negate}IN ({placeholders})")
+            params.extend(values)
+        elif operator in _WHERE_OPERATORS:
+            clauses.append(f"{field} {_WHERE_OPERATORS[operator]} ?")
+            params.append(value)
+        else:
+            raise ValueError(f"不支持的过滤运算符: {operator}")
+    return " AND ".join(clauses) or "1", params
+
+
+class NumpyVectorIndex:
+    """
+    内存映射的精确向量索引
+
+    ## vectors 表（meta.db）
+
+    | 字段名 | 数据类型 | 描述 |
+    |--------|----------|------|
+    | row | INTEGER | 矩阵行号，主键 |
+    | id | TEXT | 文档ID，唯一 |
+    | document | TEXT | 文档文本 |
+    | metadata | TEXT | 元数据JSON |
+
+    ## info 表
+
+    保存 dim（维度）、dtype（存储类型）、size（已使用行数，含墓碑）、vector_file（当前矩阵文件名）。
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", compact_ratio: float = 0.25):
+        """
+        Args:
+            path: 索引目录
+            dtype: 新建索引时的存储类型，"float32" 或 "float16"；已有索引以保存的类型为准
+            compact_ratio: 墓碑占比超过该值时自动压缩
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(os.path.join(path, "meta.db"), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS vectors (
+            row INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            document TEXT,
+            metadata TEXT
+        )
+        ''')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)')
+        for key in INDEXED_METADATA_FIELDS:
+            self.conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_meta_{key} ON vectors({_metadata_field(key)})'
+            )
+        self.conn.commit()
+
+        info = dict(self.conn.execute('SELECT key, value FROM info').fetchall())
+        self.dim: Optional[int] = int(info["dim"]) if "dim" in info else None
+        self.dtype = np.dtype(info.get("dtype", dtype))
+        self._size = int(info.get("size", 0))
+        self._vector_file = info.get("vector_file", "vectors-0.bin")
+
+        self._ids: Dict[str, int] = {}
+        self._row_ids: List[Optional[str]] = [None] * self._size
+        for row, doc_id in self.conn.execute('SELECT row, id FROM vectors'):
+            self._ids[doc_id] = row
+            self._row_ids[row] = doc_id
+
+        self._matrix: Optional[np.memmap] = None
+        self._alive = np.zeros(0, dtype=bool)
+        if self.dim is not None:
+            self._open_matrix()
+            self._alive[list(self._ids.values())] = True
+
+    # ---- 存储 ----
+
+    def _vector_path(self, name: Optional[str] = None) -> str:
+        return os.path.join(self.path, name or self._vector_file)
+
+    def _open_matrix(self):
+        """打开（必要时创建）当前矩阵文件"""
+        path = self._vector_path()
+        row_bytes = self.dim * self.dtype.itemsize
+        if not os.path.exists(path):
+            with open(path, 'wb') as fh:
+                fh.truncate(MIN_CAPACITY * row_bytes)
+        capacity = os.path.getsize(path) // row_bytes
+        self._matrix = np.memmap(path, dtype=self.dtype, mode='r+', shape=(capacity, self.dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive[:capacity]
+        self._alive = alive
+
+    def _ensure_capacity(self, rows: int):
+        """容量不足时按倍数扩展矩阵文件"""
+        capacity = self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        self._matrix.flush()
+        self._matrix = None
+        with open(self._vector_path(), 'r+b') as fh:
+            fh.truncate(capacity * self.dim * self.dtype.itemsize)
+        self._open_matrix()
+
+    def _set_info(self, **values):
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)',
+            [(key, str(value)) for key, value in values.items()]
+        )
+
+    # ---- 写入 ----
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Dict]] = None
+    ):
+        """
+        写入向量，ID已存在时原地覆盖
+
+        Args:
+            ids: 文档ID列表
+            embeddings: 嵌入向量列表
+            documents: 可选，文档文本列表
+            metadatas: 可选，元数据列表
+        """
+        if not ids:
+            return
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_info(dim=self.dim, dtype=self.dtype.name, vector_file=self._vector_file)
+                self._open_matrix()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不匹配: 期望 {self.dim}, 实际 {vectors.shape[1]}")
+
+            # 同一批次内重复的ID以最后一次为准
+            latest = {doc_id: i for i, doc_id in enumerate(ids)}
+            order = list(latest.values())
+            rows = []
+            for i in order:
+                row = self._ids.get(ids[i])
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_ids.append(ids[i])
+                    self._ids[ids[i]] = row
+                rows.append(row)
+
+            self._ensure_capacity(self._size)
+            row_array = np.asarray(rows, dtype=np.int64)
+            self._matrix[row_array] = vectors[order].astype(self.dtype)
+            self._matrix.flush()
+            self._alive[row_array] = True
+            self._on_vectors_written(row_array, vectors[order])
+
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO vectors (row, id, document, metadata) VALUES (?, ?, ?, ?)',
+                [(row, ids[i], documents[i],
+                  json.dumps(metadatas[i], ensure_ascii=False) if metadatas[i] is not None else None)
+                 for row, i in zip(rows, order)]
+            )
+            self._set_info(size=self._size)
+            self.conn.commit()
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        """与 upsert 相同（兼容 ChromaDB 接口）"""
+        self.upsert(ids, embeddings, documents, metadatas)
+
+    def update(self, ids, embeddings, documents=None, metadatas=None):
+        """只更新已存在的ID（兼容 ChromaDB 接口）"""
+        with self._lock:
+            keep = [i for i, doc_id in enumerate(ids) if doc_id in self._ids]
+            self.upsert(
+                [ids[i] for i in keep],
+                [embeddings[i] for i in keep],
+                [documents[i] for i in keep] if documents else None,
+                [metadatas[i] for i in keep] if metadatas else None
+            )
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None):
+        """
+        删除向量（标记墓碑，必要时压缩）
+
+        Args:
+            ids: 要删除的文档ID
+            where: 元数据过滤条件，与 ids 同时提供时取交集；空字典表示全部
+        """
+        with self._lock:
+            if where is not None:
+                rows = self._filter_rows(where)
+                if ids is not None:
+                    wanted = {self._ids[doc_id] for doc_id in ids if doc_id in self._ids}
+                    rows = [row for row in rows if row in wanted]
+            else:
+                rows = [self._ids[doc_id] for doc_id in ids or [] if doc_id in self._ids]
+            if not rows:
+                return
+            for row in rows:
+                del self._ids[self._row_ids[row]]
+                self._row_ids[row] = None
+            self._alive[np.asarray(rows, dtype=np.int64)] = False
+            self._on_vectors_deleted(np.asarray(rows, dtype=np.int64))
+            self.conn.executemany('DELETE FROM vectors WHERE row = ?', [(row,) for row in rows])
+            self.conn.commit()
+
+            if self._size >= MIN_CAPACITY and self.tombstones > self._size * self.compact_ratio:
+                self.compact()
+
+    @property
+    def tombstones(self) -> int:
+        """墓碑行数"""
+        return self._size - len(self._ids)
+
+    def compact(self):
+        """
+        压缩矩阵：把存活行拷贝到新的矩阵文件并重新编号
+
+        新文件写完后，行号更新与文件名切换在同一事务中提交，随后删除旧文件。
+        """
+        with self._lock:
+            if self.dim is None or not self.tombstones:
+                return
+            live_rows = np.flatnonzero(self._alive[:self._size])
+            generation = int(self._vector_file.split("-")[1].split(".")[0]) + 1
+            new_file = f"vectors-{generation}.bin"
+            capacity = max(MIN_CAPACITY, len(live_rows))
+            target = np.memmap(self._vector_path(new_file), dtype=self.dtype, mode='w+',
+                               shape=(capacity, self.dim))
+            for start in range(0, len(live_rows), SEARCH_BLOCK_ROWS):
+                chunk = live_rows[start:start + SEARCH_BLOCK_ROWS]
+                target[start:start + len(chunk)] = self._matrix[chunk]
+            target.flush()
+            del target
+
+            # 行号单调递减，升序更新不会与未处理的行冲突
+            self.conn.executemany(
+                'UPDATE vectors SET row = ? WHERE row = ?',
+                [(new_row, int(old_row)) for new_row, old_row in enumerate(live_rows) if new_row != old_row]
+            )
+            old_file = self._vector_file
+            self._vector_file = new_file
+            self._size = len(live_rows)
+            self._set_info(size=self._size, vector_file=new_file)
+            self.conn.commit()
+
+            self._row_ids = [self._row_ids[row] for row in live_rows]
+            self._ids = {doc_id: row for row, doc_id in enumerate(self._row_ids)}
+            self._matrix = None
+            self._alive = np.zeros(0, dtype=bool)
+            self._open_matrix()
+            self._alive[:self._size] = True
+            self._on_compacted(live_rows)
+            os.remove(self._vector_path(old_file))
+
+    # 供子类（量化、IVF 等）维护附加结构的钩子
+
+    def _on_vectors_written(self, rows: np.ndarray, vectors: np.ndarray):
+        pass
+
+    def _on_vectors_deleted(self, rows: np.ndarray):
+        pass
+
+    def _on_compacted(self, live_rows: np.ndarray):
+        pass
+
+    # ---- 查询 ----
+
+    def _filter_rows(self, where: Dict) -> List[int]:
+        """按元数据过滤，返回匹配的行号"""
+        sql, params = where_to_sql(where)
+        return [row for row, in self.conn.execute(f'SELECT row FROM vectors WHERE {sql}', params)]
+
+    def search(self, queries: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        精确检索
+
+        Args:
+            queries: 形状为 (q, dim) 的查询矩阵（已归一化）
+            k: 每个查询返回的结果数
+            rows: 可选，限定候选行号
+
+        Returns:
+            (行号矩阵, 相似度矩阵)，形状均为 (q, k')，按相似度降序；k' = min(k, 候选数)
+        """
+        if rows is None:
+            rows = np.flatnonzero(self._alive[:self._size])
+        return self._blocked_topk(
+            queries, k, rows,
+            lambda selector: queries @ np.asarray(self._matrix[selector], dtype=np.float32).T
+        )
+
+    @staticmethod
+    def _blocked_topk(queries: np.ndarray, k: int, rows: np.ndarray, score_block) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        在候选行上分块打分，合并各块的 top-k
+
+        Args:
+            queries: 查询矩阵
+            k: 结果数
+            rows: 候选行号（升序）
+            score_block: 打分函数，参数为行选择器（切片或行号数组），返回 (q, 块行数) 的相似度
+
+        Returns:
+            (行号矩阵, 相似度矩阵)，按相似度降序
+        """
+        q = queries.shape[0]
+        best_rows = np.empty((q, 0), dtype=np.int64)
+        best_scores = np.empty((q, 0), dtype=np.float32)
+        contiguous = len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block_rows = rows[start:start + SEARCH_BLOCK_ROWS]
+            selector = slice(block_rows[0], block_rows[-1] + 1) if contiguous else block_rows
+            scores = score_block(selector)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                block_scores = np.take_along_axis(scores, top, axis=1)
+                block_rows = block_rows[top]
+            else:
+                block_rows = np.broadcast_to(block_rows, scores.shape)
+                block_scores = scores
+            candidate_rows = np.concatenate([best_rows, block_rows], axis=1)
+            candidate_scores = np.concatenate([best_scores, block_scores], axis=1)
+            if candidate_scores.shape[1] > k:
+                top = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+                candidate_rows = np.take_along_axis(candidate_rows, top, axis=1)
+                candidate_scores = np.take_along_axis(candidate_scores, top, axis=1)
+            best_rows, best_scores = candidate_rows, candidate_scores
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _fetch(self, rows: Sequence[int]) -> Dict[int, Tuple[str, Optional[str], Optional[Dict]]]:
+        """按行号读取 ID、文档和元数据"""
+        found = {}
+        rows = list(rows)
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row, doc_id, document, metadata in self.conn.execute(
+                f'SELECT row, id, document, metadata FROM vectors WHERE row IN ({placeholders})', chunk
+            ):
+                found[row] = (doc_id, document, json.loads(metadata) if metadata else None)
+        return found
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("documents", "metadatas", "distances")
+    ) -> Dict[str, List[List]]:
+        """
+        批量查询最相似的向量（返回格式与 ChromaDB 相同，distances 为余弦距离）
+
+        Args:
+            query_embeddings: 查询向量列表
+            n_results: 每个查询返回的结果数
+            where: 可选，元数据过滤条件
+            include: 需要返回的字段
+
+        Returns:
+            {"ids": [[...]], "distances": [[...]], "documents": [[...]], "metadatas": [[...]]}
+        """
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            if self.dim is None or not self._ids:
+                result_rows = np.empty((len(queries), 0), dtype=np.int64)
+                scores = np.empty((len(queries), 0), dtype=np.float32)
+            else:
+                rows = None
+                if where:
+                    rows = np.asarray(sorted(self._filter_rows(where)), dtype=np.int64)
+                result_rows, scores = self.search(queries, n_results, rows)
+            # 近似索引候选不足时以 -1 补位
+            row_lists = [[row for row in q_rows if row >= 0] for q_rows in result_rows.tolist()]
+            fetched = self._fetch(sorted({row for q_rows in row_lists for row in q_rows}))
+            if "embeddings" in include:
+                embeddings = [np.asarray(self._matrix[q_rows], dtype=np.float32).tolist() for q_rows in row_lists]
+
+        results = {"ids": [[fetched[row][0] for row in q_rows] for q_rows in row_lists]}
+        if "distances" in include:
+            results["distances"] = [(1.0 - q_scores[:len(q_rows)]).tolist()
+                                    for q_rows, q_scores in zip(row_lists, scores)]
+        if "documents" in include:
+            results["documents"] = [[fetched[row][1] for row in q_rows] for q_rows in row_lists]
+        if "metadatas" in include:
+            results["metadatas"] = [[fetched[row][2] for row in q_rows] for q_rows in row_lists]
+        if "embeddings" in include:
+            results["embeddings"] = embeddings
+        return results
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict[str, List]:
+        """
+        按ID或过滤条件读取记录（不存在的ID被忽略）
+
+        Returns:
+            {"ids": [...], "embeddings": [...], "documents": [...], "metadatas": [...]}（按 include 返回）
+        """
+        with self._lock:
+            if ids is not None:
+                rows = [self._ids[doc_id] for doc_id in ids if doc_id in self._ids]
+            else:
+                rows = sorted(self._ids.values())
+            if where:
+                allowed = set(self._filter_rows(where))
+                rows = [row for row in rows if row in allowed]
+            fetched = self._fetch(rows)
+            results = {"ids": [fetched[row][0] for row in rows]}
+            if "embeddings" in include:
+                results["embeddings"] = np.asarray(self._matrix[rows], dtype=np.float32).tolist() if rows else []
+        if "documents" in include:
+            results["documents"] = [fetched[row][1] for row in rows]
+        if "metadatas" in include:
+            results["metadatas"] = [fetched[row][2] for row in rows]
+        return results
+
+    def count(self) -> int:
+        """存活向量数"""
+        return len(self._ids)
+
+    def close(self):
+        """刷新矩阵并关闭边车数据库"""
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self.conn.close()
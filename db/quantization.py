@@ -0,0 +1,429 @@
+"""
+本模块提供向量量化存储
+
+数百万符号、1536维的 float32 向量需要数 GB 内存和磁盘。这里提供两种压缩编码：
+- ScalarQuantizer (int8): 每维按训练样本的取值范围线性量化为 int8，压缩 4 倍
+- ProductQuantizer (pq): 把向量切分为若干子向量，每个子向量用 256 个 k-means 中心之一的编号（1字节）表示
+
+QuantizedVectorIndex 在 NumpyVectorIndex 的基础上额外维护编码矩阵，
+检索时先在编码上近似打分取出 k * rerank 个候选，再从磁盘上的全精度向量精确重排。
+
+评估命令（报告相对 float32 精确检索的 Recall@10）：
+    python -m db.quantization --index path/to/index --quantizer pq
+    python -m db.quantization --synthetic 100000 --dim 384 --quantizer int8
+"""
+import argparse
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from db.numpy_index import NumpyVectorIndex, _normalize, SEARCH_BLOCK_ROWS
+
+
+def assign_clusters(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    为每个向量分配最近的中心（欧氏距离）
+
+    Returns:
+        中心编号数组
+    """
+    centroid_norms = (centroids * centroids).sum(axis=1)
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), SEARCH_BLOCK_ROWS):
+        block = np.asarray(data[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+        # ||x - c||^2 = ||x||^2 - 2x·c + ||c||^2，||x||^2 对 argmin 无影响
+        distances = centroid_norms - 2.0 * (block @ centroids.T)
+        labels[start:start + len(block)] = distances.argmin(axis=1)
+    return labels
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 20, max_samples: int = 65536,
+           seed: int = 0) -> np.ndarray:
+    """
+    向量化的 k-means（Lloyd 算法）
+
+    Args:
+        data: 训练数据 (n, d)
+        k: 中心数，超过样本数时取样本数
+        iterations: 最大迭代次数，分配不再变化时提前结束
+        max_samples: 训练样本上限，超出时随机采样
+        seed: 随机种子
+
+    Returns:
+        中心矩阵 (k, d)，float32
+    """
+    rng = np.random.default_rng(seed)
+    if len(data) > max_samples:
+        data = data[np.sort(rng.choice(len(data), max_samples, replace=False))]
+    data = np.asarray(data, dtype=np.float32)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    labels = None
+    for _ in range(iterations):
+        new_labels = assign_clusters(data, centroids)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind='stable')
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        centroids[nonempty] = np.add.reduceat(data[order], starts, axis=0) / counts[nonempty, None]
+        # 空簇重新随机取样本点
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+class ScalarQuantizer:
+    """int8 标量量化：code = round((x - low) / scale) - 128"""
+
+    kind = "int8"
+    code_dtype = np.dtype(np.int8)
+
+    def __init__(self):
+        self.low: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.low is not None
+
+    def code_size(self, dim: int) -> int:
+        """每个向量的编码长度（元素数）"""
+        return dim
+
+    def train(self, data: np.ndarray):
+        data = np.asarray(data, dtype=np.float32)
+        self.low = data.min(axis=0)
+        high = data.max(axis=0)
+        self.scale = np.maximum(high - self.low, 1e-8) / 255.0
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(data, dtype=np.float32) - self.low) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        在编码上计算近似内积
+
+        x ≈ (code + 128) * scale + low，故 q·x ≈ (q*scale)·code + 128·Σ(q*scale) + q·low
+        """
+        scaled = queries * self.scale
+        offset = 128.0 * scaled.sum(axis=1) + queries @ self.low
+        return scaled @ np.asarray(codes, dtype=np.float32).T + offset[:, None]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"low": self.low, "scale": self.scale}
+
+    def load_arrays(self, arrays):
+        self.low = arrays["low"]
+        self.scale = arrays["scale"]
+
+
+class ProductQuantizer:
+    """
+    乘积量化：向量切分为 m 个子向量，每个子向量编码为 256 个中心之一
+
+    查询时先计算查询子向量与各中心的内积表（ADC），编码打分只需查表求和。
+    """
+
+    kind = "pq"
+    code_dtype = np.dtype(np.uint8)
+
+    def __init__(self, sub_dim: int = 8, iterations: int = 10, max_samples: int = 16384):
+        """
+        Args:
+            sub_dim: 期望的子向量维度（维度不能整除时自动调整为最接近的约数）
+            iterations: 每个子空间 k-means 的迭代次数
+            max_samples: 训练样本上限
+        """
+        self.sub_dim = sub_dim
+        self.iterations = iterations
+        self.max_samples = max_samples
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def _subspaces(self, dim: int) -> int:
+        sub_dim = self.sub_dim
+        while dim % sub_dim:
+            sub_dim += 1
+        return dim // sub_dim
+
+    def code_size(self, dim: int) -> int:
+        return self._subspaces(dim)
+
+    def train(self, data: np.ndarray):
+        data = np.asarray(data, dtype=np.float32)
+        m = self._subspaces(data.shape[1])
+        sub_vectors = data.reshape(len(data), m, -1)
+        self.codebooks = np.stack([
+            kmeans(sub_vectors[:, j], 256, self.iterations, self.max_samples, seed=j)
+            for j in range(m)
+        ])
+        if self.codebooks.shape[1] < 256:
+            # 样本数不足 256 时补齐，保证编码空间一致
+            pad = np.repeat(self.codebooks[:, -1:], 256 - self.codebooks.shape[1], axis=1)
+            self.codebooks = np.concatenate([self.codebooks, pad], axis=1)
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        data = np.asarray(data, dtype=np.float32)
+        m = self.codebooks.shape[0]
+        sub_vectors = data.reshape(len(data), m, -1)
+        return np.stack([assign_clusters(sub_vectors[:, j], self.codebooks[j]) for j in range(m)],
+                        axis=1).astype(np.uint8)
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        m = self.codebooks.shape[0]
+        # 内积表 (q, m, 256)
+        tables = np.einsum('qmd,mkd->qmk', queries.reshape(len(queries), m, -1), self.codebooks)
+        columns = np.ascontiguousarray(np.asarray(codes).T)
+        result = np.zeros((len(queries), columns.shape[1]), dtype=np.float32)
+        for j in range(m):
+            result += np.take(tables[:, j], columns[j], axis=1)
+        return result
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks, "sub_dim": np.asarray(self.sub_dim)}
+
+    def load_arrays(self, arrays):
+        self.codebooks = arrays["codebooks"]
+        self.sub_dim = int(arrays["sub_dim"])
+
+
+def create_quantizer(kind: str, sub_dim: int = 8):
+    """按名称创建量化器（"int8" 或 "pq"）"""
+    if kind == "int8":
+        return ScalarQuantizer()
+    if kind == "pq":
+        return ProductQuantizer(sub_dim)
+    raise ValueError(f"未知的量化方式: {kind}")
+
+
+class QuantizedVectorIndex(NumpyVectorIndex):
+    """
+    量化向量索引
+
+    在 NumpyVectorIndex 的全精度矩阵之外维护编码矩阵（<矩阵文件名>.codes）和量化器参数（quantizer.npz）。
+    向量数达到 train_size 时自动训练量化器并编码已有向量；训练前退化为精确检索。
+    编码文件缺失（如压缩过程中崩溃）时从全精度矩阵重新编码。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        quantizer: str = "int8",
+        rerank: int = 4,
+        train_size: int = 10000,
+        dtype: str = "float32",
+        compact_ratio: float = 0.25,
+        sub_dim: int = 8
+    ):
+        """
+        Args:
+            path: 索引目录
+            quantizer: 量化方式，"int8" 或 "pq"；已有索引以保存的量化器为准
+            rerank: 候选倍数，取 k * rerank 个近似候选后用全精度向量重排；0 表示不重排
+            train_size: 自动训练量化器所需的向量数
+            dtype: 全精度矩阵的存储类型
+            compact_ratio: 墓碑占比超过该值时自动压缩
+            sub_dim: PQ 子向量维度
+        """
+        self.rerank = rerank
+        self.train_size = train_size
+        self._codes: Optional[np.memmap] = None
+        self._quantizer_path = os.path.join(path, "quantizer.npz")
+        self.quantizer = create_quantizer(quantizer, sub_dim)
+        if os.path.exists(self._quantizer_path):
+            with np.load(self._quantizer_path) as arrays:
+                self.quantizer = create_quantizer(str(arrays["kind"]), sub_dim)
+                self.quantizer.load_arrays(arrays)
+        super().__init__(path, dtype, compact_ratio)
+        if self.quantizer.trained and self.dim is not None:
+            self._open_codes()
+
+    def _codes_path(self) -> str:
+        return self._vector_path() + ".codes"
+
+    def _open_codes(self):
+        """打开编码矩阵，容量与全精度矩阵一致；文件缺失时重新编码"""
+        path = self._codes_path()
+        shape = (self._matrix.shape[0], self.quantizer.code_size(self.dim))
+        rebuild = not os.path.exists(path)
+        row_bytes = shape[1] * self.quantizer.code_dtype.itemsize
+        with open(path, 'ab') as fh:
+            if fh.tell() != shape[0] * row_bytes:
+                fh.truncate(shape[0] * row_bytes)
+        self._codes = np.memmap(path, dtype=self.quantizer.code_dtype, mode='r+', shape=shape)
+        if rebuild:
+            self._encode_rows(np.flatnonzero(self._alive[:self._size]))
+
+    def _encode_rows(self, rows: np.ndarray):
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            chunk = rows[start:start + SEARCH_BLOCK_ROWS]
+            self._codes[chunk] = self.quantizer.encode(np.asarray(self._matrix[chunk], dtype=np.float32))
+        self._codes.flush()
+
+    def train(self):
+        """用当前存活向量（最多采样 65536 条）训练量化器，并编码全部向量"""
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._size])
+            if not len(rows):
+                return
+            if len(rows) > 65536:
+                rows = np.sort(np.random.default_rng(0).choice(rows, 65536, replace=False))
+            self.quantizer.train(np.asarray(self._matrix[rows], dtype=np.float32))
+            tmp_path = self._quantizer_path + ".tmp"
+            with open(tmp_path, 'wb') as fh:
+                np.savez(fh, kind=np.asarray(self.quantizer.kind), **self.quantizer.to_arrays())
+            os.replace(tmp_path, self._quantizer_path)
+            if os.path.exists(self._codes_path()):
+                os.remove(self._codes_path())
+            self._open_codes()
+
+    def _on_vectors_written(self, rows: np.ndarray, vectors: np.ndarray):
+        if not self.quantizer.trained:
+            if len(self._ids) >= self.train_size:
+                self.train()
+            return
+        if self._codes.shape[0] < self._matrix.shape[0]:
+            self._codes.flush()
+            self._codes = None
+            self._open_codes()
+        self._codes[rows] = self.quantizer.encode(vectors)
+        self._codes.flush()
+
+    def _on_compacted(self, live_rows: np.ndarray):
+        if self._codes is None:
+            return
+        old_codes = self._codes
+        old_path = old_codes.filename
+        self._codes = None
+        path = self._codes_path()
+        with open(path, 'wb') as fh:
+            fh.truncate(self._matrix.shape[0] * old_codes.shape[1] * old_codes.dtype.itemsize)
+        codes = np.memmap(path, dtype=old_codes.dtype, mode='r+', shape=(self._matrix.shape[0], old_codes.shape[1]))
+        codes[:len(live_rows)] = old_codes[live_rows]
+        codes.flush()
+        del old_codes
+        os.remove(old_path)
+        self._codes = codes
+
+    def search(self, queries: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.quantizer.trained:
+            return super().search(queries, k, rows)
+        if rows is None:
+            rows = np.flatnonzero(self._alive[:self._size])
+        candidates = k * self.rerank if self.rerank else k
+        candidate_rows, candidate_scores = self._blocked_topk(
+            queries, candidates, rows,
+            lambda selector: self.quantizer.scores(queries, self._codes[selector])
+        )
+        if not self.rerank:
+            return candidate_rows, candidate_scores
+        return rerank_exact(queries, candidate_rows, self._matrix, k)
+
+
+def rerank_exact(queries: np.ndarray, candidate_rows: np.ndarray, matrix, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    用全精度向量对候选精确重排
+
+    Args:
+        queries: 查询矩阵 (q, d)
+        candidate_rows: 候选行号 (q, c)
+        matrix: 全精度矩阵（可为 memmap）
+        k: 结果数
+
+    Returns:
+        (行号矩阵, 相似度矩阵)，按相似度降序
+    """
+    unique_rows = np.unique(candidate_rows)
+    exact = queries @ np.asarray(matrix[unique_rows], dtype=np.float32).T
+    positions = np.searchsorted(unique_rows, candidate_rows)
+    scores = np.take_along_axis(exact, positions, axis=1)
+    order = np.argsort(-scores, axis=1)[:, :k]
+    return np.take_along_axis(candidate_rows, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """计算检索结果相对真值的召回率（每行一个查询）"""
+    hits = sum(len(set(f.tolist()) & set(t.tolist())) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def load_eval_vectors(args) -> np.ndarray:
+    """按命令行参数（--index/--limit 或 --synthetic/--dim）加载评估用的归一化向量"""
+    if args.index:
+        index = NumpyVectorIndex(args.index)
+        rows = np.flatnonzero(index._alive[:index._size])[:args.limit]
+        vectors = np.asarray(index._matrix[rows], dtype=np.float32)
+        index.close()
+        return vectors
+    rng = np.random.default_rng(0)
+    # 低秩、带簇结构的合成数据，比各维独立的随机向量更接近真实嵌入
+    rank = min(args.dim, 48)
+    basis = rng.standard_normal((rank, args.dim)).astype(np.float32)
+    centers = rng.standard_normal((max(args.synthetic // 500, 1), rank)).astype(np.float32)
+    labels = rng.integers(len(centers), size=args.synthetic)
+    latent = centers[labels] + 0.7 * rng.standard_normal((args.synthetic, rank)).astype(np.float32)
+    noise = 0.02 * rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+    return _normalize(latent @ basis / np.sqrt(rank) + noise)
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="量化检索 Recall@10 评估")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--index", help="NumpyVectorIndex 目录，使用其中的向量评估")
+    source.add_argument("--synthetic", type=int, help="生成指定数量的合成向量评估")
+    parser.add_argument("--dim", type=int, default=384, help="合成向量维度")
+    parser.add_argument("--limit", type=int, help="最多使用的向量数")
+    parser.add_argument("--quantizer", choices=["int8", "pq"], default="int8", help="量化方式")
+    parser.add_argument("--sub-dim", type=int, default=8, help="PQ 子向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--rerank", type=int, default=4, help="重排候选倍数")
+    args = parser.parse_args()
+
+    vectors = load_eval_vectors(args)
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    noise = 0.05 * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    queries = _normalize(vectors[picks] + noise)
+    rows = np.arange(len(vectors))
+    k = 10
+
+    start = time.perf_counter()
+    truth, _ = NumpyVectorIndex._blocked_topk(queries, k, rows, lambda sel: queries @ vectors[sel].T)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    quantizer = create_quantizer(args.quantizer, args.sub_dim)
+    start = time.perf_counter()
+    quantizer.train(vectors[rng.choice(len(vectors), min(len(vectors), 65536), replace=False)])
+    codes = quantizer.encode(vectors)
+    train_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx, _ = NumpyVectorIndex._blocked_topk(queries, k, rows, lambda sel: quantizer.scores(queries, codes[sel]))
+    approx_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    candidates, _ = NumpyVectorIndex._blocked_topk(queries, k * args.rerank, rows,
+                                                   lambda sel: quantizer.scores(queries, codes[sel]))
+    reranked, _ = rerank_exact(queries, candidates, vectors, k)
+    rerank_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"向量: {len(vectors)} x {vectors.shape[1]}, 查询: {len(queries)}, 量化: {args.quantizer}")
+    print(f"每向量字节: float32 {vectors.shape[1] * 4}, 编码 {codes.shape[1] * codes.itemsize}")
+    print(f"训练+编码耗时: {train_s:.2f}s")
+    print(f"float32 精确检索: {exact_ms:.3f} ms/查询")
+    print(f"编码检索:          Recall@10 = {recall_at_k(approx, truth):.4f}, {approx_ms:.3f} ms/查询")
+    print(f"编码检索+重排(x{args.rerank}): Recall@10 = {recall_at_k(reranked, truth):.4f}, {rerank_ms:.3f} ms/查询")
+
+
+if __name__ == "__main__":
+    _main()
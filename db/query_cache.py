@@ -0,0 +1,232 @@
+"""
+本模块提供 SymbolDatabase 的查询结果缓存
+
+缓存按 (方法名, 参数) 记录查询结果，并借助 `file_generations` 表做精确失效：
+- 每条缓存记录结果涉及的文件集合，以及一个判断"新写入的符号名是否可能命中本查询"的谓词
+- 数据库代数前进时，只淘汰结果中包含变更文件、或变更文件的新符号名命中谓词的记录
+- 通过 `PRAGMA data_version` 感知其它连接/进程的写入，无写入时命中路径不执行任何查询
+"""
+import copy
+import re
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from db.sqlite import SymbolDatabase
+
+# 单次同步中变更文件过多时直接清空缓存，避免逐条比对
+_MAX_CHANGES_FOR_PRECISE_INVALIDATION = 256
+
+
+def _like_matcher(pattern: str) -> Callable[[str], bool]:
+    """将 SQLite LIKE 模式转换为匹配函数（ASCII大小写不敏感，% 和 _ 为通配符）"""
+    regex = "".join(
+        ".*" if ch == "%" else "." if ch == "_" else re.escape(ch)
+        for ch in pattern
+    )
+    compiled = re.compile(f"^{regex}$", re.IGNORECASE | re.DOTALL)
+    return lambda name: compiled.match(name) is not None
+
+
+class QueryCache:
+    """
+    有界LRU查询缓存
+
+    每条记录保存结果、结果涉及的文件集合及符号名谓词，
+    由 invalidate_changes 根据文件变更精确淘汰。
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries: 缓存记录数上限
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, FrozenSet[str], Callable[[str], bool]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Returns:
+            (是否命中, 结果)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def put(self, key: Hashable, value: Any, files: FrozenSet[str], predicate: Callable[[str], bool]):
+        """写入缓存，超出上限时淘汰最久未使用的记录"""
+        self._entries[key] = (value, files, predicate)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_changes(self, changes: List[Tuple[str, Optional[List[str]]]]):
+        """
+        根据文件变更淘汰失效记录
+
+        Args:
+            changes: [(file_path, symbol_names), ...]，symbol_names 为None表示文件已删除
+        """
+        if not changes:
+            return
+        if len(changes) > _MAX_CHANGES_FOR_PRECISE_INVALIDATION:
+            self.clear()
+            return
+        changed_files = {path for path, _ in changes}
+        new_names = [name for _, names in changes if names for name in names]
+        stale = [
+            key for key, (_, files, predicate) in self._entries.items()
+            if not files.isdisjoint(changed_files) or any(predicate(name) for name in new_names)
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def clear(self):
+        """清空缓存"""
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        获取缓存指标
+
+        Returns:
+            {"hits", "misses", "hit_rate", "evictions", "invalidations", "size", "max_entries"}
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+def _result_files(result: Any) -> FrozenSet[str]:
+    """收集查询结果中出现的所有文件路径"""
+    files = set()
+
+    def collect(value):
+        if isinstance(value, dict):
+            if isinstance(value.get("file_path"), str):
+                files.add(value["file_path"])
+            for item in value.values():
+                if isinstance(item, (dict, list)):
+                    collect(item)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+
+    collect(result)
+    return frozenset(files)
+
+
+class CachedSymbolDatabase(SymbolDatabase):
+    """
+    带LRU查询缓存的符号数据库
+
+    缓存 get_symbol_info、get_class_and_members 及各类按名称搜索的结果，
+    重建索引后通过文件代数精确失效，保证不会返回过期结果。
+    返回值为缓存结果的深拷贝，调用方修改不会污染缓存。
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 1024):
+        """
+        Args:
+            db_path: 数据库路径
+            max_entries: 缓存记录数上限
+        """
+        super().__init__(db_path)
+        self.cache = QueryCache(max_entries)
+        self._generation = self.get_generation()
+        self._data_version = self._read_data_version()
+        self._dirty = False
+
+    def _read_data_version(self) -> int:
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _bump_generation(self, cursor: sqlite3.Cursor, file_path: str, symbol_names: Optional[List[str]] = None):
+        # 本连接自身的写入不会改变 data_version，需要单独标记
+        super()._bump_generation(cursor, file_path, symbol_names)
+        self._dirty = True
+
+    def _sync(self):
+        """检测数据库是否有新写入，有则按变更文件淘汰缓存"""
+        data_version = self._read_data_version()
+        if data_version == self._data_version and not self._dirty:
+            return
+        generation = self.get_generation()
+        if generation != self._generation:
+            self.cache.invalidate_changes(self.get_changes_since(self._generation))
+            self._generation = generation
+        # 失效完成后才记录版本，查询中途被中断时下次会重新检查
+        self._data_version = data_version
+        self._dirty = False
+
+    def _cached(self, key: Hashable, compute: Callable[[], Any], predicate: Callable[[str], bool]) -> Any:
+        self._sync()
+        hit, value = self.cache.get(key)
+        if not hit:
+            value = compute()
+            self.cache.put(key, value, _result_files(value), predicate)
+        return copy.deepcopy(value)
+
+    def get_symbol_info(self, symbol_name: str, file_path: Optional[str] = None) -> List[Dict]:
+        return self._cached(
+            ("get_symbol_info", symbol_name, file_path),
+            lambda: super(CachedSymbolDatabase, self).get_symbol_info(symbol_name, file_path),
+            lambda name: name == symbol_name,
+        )
+
+    def get_class_and_members(self, class_name: str) -> Dict:
+        member_match = _like_matcher(f"{class_name}.%")
+        return self._cached(
+            ("get_class_and_members", class_name),
+            lambda: super(CachedSymbolDatabase, self).get_class_and_members(class_name),
+            lambda name: name == class_name or member_match(name),
+        )
+
+    def search_symbols_by_name(self, name: str, symbol_type: str = None) -> List[Dict]:
+        return self._cached(
+            ("search_symbols_by_name", name, symbol_type),
+            lambda: super(CachedSymbolDatabase, self).search_symbols_by_name(name, symbol_type),
+            _like_matcher(f"%{name}%"),
+        )
+
+    def search_symbols_ranked(self, name: str, symbol_type: str = None, limit: int = 50) -> List[Dict]:
+        return self._cached(
+            ("search_symbols_ranked", name, symbol_type, limit),
+            lambda: super(CachedSymbolDatabase, self).search_symbols_ranked(name, symbol_type, limit),
+            _like_matcher(f"%{name}%"),
+        )
+
+    def search_symbols_page(self, name: str, symbol_type: str = None,
+                            page_size: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        return self._cached(
+            ("search_symbols_page", name, symbol_type, page_size, cursor),
+            lambda: super(CachedSymbolDatabase, self).search_symbols_page(name, symbol_type, page_size, cursor),
+            _like_matcher(f"%{name}%"),
+        )
+
+    def cache_metrics(self) -> Dict[str, Any]:
+        """获取查询缓存的命中/未命中等指标"""
+        return self.cache.metrics()
+
+    def clear_cache(self):
+        """手动清空查询缓存"""
+        self.cache.clear()
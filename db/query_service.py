@@ -0,0 +1,155 @@
+"""
+本模块提供长期复用的语义查询服务
+
+语义搜索的耗时主要在查询文本的嵌入请求上。SemanticQueryService 复用同一个 SymbolVectorStore，
+并维护两级 LRU 缓存：
+- 规范化查询文本 -> 查询向量：重复或仅修改 top_k/过滤条件的查询不再请求嵌入接口
+- (规范化查询文本, top_k, 过滤条件) -> 结果ID、最相似块ID和分数：完全相同的查询只需按块ID取回文档
+
+集合版本（SymbolVectorStore.collection_version，任何进程写入后都会变化）变化时清空结果缓存；查询向量与集合内容无关，不受影响。
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from db.SymbolVectorStore import SymbolVectorStore, build_where
+
+
+def normalize_query(text: str) -> str:
+    """规范化查询文本：合并空白并统一大小写"""
+    return " ".join(text.split()).casefold()
+
+
+class _LRU:
+    """简单的有界 LRU 映射"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SemanticQueryService:
+    """
+    带查询向量缓存和结果缓存的语义查询服务（线程安全）
+    """
+
+    def __init__(self, store: SymbolVectorStore, max_embeddings: int = 1024, max_results: int = 256):
+        """
+        Args:
+            store: 长期复用的向量存储
+            max_embeddings: 查询向量缓存条数上限
+            max_results: 结果缓存条数上限
+        """
+        self.store = store
+        self._embeddings = _LRU(max_embeddings)
+        self._results = _LRU(max_results)
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _query_embedding(self, normalized: str) -> np.ndarray:
+        with self._lock:
+            embedding = self._embeddings.get(normalized)
+        if embedding is None:
+            embedding = self.store.embed_texts([normalized])[0]
+            with self._lock:
+                self._embeddings.put(normalized, embedding)
+        return embedding
+
+    def _check_version(self):
+        """集合内容变化时清空结果缓存"""
+        version = self.store.collection_version()
+        with self._lock:
+            if version != self._version:
+                self._results.clear()
+                self._version = version
+
+    def query(self, query_text: str, top_k: int = 5, where: Optional[Dict] = None, **filters) -> List[Dict]:
+        """
+        查询相似符号（返回格式同 SymbolVectorStore.query_symbols）
+
+        Args:
+            query_text: 查询文本
+            top_k: 返回结果数量
+            where: 过滤条件
+            **filters: 过滤参数 project/path_prefix/symbol_type/parent_class/language（见 build_where）
+
+        Returns:
+            相似符号列表，包含文档ID、符号、摘要和相似度分数
+        """
+        where = build_where(where, **filters)
+        normalized = normalize_query(query_text)
+        key = (normalized, top_k, json.dumps(where, sort_keys=True, ensure_ascii=False) if where else None)
+        self._check_version()
+        with self._lock:
+            cached: Optional[List[Tuple[str, str, float]]] = self._results.get(key)
+
+        if cached is not None:
+            chunk_ids = [chunk_id for _, chunk_id, _ in cached]
+            records = self.store.collection.get(ids=chunk_ids, include=["documents", "metadatas"])
+            found = {
+                chunk_id: (metadata, document)
+                for chunk_id, metadata, document in zip(records["ids"], records["metadatas"], records["documents"])
+            }
+            # 缓存的ID若已被删除则回退为重新查询
+            if len(found) == len(chunk_ids):
+                return [{
+                    "id": doc_id,
+                    "symbol": found[chunk_id][0]["symbol"],
+                    "summary": found[chunk_id][1],
+                    "score": score,
+                    "chunk_id": chunk_id
+                } for doc_id, chunk_id, score in cached]
+
+        hits = self.store.query_embeddings([self._query_embedding(normalized)], top_k, where)[0]
+        with self._lock:
+            self._results.put(key, [(hit["id"], hit["chunk_id"], hit["score"]) for hit in hits])
+        return hits
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._embeddings.clear()
+            self._results.clear()
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        获取缓存指标
+
+        Returns:
+            {"embedding_hits", "embedding_misses", "embeddings", "result_hits", "result_misses", "results"}
+        """
+        with self._lock:
+            return {
+                "embedding_hits": self._embeddings.hits,
+                "embedding_misses": self._embeddings.misses,
+                "embeddings": len(self._embeddings),
+                "result_hits": self._results.hits,
+                "result_misses": self._results.misses,
+                "results": len(self._results),
+            }
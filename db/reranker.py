@@ -0,0 +1,259 @@
+"""
+本模块提供两阶段检索的本地重排器
+
+第一阶段由向量检索取回较多候选（只用余弦相似度，名称完全匹配的符号常排在弱相关符号之后），
+第二阶段在本地用廉价特征对候选重新打分，不产生额外的嵌入请求：
+- semantic: 向量相似度
+- name: 查询词元与符号名词元（按 camelCase / snake_case 拆分）的重合比例
+- bm25: 查询词元在候选描述上的 BM25（以候选集作为语料统计文档频率）
+- type: 符号类型先验
+- clicks: 符号被点击次数（log 归一化到候选集内最大值）
+
+所有特征按候选批次计算为矩阵，最终分数为特征矩阵与权重向量的乘积。
+特征按代价从低到高计算，超出延迟预算时跳过剩余特征（只用已算出的特征排序）。
+"""
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 特征顺序即计算顺序（代价从低到高）
+FEATURES = ("semantic", "name", "type", "clicks", "bm25")
+
+DEFAULT_WEIGHTS = {"semantic": 1.0, "name": 0.3, "type": 1.0, "clicks": 0.1, "bm25": 0.2}
+
+# 符号类型先验（加到分数上，其他类型为 0）
+DEFAULT_TYPE_PRIORS = {
+    "class": 0.05,
+    "function": 0.05,
+    "method": 0.03,
+    "attribute": -0.02,
+    "variable": -0.03,
+    "module_doc": -0.05,
+}
+
+# 描述文本中的类型行（见 ui.functions.vector_store._build_symbol_description）
+_TYPE_LINE_RE = re.compile(r"^类型: (\S+)", re.MULTILINE)
+
+
+# 标识符整体 / 中文连续片段；标识符内部按 camelCase、缩写、数字拆分（与 HashingEmbeddingBackend 的切分一致）
+_CHUNK_RE = re.compile(r"[A-Za-z0-9_]+|[一-鿿]+")
+_IDENT_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+@lru_cache(maxsize=65536)
+def terms(text: str) -> Tuple[str, ...]:
+    """
+    提取用于词面匹配的词元：完整标识符、标识符片段（小写）和中文单字/双字
+
+    同一候选的描述在不同查询中反复出现，结果按文本缓存。
+
+    Returns:
+        词元元组（保留重复，用于词频统计）
+    """
+    tokens = []
+    for chunk in _CHUNK_RE.findall(text):
+        if '一' <= chunk[0] <= '鿿':
+            tokens.extend(chunk)
+            tokens.extend(chunk[i:i + 2] for i in range(len(chunk) - 1))
+            continue
+        tokens.append(chunk.lower())
+        parts = _IDENT_PART_RE.findall(chunk)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tuple(tokens)
+
+
+def _hit_name(hit: Dict) -> str:
+    """候选的符号名（向量检索结果或回表后的符号记录）"""
+    return hit.get("symbol") or hit.get("symbol_name") or ""
+
+
+def _hit_text(hit: Dict) -> str:
+    """候选的描述文本；向量集合不保存文档时使用回表得到的 doc_text"""
+    text = hit.get("summary") or hit.get("doc_text") or ""
+    return text.decode('utf-8', errors='replace') if isinstance(text, bytes) else text
+
+
+def _hit_type(hit: Dict) -> Optional[str]:
+    """候选的符号类型"""
+    if hit.get("symbol_type"):
+        return hit["symbol_type"]
+    match = _TYPE_LINE_RE.search(hit.get("summary") or "")
+    return match.group(1) if match else None
+
+
+class ClickStore:
+    """
+    符号点击计数
+
+    ## clicks 表
+
+    | 字段名 | 数据类型 | 描述 |
+    |--------|----------|------|
+    | vector_id | TEXT | 符号的向量ID，主键 |
+    | count | INTEGER | 点击次数 |
+    | last_clicked | REAL | 最近点击时间戳 |
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 数据库路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS clicks (
+            vector_id TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            last_clicked REAL NOT NULL
+        )
+        ''')
+        self.conn.commit()
+
+    def record(self, vector_id: str):
+        """
+        记录一次点击
+
+        Args:
+            vector_id: 符号的向量ID
+        """
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO clicks (vector_id, count, last_clicked) VALUES (?, 1, ?) '
+                'ON CONFLICT(vector_id) DO UPDATE SET count = count + 1, last_clicked = excluded.last_clicked',
+                (vector_id, time.time())
+            )
+            self.conn.commit()
+
+    def counts(self, vector_ids: Sequence[str]) -> Dict[str, int]:
+        """
+        批量读取点击次数
+
+        Args:
+            vector_ids: 符号的向量ID列表
+
+        Returns:
+            {向量ID: 点击次数}，没有点击记录的ID不在结果中
+        """
+        found = {}
+        unique = list(dict.fromkeys(vector_ids))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self.conn.execute(
+                    f'SELECT vector_id, count FROM clicks WHERE vector_id IN ({placeholders})', chunk
+                ).fetchall())
+        return found
+
+    def close(self):
+        self.conn.close()
+
+
+class LocalReranker:
+    """
+    基于本地特征的候选重排器（线程安全，无外部请求）
+    """
+
+    def __init__(
+        self,
+        clicks: Optional[ClickStore] = None,
+        weights: Optional[Dict[str, float]] = None,
+        type_priors: Optional[Dict[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75
+    ):
+        """
+        Args:
+            clicks: 可选，点击计数；未提供时不使用点击特征
+            weights: 特征权重，未提供的特征使用 DEFAULT_WEIGHTS
+            type_priors: 符号类型先验，默认 DEFAULT_TYPE_PRIORS
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+        """
+        self.clicks = clicks
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.type_priors = DEFAULT_TYPE_PRIORS if type_priors is None else type_priors
+        self.k1 = k1
+        self.b = b
+
+    def _feature(self, name: str, query_terms: List[str], hits: List[Dict]) -> np.ndarray:
+        """计算一列特征（长度为候选数）"""
+        if name == "semantic":
+            return np.array([hit["score"] for hit in hits], dtype=np.float32)
+
+        if name == "name":
+            query_set = set(query_terms)
+            return np.array([
+                len(query_set.intersection(terms(_hit_name(hit)))) / len(query_set)
+                for hit in hits
+            ], dtype=np.float32)
+
+        if name == "type":
+            return np.array([self.type_priors.get(_hit_type(hit), 0.0) for hit in hits], dtype=np.float32)
+
+        if name == "clicks":
+            if self.clicks is None:
+                return np.zeros(len(hits), dtype=np.float32)
+            counts = self.clicks.counts([hit["id"] for hit in hits])
+            values = np.log1p(np.array([counts.get(hit["id"], 0) for hit in hits], dtype=np.float32))
+            peak = values.max()
+            return values / peak if peak > 0 else values
+
+        if name == "bm25":
+            vocabulary = {term: index for index, term in enumerate(dict.fromkeys(query_terms))}
+            tf = np.zeros((len(hits), len(vocabulary)), dtype=np.float32)
+            lengths = np.zeros(len(hits), dtype=np.float32)
+            for row, hit in enumerate(hits):
+                doc_terms = terms(_hit_text(hit))
+                lengths[row] = len(doc_terms)
+                for term, count in Counter(doc_terms).items():
+                    column = vocabulary.get(term)
+                    if column is not None:
+                        tf[row, column] = count
+            df = (tf > 0).sum(axis=0)
+            idf = np.log1p((len(hits) - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+            scores = (idf * tf * (self.k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+            peak = scores.max()
+            return scores / peak if peak > 0 else scores
+
+        raise ValueError(f"未知的特征: {name}")
+
+    def rerank(self, query_text: str, hits: List[Dict], top_k: int, budget_ms: float = 20) -> List[Dict]:
+        """
+        对候选重排
+
+        Args:
+            query_text: 查询文本
+            hits: 候选（格式同 SymbolVectorStore.query_symbols，或经 hydrate_hits 回表的符号记录）
+            top_k: 返回结果数量
+            budget_ms: 延迟预算（毫秒），超出后跳过剩余特征
+
+        Returns:
+            按重排分数降序的前 top_k 个候选，每项增加 rerank_score 字段
+        """
+        if not hits:
+            return []
+        deadline = time.monotonic() + budget_ms / 1000
+        query_terms = list(terms(query_text))
+        features = np.zeros((len(hits), len(FEATURES)), dtype=np.float32)
+        for column, name in enumerate(FEATURES):
+            if column and time.monotonic() > deadline:
+                break
+            if not query_terms and name in ("name", "bm25"):
+                continue
+            features[:, column] = self._feature(name, query_terms, hits)
+
+        scores = features @ np.array([self.weights[name] for name in FEATURES], dtype=np.float32)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [{**hits[index], "rerank_score": float(scores[index])} for index in order]
@@ -0,0 +1,436 @@
+"""
+本模块提供只读的符号索引快照
+
+快照把 SQLite 中的符号索引（以及可选的向量矩阵）打包成一个不可变的单文件，
+读取端通过 mmap 直接访问，打开时只解析固定长度的文件头，
+适合只做少量查询的短生命周期进程（命令行、Agent）。
+
+# 文件布局（小端序）
+
+| 区段 | 内容 |
+|------|------|
+| header | 魔数、版本、计数、各区段偏移 |
+| symbols | 按符号名(UTF-8字节序)排序的定长符号记录 |
+| files | 按文件路径排序的定长文件记录 |
+| file_symbols | 按文件分组的符号记录下标(u32) |
+| strings | 名称、路径等 UTF-8 字符串 |
+| payloads | 每个符号的紧凑JSON详情（文档、签名、基类、成员等） |
+| vectors | 可选，float32 向量矩阵，64字节对齐 |
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from db.sqlite import SymbolDatabase
+
+SNAPSHOT_MAGIC = b"SYMSNAP1"
+SNAPSHOT_VERSION = 1
+
+SYMBOL_TYPES = ('function', 'class', 'variable', 'module_doc', 'method', 'attribute')
+
+# magic, version, n_symbols, n_files, dim, n_vectors,
+# symbols_off, files_off, file_symbols_off, strings_off, payloads_off, vectors_off
+_HEADER = struct.Struct("<8sIIIIIQQQQQQ")
+# name_off, name_len, file_idx, type_code, lineno, end_lineno, payload_off, payload_len, vector_row
+_SYMBOL = struct.Struct("<QIIIiiQIi")
+# path_off, path_len, rel_off, rel_len, first, count
+_FILE = struct.Struct("<QIQIII")
+_INDEX = struct.Struct("<I")
+_ALIGN = 64
+
+
+class _StringPool:
+    """写入时使用的字符串/字节池"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def add(self, raw: bytes):
+        offset = len(self.data)
+        self.data += raw
+        return offset, len(raw)
+
+
+def _align(fh) -> int:
+    """将写入位置填充到 _ALIGN 字节边界"""
+    pos = fh.tell()
+    pad = (-pos) % _ALIGN
+    if pad:
+        fh.write(b"\0" * pad)
+    return pos + pad
+
+
+def export_snapshot(db_path: str, output_path: str, vector_store=None) -> Dict[str, int]:
+    """
+    将符号数据库导出为只读快照文件
+
+    Args:
+        db_path: SQLite 符号数据库路径
+        output_path: 快照输出路径（先写临时文件，再原子替换）
+        vector_store: 可选，SymbolVectorStore 实例；提供时一并导出向量矩阵
+
+    Returns:
+        导出统计信息 {"symbols": int, "files": int, "vectors": int}
+    """
+    with SymbolDatabase(db_path) as db:
+        cursor = db.conn.cursor()
+        cursor.execute('SELECT id, file_path, relative_path FROM files')
+        file_rows = sorted(cursor.fetchall(), key=lambda r: r[1].encode('utf-8'))
+        file_index = {row[0]: i for i, row in enumerate(file_rows)}
+
+        cursor.execute('''
+        SELECT file_id, symbol_name, symbol_type, lineno, end_lineno,
+               doc_text, compressed, signature_json, bases_json,
+               members_json, annotation, vector_store_id
+        FROM symbols
+        ''')
+        symbol_rows = []
+        for (file_id, name, sym_type, lineno, end_lineno, doc_data, compressed,
+             sig_json, bases_json, members_json, annotation, vector_store_id) in cursor.fetchall():
+            if file_id not in file_index:
+                continue
+            if doc_data:
+                doc_text = db._decompress_text(doc_data) if compressed else bytes(doc_data).decode('utf-8')
+            else:
+                doc_text = ""
+            payload = {"doc": doc_text}
+            if annotation:
+                payload["annotation"] = annotation
+            if vector_store_id:
+                payload["vector_store_id"] = vector_store_id
+            if sig_json:
+                payload["signature"] = json.loads(sig_json)
+            if bases_json:
+                payload["bases"] = json.loads(bases_json)
+            if members_json:
+                payload["members"] = json.loads(members_json)
+            symbol_rows.append((name.encode('utf-8'), file_index[file_id], sym_type,
+                                lineno, end_lineno, payload, vector_store_id))
+        cursor.close()
+
+    symbol_rows.sort(key=lambda r: (r[0], r[1], r[3] or 0))
+
+    # 向量矩阵（可选）
+    vector_ids = [r[6] for r in symbol_rows if r[6]] if vector_store is not None else []
+    embeddings = vector_store.get_embeddings(vector_ids) if vector_ids else {}
+    dim = len(next(iter(embeddings.values()))) if embeddings else 0
+
+    strings = _StringPool()
+    payloads = _StringPool()
+    vector_rows: List[List[float]] = []
+
+    symbol_records = bytearray()
+    for name, file_idx, sym_type, lineno, end_lineno, payload, vector_store_id in symbol_rows:
+        name_off, name_len = strings.add(name)
+        payload_off, payload_len = payloads.add(
+            json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        vector_row = -1
+        if vector_store_id in embeddings:
+            vector_row = len(vector_rows)
+            vector_rows.append(embeddings[vector_store_id])
+        type_code = SYMBOL_TYPES.index(sym_type) if sym_type in SYMBOL_TYPES else 0xFFFFFFFF
+        symbol_records += _SYMBOL.pack(
+            name_off, name_len, file_idx, type_code,
+            lineno if lineno is not None else -1,
+            end_lineno if end_lineno is not None else -1,
+            payload_off, payload_len, vector_row)
+
+    # 按文件分组的符号下标
+    by_file: List[List[int]] = [[] for _ in file_rows]
+    for i, row in enumerate(symbol_rows):
+        by_file[row[1]].append(i)
+
+    file_records = bytearray()
+    file_symbols = bytearray()
+    first = 0
+    for (_, file_path, relative_path), members in zip(file_rows, by_file):
+        path_off, path_len = strings.add(file_path.encode('utf-8'))
+        rel_off, rel_len = strings.add((relative_path or "").encode('utf-8'))
+        file_records += _FILE.pack(path_off, path_len, rel_off, rel_len, first, len(members))
+        for idx in members:
+            file_symbols += _INDEX.pack(idx)
+        first += len(members)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as fh:
+        fh.write(b"\0" * _HEADER.size)
+        symbols_off = _align(fh)
+        fh.write(symbol_records)
+        files_off = _align(fh)
+        fh.write(file_records)
+        file_symbols_off = _align(fh)
+        fh.write(file_symbols)
+        strings_off = _align(fh)
+        fh.write(strings.data)
+        payloads_off = _align(fh)
+        fh.write(payloads.data)
+        vectors_off = _align(fh)
+        for vector in vector_rows:
+            fh.write(struct.pack(f"<{dim}f", *vector))
+        fh.seek(0)
+        fh.write(_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(symbol_rows), len(file_rows),
+            dim, len(vector_rows), symbols_off, files_off, file_symbols_off,
+            strings_off, payloads_off, vectors_off))
+    os.replace(tmp_path, output_path)
+
+    return {"symbols": len(symbol_rows), "files": len(file_rows), "vectors": len(vector_rows)}
+
+
+class SymbolSnapshot:
+    """
+    只读符号快照
+
+    打开时只读取文件头，所有查询直接在 mmap 上按偏移解码，
+    支持符号名精确/前缀查找、文件列表及文件内符号查询。
+    """
+
+    def __init__(self, snapshot_path: str):
+        """
+        打开快照文件
+
+        Args:
+            snapshot_path: 快照文件路径
+        """
+        self.snapshot_path = snapshot_path
+        self._fh = open(snapshot_path, 'rb')
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.symbol_count, self.file_count, self.dim, self.vector_count,
+         self._symbols_off, self._files_off, self._file_symbols_off,
+         self._strings_off, self._payloads_off, self._vectors_off) = _HEADER.unpack_from(self._mm, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"无效的快照文件: {snapshot_path}")
+
+    # ========== 底层解码 ==========
+
+    def _symbol_record(self, idx: int):
+        return _SYMBOL.unpack_from(self._mm, self._symbols_off + idx * _SYMBOL.size)
+
+    def _name_bytes(self, idx: int) -> bytes:
+        name_off, name_len = _SYMBOL.unpack_from(self._mm, self._symbols_off + idx * _SYMBOL.size)[:2]
+        start = self._strings_off + name_off
+        return self._mm[start:start + name_len]
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_off + offset
+        return self._mm[start:start + length].decode('utf-8')
+
+    def _file_record(self, idx: int):
+        return _FILE.unpack_from(self._mm, self._files_off + idx * _FILE.size)
+
+    def _file_path(self, idx: int) -> str:
+        path_off, path_len = self._file_record(idx)[:2]
+        return self._string(path_off, path_len)
+
+    def _materialize(self, idx: int) -> Dict[str, Any]:
+        """将符号记录解码为与 SymbolDatabase.get_symbol_info 相同结构的字典"""
+        (name_off, name_len, file_idx, type_code, lineno, end_lineno,
+         payload_off, payload_len, vector_row) = self._symbol_record(idx)
+        start = self._payloads_off + payload_off
+        payload = json.loads(self._mm[start:start + payload_len])
+        info = {
+            "symbol_name": self._string(name_off, name_len),
+            "symbol_type": SYMBOL_TYPES[type_code] if type_code < len(SYMBOL_TYPES) else None,
+            "lineno": lineno if lineno >= 0 else None,
+            "end_lineno": end_lineno if end_lineno >= 0 else None,
+            "doc": payload.pop("doc", ""),
+            "file_path": self._file_path(file_idx),
+            "annotation": payload.pop("annotation", None),
+            "vector_store_id": payload.pop("vector_store_id", None),
+        }
+        info.update(payload)
+        info["vector_row"] = vector_row if vector_row >= 0 else None
+        return info
+
+    def _lower_bound(self, key: bytes) -> int:
+        """二分查找第一个名称 >= key 的记录下标"""
+        lo, hi = 0, self.symbol_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # ========== 查询接口 ==========
+
+    def lookup(self, symbol_name: str) -> List[Dict[str, Any]]:
+        """
+        精确查找符号
+
+        Args:
+            symbol_name: 符号名称
+
+        Returns:
+            符号信息字典列表
+        """
+        key = symbol_name.encode('utf-8')
+        results = []
+        idx = self._lower_bound(key)
+        while idx < self.symbol_count and self._name_bytes(idx) == key:
+            results.append(self._materialize(idx))
+            idx += 1
+        return results
+
+    def prefix_search(self, prefix: str, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """
+        按名称前缀查找符号，结果按名称排序
+
+        Args:
+            prefix: 名称前缀
+            limit: 返回结果数量上限，None 表示不限制
+
+        Returns:
+            符号信息字典列表
+        """
+        return list(self.iter_prefix(prefix, limit))
+
+    def iter_prefix(self, prefix: str, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """按名称前缀逐个产出符号"""
+        key = prefix.encode('utf-8')
+        idx = self._lower_bound(key)
+        produced = 0
+        while idx < self.symbol_count and (limit is None or produced < limit):
+            if not self._name_bytes(idx).startswith(key):
+                break
+            yield self._materialize(idx)
+            produced += 1
+            idx += 1
+
+    def list_files(self) -> List[Dict[str, Any]]:
+        """
+        列出快照中的所有文件
+
+        Returns:
+            文件信息列表 [{"file_path", "relative_path", "symbol_count"}, ...]
+        """
+        files = []
+        for i in range(self.file_count):
+            path_off, path_len, rel_off, rel_len, _, count = self._file_record(i)
+            files.append({
+                "file_path": self._string(path_off, path_len),
+                "relative_path": self._string(rel_off, rel_len) or None,
+                "symbol_count": count,
+            })
+        return files
+
+    def file_symbols(self, file_path: str) -> List[Dict[str, Any]]:
+        """
+        获取文件中的所有符号
+
+        Args:
+            file_path: 文件路径（会被规范化为绝对路径）
+
+        Returns:
+            符号信息字典列表，文件不存在时返回空列表
+        """
+        key = str(Path(file_path).resolve()).encode('utf-8')
+        lo, hi = 0, self.file_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            path_off, path_len = self._file_record(mid)[:2]
+            start = self._strings_off + path_off
+            if self._mm[start:start + path_len] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo >= self.file_count or self._file_path(lo).encode('utf-8') != key:
+            return []
+        first, count = self._file_record(lo)[4:]
+        base = self._file_symbols_off + first * _INDEX.size
+        return [
+            self._materialize(_INDEX.unpack_from(self._mm, base + i * _INDEX.size)[0])
+            for i in range(count)
+        ]
+
+    def vectors(self) -> Optional[memoryview]:
+        """
+        获取向量矩阵的零拷贝视图
+
+        Returns:
+            形状为 (vector_count, dim) 的 float32 memoryview；快照不含向量时返回 None。
+            可直接用 numpy.asarray() 包装而不发生复制。
+            关闭快照前需先释放（release）所有取得的视图。
+        """
+        if not self.vector_count:
+            return None
+        size = self.vector_count * self.dim * 4
+        view = memoryview(self._mm)[self._vectors_off:self._vectors_off + size]
+        return view.cast('f', shape=[self.vector_count, self.dim])
+
+    def vector(self, row: int) -> memoryview:
+        """
+        获取单个向量的零拷贝视图
+
+        Args:
+            row: 向量行号（符号信息中的 vector_row）
+
+        Returns:
+            长度为 dim 的 float32 memoryview
+        """
+        if not 0 <= row < self.vector_count:
+            raise IndexError(f"向量行号越界: {row}")
+        start = self._vectors_off + row * self.dim * 4
+        return memoryview(self._mm)[start:start + self.dim * 4].cast('f')
+
+    def close(self):
+        """关闭快照"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __len__(self):
+        return self.symbol_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="符号索引快照工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="导出快照")
+    export_parser.add_argument("--db", default="symbols.db", help="SQLite 符号数据库路径")
+    export_parser.add_argument("--out", default="symbols.snap", help="快照输出路径")
+    export_parser.add_argument("--vectors", help="向量存储路径，提供时一并导出向量矩阵")
+
+    lookup_parser = sub.add_parser("lookup", help="查询快照")
+    lookup_parser.add_argument("snapshot", help="快照文件路径")
+    lookup_parser.add_argument("name", help="符号名称")
+    lookup_parser.add_argument("-p", "--prefix", action="store_true", help="按前缀匹配")
+    lookup_parser.add_argument("-n", "--limit", type=int, default=20, help="前缀匹配结果数量上限")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        store = None
+        if args.vectors:
+            from db.SymbolVectorStore import SymbolVectorStore
+            store = SymbolVectorStore(persist_path=args.vectors)
+        stats = export_snapshot(args.db, args.out, store)
+        print(f"已导出 {stats['symbols']} 个符号、{stats['files']} 个文件、{stats['vectors']} 个向量到: {args.out}")
+    else:
+        with SymbolSnapshot(args.snapshot) as snapshot:
+            if args.prefix:
+                results = snapshot.prefix_search(args.name, args.limit)
+            else:
+                results = snapshot.lookup(args.name)
+            for info in results:
+                print(f"{info['symbol_name']} [{info['symbol_type']}] {info['file_path']}:{info['lineno']}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -5,13 +5,18 @@ import sqlite3
 import json
 import hashlib
 import os
+import base64
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 from datetime import datetime
 import zlib
 
 defult_db_path = "symbols.db"
 
+def escape_like(text: str) -> str:
+    """转义 LIKE 模式中的通配符（% 和 _）及转义符本身，配合 ESCAPE '\\' 使用"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 class SymbolDatabase:
     """
     __init__(self, db_path: str )
@@ -64,6 +69,19 @@ class SymbolDatabase:
     - `symbol_type` 限制为预定义的几种类型
     - 存储符号的位置信息（起始行和结束行）
     - 文档字符串和结构化信息（签名、基类、成员）以JSON格式存储
+
+    ## file_generations 表 (文件代数表)
+
+    ### 表结构
+    | 字段名 | 数据类型 | 约束 | 描述 |
+    |--------|----------|------|------|
+    | file_path | TEXT | PRIMARY KEY | 文件的绝对路径 |
+    | generation | INTEGER | NOT NULL | 文件最近一次变更时的全局代数 |
+    | symbol_names | TEXT |  | 变更后文件中符号名的JSON列表，文件删除时为NULL |
+
+    ### 说明
+    - `upsert_file_symbols`/`remove_file`/`delete_file` 在同一事务内递增代数
+    - 查询缓存据此判断哪些缓存结果因文件变更而失效（跨进程同样有效）
     """
     def __init__(self, db_path: str ):
         self.db_path = db_path if db_path else defult_db_path
@@ -107,13 +125,78 @@ class SymbolDatabase:
         ''')
         
         # 创建索引加速查询
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_symbol_name ON symbols(symbol_name)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_symbol_type ON symbols(symbol_type)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_path ON files(file_path)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_lineno ON symbols(lineno)')  # 添加行号索引
+        self._create_indexes(cursor)
+        
+        # 文件代数表：每次写入/删除文件时递增，用于查询缓存的精确失效
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS file_generations (
+            file_path TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL,
+            symbol_names TEXT
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generation ON file_generations(generation)')
         
         self.conn.commit()
     
+    # 二级索引定义，批量导入时可先删除、导入完成后统一重建
+    SECONDARY_INDEXES = {
+        "idx_symbol_name": "symbols(symbol_name)",
+        "idx_symbol_type": "symbols(symbol_type)",
+        "idx_file_path": "files(file_path)",
+        "idx_lineno": "symbols(lineno)",  # 行号索引
+        "idx_vector_store_id": "symbols(vector_store_id)",  # 向量检索结果回表
+    }
+    
+    def _create_indexes(self, cursor: sqlite3.Cursor):
+        """创建二级索引"""
+        for index_name, target in self.SECONDARY_INDEXES.items():
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {target}')
+    
+    def _drop_indexes(self, cursor: sqlite3.Cursor):
+        """删除二级索引（用于批量导入）"""
+        for index_name in self.SECONDARY_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS {index_name}')
+    
+    def _bump_generation(self, cursor: sqlite3.Cursor, file_path: str, symbol_names: Optional[List[str]] = None):
+        """
+        递增文件代数（需在写入事务提交前调用）
+        
+        参数:
+            cursor: 当前事务的游标
+            file_path: 发生变更的文件绝对路径
+            symbol_names: 文件当前的符号名列表，文件被删除时为None
+        """
+        cursor.execute('SELECT COALESCE(MAX(generation), 0) + 1 FROM file_generations')
+        generation = cursor.fetchone()[0]
+        cursor.execute(
+            'INSERT OR REPLACE INTO file_generations (file_path, generation, symbol_names) VALUES (?, ?, ?)',
+            (file_path, generation, json.dumps(symbol_names) if symbol_names is not None else None)
+        )
+    
+    def get_generation(self) -> int:
+        """获取数据库当前的全局代数（所有文件代数的最大值）"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(generation), 0) FROM file_generations')
+        return cursor.fetchone()[0]
+    
+    def get_changes_since(self, generation: int) -> List[Tuple[str, Optional[List[str]]]]:
+        """
+        获取指定代数之后发生变更的文件
+        
+        参数:
+            generation: 起始代数（不含）
+        
+        返回:
+            [(file_path, symbol_names), ...]，symbol_names 为None表示文件已删除
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT file_path, symbol_names FROM file_generations WHERE generation > ?',
+            (generation,)
+        )
+        return [(path, json.loads(names) if names is not None else None) for path, names in cursor.fetchall()]
+    
     def _compress_text(self, text: str) -> bytes:
         """压缩文本数据"""
         return zlib.compress(text.encode('utf-8'))
@@ -217,6 +300,7 @@ class SymbolDatabase:
             'UPDATE files SET last_updated = ?, file_hash = ? WHERE id = ?',
             (datetime.now().isoformat(), file_hash, file_id)
         )
+        self._bump_generation(cursor, file_path, [name for name, _ in symbols_info])
         cursor.close()
         self.conn.commit()
     
@@ -357,6 +441,85 @@ class SymbolDatabase:
             "symbols": symbols
         }
     
+    def get_file_vector_ids(self, file_path: str) -> List[str]:
+        """
+        获取文件中所有符号当前记录的向量存储ID
+        
+        参数:
+            file_path: 文件路径
+        
+        返回:
+            向量存储ID列表（不含空值）
+        """
+        file_path = str(Path(file_path).resolve())
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT s.vector_store_id
+        FROM symbols s
+        JOIN files f ON s.file_id = f.id
+        WHERE f.file_path = ? AND s.vector_store_id IS NOT NULL
+        ''', (file_path,))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def get_file_vector_id_map(self, file_path: str) -> Dict[str, str]:
+        """
+        获取文件中各符号当前记录的向量存储ID
+        
+        参数:
+            file_path: 文件路径
+        
+        返回:
+            {符号名: 向量存储ID}（不含没有向量的符号）
+        """
+        file_path = str(Path(file_path).resolve())
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT s.symbol_name, s.vector_store_id
+        FROM symbols s
+        JOIN files f ON s.file_id = f.id
+        WHERE f.file_path = ? AND s.vector_store_id IS NOT NULL
+        ''', (file_path,))
+        return dict(cursor.fetchall())
+    
+    def count_vector_ids(self) -> int:
+        """
+        统计带向量存储ID的符号数（用于校验重建后的向量集合）
+        
+        返回:
+            不同向量存储ID的数量
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT COUNT(DISTINCT vector_store_id) FROM symbols WHERE vector_store_id IS NOT NULL')
+        return cursor.fetchone()[0]
+    
+    def get_symbols_by_vector_ids(self, vector_store_ids: List[str]) -> Dict[str, Dict]:
+        """
+        按向量存储ID批量读取符号（走 idx_vector_store_id 索引）
+        
+        参数:
+            vector_store_ids: 向量存储ID列表
+        
+        返回:
+            {向量存储ID: 符号字段及 file_path、relative_path}，不存在的ID不在结果中
+        """
+        found = {}
+        ids = list(dict.fromkeys(vector_store_ids))
+        cursor = self.conn.cursor()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f'''
+            SELECT s.*, f.file_path, f.relative_path
+            FROM symbols s
+            JOIN files f ON s.file_id = f.id
+            WHERE s.vector_store_id IN ({placeholders})
+            ''', chunk)
+            columns = [col[0] for col in cursor.description]
+            for row in cursor.fetchall():
+                symbol = dict(zip(columns, row))
+                found[symbol["vector_store_id"]] = symbol
+        return found
+    
     def find_symbols(self, search_term: str, limit: int = 20) -> List[Dict]:
         """
         搜索符号（使用SQLite全文搜索）
@@ -401,6 +564,7 @@ class SymbolDatabase:
             file_id = file_record[0]
             cursor.execute('DELETE FROM symbols WHERE file_id = ?', (file_id,))
             cursor.execute('DELETE FROM files WHERE id = ?', (file_id,))
+            self._bump_generation(cursor, file_path)
             self.conn.commit()
     from typing import List, Dict, Optional, Union
 
@@ -458,6 +622,8 @@ class SymbolDatabase:
         """
         cursor = self.conn.cursor()
         cursor.execute("DELETE FROM files WHERE file_path = ?", (file_path,))
+        if cursor.rowcount:
+            self._bump_generation(cursor, file_path)
         self.conn.commit()
 
     def search_symbols_by_name(self, name: str, symbol_type: str = None) -> List[Dict]:
@@ -487,6 +653,137 @@ class SymbolDatabase:
         columns = [col[0] for col in cursor.description]
         return [dict(zip(columns,row)) for row in cursor.fetchall()]
     
+    def search_symbols_ranked(self, name: str, symbol_type: str = None, limit: int = 50) -> List[Dict]:
+        """按名称搜索符号并按匹配程度排序
+        
+        排序规则：完全匹配 < 忽略大小写匹配 < 前缀匹配 < 子串匹配，其次按名称长度、名称。
+        每条结果附带 `rank` 字段（0-3），便于多个数据库的结果合并排序。
+        
+        Args:
+            name: 要搜索的符号名称（支持模糊搜索）
+            symbol_type: 可选，限制符号类型
+            limit: 返回结果数量限制
+            
+        Returns:
+            匹配的符号信息列表（符号字段及 file_path、relative_path、rank）
+        """
+        query = (
+            "SELECT s.*, f.file_path, f.relative_path, "
+            "CASE WHEN s.symbol_name = ? THEN 0 "
+            "WHEN s.symbol_name LIKE ? ESCAPE '\\' THEN 1 "
+            "WHEN s.symbol_name LIKE ? ESCAPE '\\' THEN 2 "
+            "ELSE 3 END AS rank "
+            "FROM symbols s "
+            "JOIN files f ON s.file_id = f.id "
+            "WHERE s.symbol_name LIKE ? ESCAPE '\\'"
+        )
+        # 名称按字面匹配（_ 在标识符中很常见，不能作为通配符）
+        pattern = escape_like(name)
+        params: List[Any] = [name, pattern, f"{pattern}%", f"%{pattern}%"]
+        
+        if symbol_type:
+            query += " AND s.symbol_type = ?"
+            params.append(symbol_type)
+        
+        query += " ORDER BY rank, length(s.symbol_name), s.symbol_name, s.id LIMIT ?"
+        params.append(limit)
+        
+        cursor = self.conn.cursor()
+        cursor.execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _encode_page_cursor(name: str, symbol_type: Optional[str], last_name: str, last_id: int) -> str:
+        """将分页位置编码为不透明的续页令牌"""
+        payload = json.dumps([name, symbol_type, last_name, last_id], ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def _decode_page_cursor(cursor: str, name: str, symbol_type: Optional[str]) -> Tuple[str, int]:
+        """解析续页令牌，令牌与当前查询条件不符时抛出ValueError"""
+        try:
+            token_name, token_type, last_name, last_id = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"无效的分页令牌: {cursor}") from e
+        if token_name != name or token_type != symbol_type:
+            raise ValueError("分页令牌与查询条件不匹配")
+        return last_name, int(last_id)
+    
+    def search_symbols_page(self, name: str, symbol_type: str = None,
+                            page_size: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """按名称分页搜索符号（键集分页）
+        
+        结果按 (symbol_name, id) 稳定排序，每页只读取 page_size + 1 行，
+        内存和耗时与页大小相关，而与匹配总数无关。
+        
+        Args:
+            name: 要搜索的符号名称（支持模糊搜索）
+            symbol_type: 可选，限制符号类型
+            page_size: 每页结果数量
+            cursor: 可选，上一页返回的续页令牌
+            
+        Returns:
+            {
+                "results": [symbol_dict, ...],  # 符号字段及 file_path、relative_path
+                "next_cursor": str | None       # 没有更多结果时为None
+            }
+        """
+        query = (
+            "SELECT s.*, f.file_path, f.relative_path "
+            "FROM symbols s "
+            "JOIN files f ON s.file_id = f.id "
+            "WHERE s.symbol_name LIKE ?"
+        )
+        params: List[Any] = [f"%{name}%"]
+        
+        if symbol_type:
+            query += " AND s.symbol_type = ?"
+            params.append(symbol_type)
+        if cursor:
+            last_name, last_id = self._decode_page_cursor(cursor, name, symbol_type)
+            query += " AND (s.symbol_name, s.id) > (?, ?)"
+            params.extend([last_name, last_id])
+        
+        query += " ORDER BY s.symbol_name, s.id LIMIT ?"
+        params.append(page_size + 1)
+        
+        db_cursor = self.conn.cursor()
+        db_cursor.execute(query, params)
+        columns = [col[0] for col in db_cursor.description]
+        rows = [dict(zip(columns, row)) for row in db_cursor.fetchall()]
+        db_cursor.close()
+        
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = self._encode_page_cursor(name, symbol_type, last["symbol_name"], last["id"])
+        return {"results": rows, "next_cursor": next_cursor}
+    
+    def iter_search_symbols(self, name: str, symbol_type: str = None, page_size: int = 500) -> Iterator[Dict]:
+        """按名称流式搜索符号
+        
+        逐页读取并逐条产出结果，适合遍历大量匹配而不一次性加载到内存。
+        
+        Args:
+            name: 要搜索的符号名称（支持模糊搜索）
+            symbol_type: 可选，限制符号类型
+            page_size: 每次从数据库读取的行数
+            
+        Yields:
+            符号信息字典，顺序与 search_symbols_page 相同
+        """
+        # 流式遍历直接读库，不经过（子类的）查询缓存
+        cursor = None
+        while True:
+            page = SymbolDatabase.search_symbols_page(self, name, symbol_type, page_size, cursor)
+            yield from page["results"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+    
     def _get_stale_files(self) -> List[str]:
         """
         获取数据库中已不存在的文件
@@ -610,9 +907,10 @@ class SymbolDatabase:
         
         if not class_info:
             return None
+        columns = [col[0] for col in cursor.description]
             
         result = {
-            "class": dict(class_info),
+            "class": dict(zip(columns, class_info)),
             "methods": self.get_class_methods(class_name),
             "attributes": self.get_class_attributes(class_name)
         }
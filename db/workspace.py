@@ -0,0 +1,265 @@
+"""
+本模块提供按项目分片的符号工作区
+
+每个项目根目录对应一个独立的 SQLite 分片，工作区目录下的 `workspace.db`
+记录项目与分片的对应关系。查询时按需打开分片并扇出查询，合并排序后返回；
+单个项目可以独立重建或删除，不影响其它项目。
+
+# 目录结构
+
+    workspace_dir/
+        workspace.db              # 项目目录表
+        shards/<project_id>.db    # 每个项目一个分片
+"""
+import hashlib
+import heapq
+import os
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from db.query_cache import CachedSymbolDatabase
+from db.sqlite import SymbolDatabase
+from symbol.file_utils import scan_directory
+from symbol.symbols import extract_file_symbols
+
+
+def project_id(root_dir: Union[str, Path]) -> str:
+    """
+    根据项目根目录生成稳定的项目标识
+
+    格式为 "<目录名>-<绝对路径哈希前8位>"，同名目录不会冲突。
+    """
+    root_path = Path(root_dir).resolve()
+    digest = hashlib.sha1(str(root_path).encode('utf-8')).hexdigest()[:8]
+    return f"{root_path.name}-{digest}"
+
+
+def _remove_shard_files(shard_path: str):
+    """删除分片文件及其 WAL/日志文件"""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        path = shard_path + suffix
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class SymbolWorkspace:
+    """
+    分片符号工作区
+
+    Args:
+        workspace_dir: 工作区目录
+        max_open_shards: 同时保持打开的分片连接数上限（LRU）
+    """
+
+    def __init__(self, workspace_dir: str, max_open_shards: int = 8):
+        self.workspace_dir = workspace_dir
+        self.shard_dir = os.path.join(workspace_dir, "shards")
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.max_open_shards = max_open_shards
+        self._open_shards: "OrderedDict[str, CachedSymbolDatabase]" = OrderedDict()
+
+        self.conn = sqlite3.connect(os.path.join(workspace_dir, "workspace.db"))
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS projects (
+            project_id TEXT PRIMARY KEY,
+            root_path TEXT UNIQUE NOT NULL,
+            shard_path TEXT NOT NULL,
+            created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_indexed TIMESTAMP
+        )
+        ''')
+        self.conn.commit()
+
+    # ========== 项目管理 ==========
+
+    def register_project(self, root_dir: str) -> str:
+        """
+        登记项目（已登记时直接返回）
+
+        Args:
+            root_dir: 项目根目录
+
+        Returns:
+            项目标识
+        """
+        pid = project_id(root_dir)
+        shard_path = os.path.join(self.shard_dir, f"{pid}.db")
+        self.conn.execute(
+            'INSERT OR IGNORE INTO projects (project_id, root_path, shard_path) VALUES (?, ?, ?)',
+            (pid, str(Path(root_dir).resolve()), shard_path)
+        )
+        self.conn.commit()
+        return pid
+
+    def list_projects(self) -> List[Dict]:
+        """
+        获取所有已登记的项目
+
+        Returns:
+            项目信息字典列表
+        """
+        cursor = self.conn.execute(
+            'SELECT project_id, root_path, shard_path, created, last_indexed FROM projects ORDER BY project_id'
+        )
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _resolve_project(self, project: str) -> Dict:
+        """根据项目标识或根目录查找项目，不存在时抛出 KeyError"""
+        cursor = self.conn.execute(
+            'SELECT project_id, root_path, shard_path FROM projects WHERE project_id = ? OR root_path = ?',
+            (project, str(Path(project).resolve()))
+        )
+        row = cursor.fetchone()
+        if not row:
+            raise KeyError(f"未登记的项目: {project}")
+        return {"project_id": row[0], "root_path": row[1], "shard_path": row[2]}
+
+    def shard(self, project: str) -> CachedSymbolDatabase:
+        """
+        按需打开项目分片
+
+        Args:
+            project: 项目标识或根目录
+
+        Returns:
+            项目分片的数据库对象（由工作区管理生命周期，调用方不要关闭）
+        """
+        info = self._resolve_project(project)
+        pid = info["project_id"]
+        db = self._open_shards.get(pid)
+        if db is None:
+            db = CachedSymbolDatabase(info["shard_path"])
+            self._open_shards[pid] = db
+            while len(self._open_shards) > self.max_open_shards:
+                _, evicted = self._open_shards.popitem(last=False)
+                evicted.close()
+        else:
+            self._open_shards.move_to_end(pid)
+        return db
+
+    def _close_shard(self, pid: str):
+        db = self._open_shards.pop(pid, None)
+        if db is not None:
+            db.close()
+
+    def reindex_project(self, root_dir: str, file_filter: str = "*.py") -> Dict:
+        """
+        重建单个项目的分片
+
+        在临时分片中完成索引后原子替换旧分片，重建期间旧分片仍可查询，
+        其它项目不受影响。
+
+        Args:
+            root_dir: 项目根目录
+            file_filter: 文件匹配模式
+
+        Returns:
+            {"project_id": str, "files": int, "errors": [(file_path, error), ...]}
+        """
+        pid = self.register_project(root_dir)
+        shard_path = self._resolve_project(pid)["shard_path"]
+        tmp_path = f"{shard_path}.building"
+        _remove_shard_files(tmp_path)
+
+        files = scan_directory(root_dir, file_filter)
+        errors = []
+        with SymbolDatabase(tmp_path) as db:
+            for file_path in files:
+                try:
+                    symbols = extract_file_symbols(file_path)
+                    relative_path = Path(file_path).relative_to(Path(root_dir).resolve()).as_posix()
+                    db.upsert_file_symbols(file_path, symbols, None, relative_path)
+                except Exception as e:
+                    errors.append((file_path, str(e)))
+
+        self._close_shard(pid)
+        _remove_shard_files(shard_path)
+        os.replace(tmp_path, shard_path)
+        self.conn.execute(
+            'UPDATE projects SET last_indexed = ? WHERE project_id = ?',
+            (datetime.now().isoformat(), pid)
+        )
+        self.conn.commit()
+        return {"project_id": pid, "files": len(files), "errors": errors}
+
+    def drop_project(self, project: str):
+        """
+        删除项目及其分片
+
+        Args:
+            project: 项目标识或根目录
+        """
+        info = self._resolve_project(project)
+        self._close_shard(info["project_id"])
+        _remove_shard_files(info["shard_path"])
+        self.conn.execute('DELETE FROM projects WHERE project_id = ?', (info["project_id"],))
+        self.conn.commit()
+
+    # ========== 联合查询 ==========
+
+    def _target_projects(self, projects: Optional[Iterable[str]]) -> List[str]:
+        if projects is None:
+            return [p["project_id"] for p in self.list_projects()]
+        return [self._resolve_project(p)["project_id"] for p in projects]
+
+    def search_symbols(self, name: str, symbol_type: str = None, limit: int = 50,
+                       projects: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        在多个项目中按名称搜索符号
+
+        每个分片最多取 limit 条按匹配程度排序的结果，再全局归并取前 limit 条。
+
+        Args:
+            name: 要搜索的符号名称（支持模糊搜索）
+            symbol_type: 可选，限制符号类型
+            limit: 全局返回结果数量上限
+            projects: 可选，限定项目标识或根目录列表，默认所有项目
+
+        Returns:
+            符号信息列表，每条附带 project_id 与 rank 字段
+        """
+        per_shard = []
+        for pid in self._target_projects(projects):
+            rows = self.shard(pid).search_symbols_ranked(name, symbol_type, limit)
+            for row in rows:
+                row["project_id"] = pid
+            per_shard.append(rows)
+
+        def sort_key(row):
+            return (row["rank"], len(row["symbol_name"]), row["symbol_name"], row["project_id"], row["id"])
+
+        return list(heapq.merge(*per_shard, key=sort_key))[:limit]
+
+    def get_symbol_info(self, symbol_name: str, projects: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        在多个项目中精确查询符号
+
+        Args:
+            symbol_name: 符号名称
+            projects: 可选，限定项目标识或根目录列表，默认所有项目
+
+        Returns:
+            符号信息字典列表，每条附带 project_id 字段
+        """
+        results = []
+        for pid in self._target_projects(projects):
+            for info in self.shard(pid).get_symbol_info(symbol_name):
+                info["project_id"] = pid
+                results.append(info)
+        return results
+
+    def close(self):
+        """关闭所有分片及目录数据库"""
+        for pid in list(self._open_shards):
+            self._close_shard(pid)
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,77 @@
+"""
+本模块提供无界面的命令行索引器
+
+    python -m indexer.cli <目录> [--db symbols.db] [-j 8] [--include "*.py"] [--exclude "tests/*"]
+                                 [--incremental] [--no-embed] [--no-resume] [--progress jsonl]
+
+命令行参数、进度事件和运行语义与 indexer.pipeline 完全相同：所有索引入口都经过 IndexingPipeline，
+每个文件的阶段记入检查点日志、向量经发件箱写入，中断（如夜间构建被终止）后再次运行从检查点继续，
+SQLite 中不会留下没有向量的向量ID。
+"""
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+from indexer import pipeline
+from indexer.pipeline import IndexingPipeline
+from ui.functions.config import SYMBOLS_DB_FILE_PATH, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_TOKENS
+from db.config import EMBEDDING_CONCURRENCY
+
+
+def index_directory(
+    root_dir: str,
+    db_path: str = SYMBOLS_DB_FILE_PATH,
+    include: Iterable[str] = ("*.py",),
+    exclude: Iterable[str] = (),
+    workers: Optional[int] = None,
+    embed: bool = True,
+    embed_batch_size: int = EMBEDDING_BATCH_SIZE,
+    embed_batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+    embed_concurrency: int = EMBEDDING_CONCURRENCY,
+    vector_store_path: Optional[str] = None,
+    incremental: bool = False,
+    resume: bool = True,
+    progress: Optional[Callable[[Dict], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict:
+    """
+    索引目录（IndexingPipeline 的简便入口）
+
+    Args:
+        root_dir: 要索引的根目录
+        db_path: 符号库路径
+        include: 包含的 glob 模式
+        exclude: 排除的 glob 模式
+        workers: 解析进程数，默认CPU核数
+        embed: 是否嵌入符号描述；为 False 时只更新符号库，仍在的符号沿用已有的向量ID
+        embed_batch_size: 每个嵌入请求的最多条数
+        embed_batch_tokens: 每个嵌入请求的 token 数上限
+        embed_concurrency: 并发的嵌入请求数
+        vector_store_path: 向量存储目录，默认使用共享的向量存储（VECTOR_STORE_PATH）
+        incremental: 是否跳过上次索引后未修改的文件
+        resume: 是否从该目录上次未完成的运行继续
+        progress: 可选，进度回调，参数为事件字典（格式见 indexer.pipeline）
+        cancel: 可选，取消事件；置位后停止，下次运行从检查点继续
+
+    Returns:
+        done 事件字典（被取消时 canceled 为 True）
+    """
+    return IndexingPipeline(
+        root_dir,
+        db_path=db_path,
+        include=include,
+        exclude=exclude,
+        parse_workers=workers,
+        embed=embed,
+        embed_batch_size=embed_batch_size,
+        embed_batch_tokens=embed_batch_tokens,
+        embed_concurrency=embed_concurrency,
+        vector_store_path=vector_store_path,
+        incremental=incremental,
+        resume=resume,
+        progress=progress,
+        cancel=cancel
+    ).run()
+
+
+if __name__ == "__main__":
+    pipeline._main()
@@ -0,0 +1,250 @@
+"""
+本模块提供可恢复索引的检查点日志和向量发件箱
+
+长时间的索引中途中断（接口故障、休眠）后，下次运行从上次停下的位置继续：
+- 日志按运行记录每个文件完成的阶段（parsed、written），parsed 时保存解析结果，
+  恢复时已解析的文件不再解析，已写入的文件直接跳过
+- 每个文件的向量操作与它的符号、written 检查点在同一事务中写入 SQLite 中的发件箱，
+  提交后再应用到向量集合并清除；写入符号失败时回滚，发件箱中不会留下该文件的向量。
+  启动时先重放发件箱中残留的操作，两个存储因此总能对齐（向量的写入和删除都是幂等的）
+- 运行完成时清除其日志，并删除同一根目录更早的运行记录
+
+日志表和发件箱与符号表位于同一个 SQLite 库，写入符号的事务可以同时更新日志和发件箱。
+"""
+import json
+import time
+import zlib
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from db.sqlite import SymbolDatabase
+
+STAGES = ("parsed", "written")
+
+# 每次重放读取的发件箱条数
+OUTBOX_PAGE_SIZE = 1000
+
+
+class IndexJournal:
+    """
+    索引运行的检查点日志（使用符号库的连接，只能在创建该连接的线程中使用）
+
+    ## index_runs 表
+
+    | 字段名 | 数据类型 | 描述 |
+    |--------|----------|------|
+    | run_id | INTEGER | 运行ID，主键 |
+    | root | TEXT | 索引的根目录 |
+    | started | REAL | 开始时间戳 |
+    | finished | REAL | 完成时间戳，未完成（中断或取消）时为 NULL |
+
+    ## index_journal 表
+
+    | 字段名 | 数据类型 | 描述 |
+    |--------|----------|------|
+    | run_id | INTEGER | 运行ID |
+    | file_path | TEXT | 文件的绝对路径 |
+    | stage | TEXT | 已完成的阶段：parsed / written |
+    | mtime | REAL | 解析时文件的修改时间，文件此后被修改时检查点作废 |
+    | payload | BLOB | zlib 压缩的解析结果 JSON（written 后清空） |
+
+    ## vector_outbox 表
+
+    | 字段名 | 数据类型 | 描述 |
+    |--------|----------|------|
+    | id | INTEGER | 自增主键，按此顺序应用 |
+    | op | TEXT | upsert（写入块向量）/ trim（删除多余旧块）/ delete（删除符号及其块） |
+    | vector_id | TEXT | 块ID或符号的向量ID |
+    | document | TEXT | 块文本（upsert） |
+    | metadata | TEXT | 块元数据 JSON（upsert）；trim 时为 {"chunks": 新块数} |
+    | embedding | BLOB | float32 向量（upsert） |
+    """
+
+    def __init__(self, db: SymbolDatabase):
+        """
+        Args:
+            db: 符号数据库
+        """
+        self.conn = db.conn
+        self.conn.executescript('''
+        CREATE TABLE IF NOT EXISTS index_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            root TEXT NOT NULL,
+            started REAL NOT NULL,
+            finished REAL
+        );
+        CREATE TABLE IF NOT EXISTS index_journal (
+            run_id INTEGER NOT NULL,
+            file_path TEXT NOT NULL,
+            stage TEXT NOT NULL CHECK(stage IN ('parsed', 'written')),
+            mtime REAL,
+            payload BLOB,
+            PRIMARY KEY (run_id, file_path)
+        );
+        CREATE TABLE IF NOT EXISTS vector_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL CHECK(op IN ('upsert', 'trim', 'delete')),
+            vector_id TEXT NOT NULL,
+            document TEXT,
+            metadata TEXT,
+            embedding BLOB
+        );
+        ''')
+
+    # ========== 运行 ==========
+
+    def begin_run(self, root: str, resume: bool = True) -> Tuple[int, bool]:
+        """
+        开始一次运行：恢复该根目录最近一次未完成的运行，或新建运行
+
+        Args:
+            root: 索引的根目录（绝对路径）
+            resume: 为 False 时放弃未完成的运行并清除其日志
+
+        Returns:
+            (运行ID, 是否为恢复的运行)
+        """
+        row = self.conn.execute(
+            'SELECT run_id FROM index_runs WHERE root = ? AND finished IS NULL ORDER BY run_id DESC LIMIT 1',
+            (root,)
+        ).fetchone()
+        if row and resume:
+            return row[0], True
+        if row:
+            self.finish_run(row[0])
+        cursor = self.conn.execute('INSERT INTO index_runs (root, started) VALUES (?, ?)', (root, time.time()))
+        self.conn.commit()
+        return cursor.lastrowid, False
+
+    def finish_run(self, run_id: int):
+        """标记运行完成并清除其日志，同一根目录更早的运行记录一并删除（只保留最近一次完成的运行）"""
+        self.conn.execute('UPDATE index_runs SET finished = ? WHERE run_id = ?', (time.time(), run_id))
+        self.conn.execute(
+            'DELETE FROM index_runs WHERE run_id < ? AND root = (SELECT root FROM index_runs WHERE run_id = ?)',
+            (run_id, run_id)
+        )
+        # 已删除或已完成的运行残留的日志
+        self.conn.execute(
+            'DELETE FROM index_journal WHERE run_id NOT IN (SELECT run_id FROM index_runs WHERE finished IS NULL)'
+        )
+        self.conn.commit()
+
+    # ========== 检查点 ==========
+
+    def checkpoints(self, run_id: int) -> Dict[str, Tuple[str, float]]:
+        """
+        读取运行中各文件的检查点（不含解析结果）
+
+        Returns:
+            {file_path: (阶段, 修改时间)}
+        """
+        return {
+            file_path: (stage, mtime) for file_path, stage, mtime in self.conn.execute(
+                'SELECT file_path, stage, mtime FROM index_journal WHERE run_id = ?', (run_id,)
+            )
+        }
+
+    def load_payload(self, run_id: int, file_path: str) -> Optional[Dict]:
+        """读取检查点保存的解析结果"""
+        row = self.conn.execute(
+            'SELECT payload FROM index_journal WHERE run_id = ? AND file_path = ?', (run_id, file_path)
+        ).fetchone()
+        if not row or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def record(self, run_id: int, items: Iterable[Dict], stage: str, commit: bool = True):
+        """
+        记录文件完成的阶段
+
+        Args:
+            run_id: 运行ID
+            items: 解析结果（至少包含 path 和 mtime）；parsed 阶段保存整个解析结果
+            stage: parsed / written
+            commit: 是否立即提交；为 False 时随同一连接上的下一次提交生效
+        """
+        if stage not in STAGES:
+            raise ValueError(f"未知的阶段: {stage}")
+        for item in items:
+            if stage == "parsed":
+                payload = zlib.compress(json.dumps(item, ensure_ascii=False).encode('utf-8'))
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO index_journal (run_id, file_path, stage, mtime, payload) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (run_id, item["path"], stage, item["mtime"], payload)
+                )
+            else:
+                # 写入后不再需要解析结果
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO index_journal (run_id, file_path, stage, mtime) VALUES (?, ?, ?, ?)',
+                    (run_id, item["path"], stage, item["mtime"])
+                )
+        if commit:
+            self.conn.commit()
+
+    # ========== 向量发件箱 ==========
+
+    def enqueue_upserts(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        """加入待写入的块向量（不提交）"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.conn.executemany(
+            "INSERT INTO vector_outbox (op, vector_id, document, metadata, embedding) VALUES ('upsert', ?, ?, ?, ?)",
+            [(doc_id, document, json.dumps(metadata, ensure_ascii=False), vector.tobytes())
+             for doc_id, vector, document, metadata in zip(ids, embeddings, documents, metadatas)]
+        )
+
+    def enqueue_trims(self, chunk_counts: Dict[str, int]):
+        """加入删除多余旧块的操作（不提交）"""
+        self.conn.executemany(
+            "INSERT INTO vector_outbox (op, vector_id, metadata) VALUES ('trim', ?, ?)",
+            [(doc_id, json.dumps({"chunks": chunks})) for doc_id, chunks in chunk_counts.items()]
+        )
+
+    def enqueue_deletes(self, doc_ids: Iterable[str]):
+        """加入删除符号（连同其全部块）的操作（不提交）"""
+        self.conn.executemany(
+            "INSERT INTO vector_outbox (op, vector_id) VALUES ('delete', ?)",
+            [(doc_id,) for doc_id in doc_ids]
+        )
+
+    def pending_outbox(self) -> int:
+        """发件箱中尚未应用的操作数"""
+        return self.conn.execute('SELECT COUNT(*) FROM vector_outbox').fetchone()[0]
+
+    def apply_outbox(self, store) -> int:
+        """
+        按顺序把发件箱中的操作应用到向量集合，成功后从发件箱删除
+
+        Args:
+            store: SymbolVectorStore
+
+        Returns:
+            应用的操作数
+        """
+        applied = 0
+        while True:
+            rows = self.conn.execute(
+                'SELECT id, op, vector_id, document, metadata, embedding FROM vector_outbox ORDER BY id LIMIT ?',
+                (OUTBOX_PAGE_SIZE,)
+            ).fetchall()
+            if not rows:
+                return applied
+            # 相邻的同类操作合并为一次调用
+            for op, group in groupby(rows, key=lambda row: row[1]):
+                group = list(group)
+                if op == "upsert":
+                    store.upsert_embeddings(
+                        [row[2] for row in group],
+                        np.stack([np.frombuffer(row[5], dtype=np.float32) for row in group]),
+                        [row[3] for row in group],
+                        [json.loads(row[4]) for row in group]
+                    )
+                elif op == "trim":
+                    store.delete_stale_chunks({row[2]: json.loads(row[4])["chunks"] for row in group})
+                else:
+                    store.delete_symbols([row[2] for row in group])
+            self.conn.execute('DELETE FROM vector_outbox WHERE id <= ?', (rows[-1][0],))
+            self.conn.commit()
+            applied += len(rows)
@@ -0,0 +1,243 @@
+"""
+本模块提供并行分片构建索引
+
+SQLite 同一时刻只允许一个写连接。全量重建大型仓库时，
+每个工作进程把解析结果写入自己的临时 SQLite 分片，
+最后由合并步骤 ATTACH 所有分片，在一个事务内批量拷贝到主库，
+并在拷贝完成后统一重建二级索引。
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from db.sqlite import SymbolDatabase
+from symbol.file_utils import scan_directory
+from symbol.symbols import extract_file_symbols
+
+# SQLite 默认最多同时 ATTACH 10 个数据库
+MAX_ATTACHED = 10
+
+# 工作进程内的分片连接（每个进程一个）
+_worker_db: Optional[SymbolDatabase] = None
+
+
+def _init_worker(shard_dir: str):
+    """工作进程初始化：打开本进程专属的临时分片"""
+    global _worker_db
+    shard_path = os.path.join(shard_dir, f"shard-{os.getpid()}.db")
+    _worker_db = SymbolDatabase(shard_path)
+    # 临时分片不需要崩溃保护
+    _worker_db.conn.execute('PRAGMA journal_mode = OFF')
+    _worker_db.conn.execute('PRAGMA synchronous = OFF')
+    cursor = _worker_db.conn.cursor()
+    _worker_db._drop_indexes(cursor)
+    _worker_db.conn.commit()
+
+
+def _index_chunk(file_paths: List[str], root_dir: str) -> Tuple[str, int, List[Tuple[str, str]]]:
+    """
+    在工作进程中解析一批文件并写入本进程分片
+
+    Returns:
+        (分片路径, 成功文件数, [(file_path, error), ...])
+    """
+    indexed = 0
+    errors = []
+    root_path = Path(root_dir).resolve()
+    for file_path in file_paths:
+        try:
+            symbols = extract_file_symbols(file_path)
+            relative_path = Path(file_path).relative_to(root_path).as_posix()
+            _worker_db.upsert_file_symbols(file_path, symbols, None, relative_path)
+            indexed += 1
+        except Exception as e:
+            errors.append((file_path, str(e)))
+    return _worker_db.db_path, indexed, errors
+
+
+def merge_shards(db_path: str, shard_paths: List[str]) -> int:
+    """
+    将多个分片合并到主库
+
+    所有分片 ATTACH 后在一个事务内完成拷贝：分片中出现的文件先从主库删除旧记录，
+    再整体插入文件、符号和文件代数；二级索引在拷贝前删除、提交前统一重建。
+    分片数超过 MAX_ATTACHED 时先分组预合并为中间分片。
+
+    Args:
+        db_path: 主库路径
+        shard_paths: 分片路径列表
+
+    Returns:
+        合并的文件数
+    """
+    shard_paths = list(shard_paths)
+    intermediates = []
+    while len(shard_paths) > MAX_ATTACHED:
+        merged = []
+        for start in range(0, len(shard_paths), MAX_ATTACHED):
+            group = shard_paths[start:start + MAX_ATTACHED]
+            target = f"{group[0]}.merged"
+            merge_shards(target, group)
+            intermediates.append(target)
+            merged.append(target)
+        shard_paths = merged
+
+    db = SymbolDatabase(db_path)
+    conn = db.conn
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    aliases = []
+    try:
+        for i, shard_path in enumerate(shard_paths):
+            alias = f"shard{i}"
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (shard_path,))
+            aliases.append(alias)
+
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            db._drop_indexes(cursor)
+            cursor.execute('SELECT COALESCE(MAX(generation), 0) FROM main.file_generations')
+            generation_base = cursor.fetchone()[0]
+            merged_files = 0
+            for alias in aliases:
+                # 删除将被替换的旧记录
+                cursor.execute(f'''
+                DELETE FROM main.symbols WHERE file_id IN (
+                    SELECT f.id FROM main.files f JOIN {alias}.files sf ON sf.file_path = f.file_path
+                )''')
+                cursor.execute(f'DELETE FROM main.files WHERE file_path IN (SELECT file_path FROM {alias}.files)')
+
+                cursor.execute(f'''
+                INSERT INTO main.files (file_path, relative_path, file_hash, last_updated)
+                SELECT file_path, relative_path, file_hash, last_updated FROM {alias}.files''')
+                merged_files += cursor.rowcount
+
+                cursor.execute(f'''
+                INSERT INTO main.symbols (
+                    file_id, symbol_name, symbol_type, lineno, end_lineno,
+                    doc_text, signature_json, bases_json, members_json,
+                    annotation, vector_store_id, compressed
+                )
+                SELECT f.id, s.symbol_name, s.symbol_type, s.lineno, s.end_lineno,
+                       s.doc_text, s.signature_json, s.bases_json, s.members_json,
+                       s.annotation, s.vector_store_id, s.compressed
+                FROM {alias}.symbols s
+                JOIN {alias}.files sf ON s.file_id = sf.id
+                JOIN main.files f ON f.file_path = sf.file_path''')
+
+                # 文件代数整体平移到主库当前代数之后，查询缓存据此失效
+                cursor.execute(f'''
+                INSERT OR REPLACE INTO main.file_generations (file_path, generation, symbol_names)
+                SELECT file_path, generation + ?, symbol_names FROM {alias}.file_generations''',
+                               (generation_base,))
+                cursor.execute(f'SELECT COALESCE(MAX(generation), 0) FROM {alias}.file_generations')
+                generation_base += cursor.fetchone()[0]
+
+            db._create_indexes(cursor)
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+    finally:
+        for alias in aliases:
+            conn.execute(f"DETACH DATABASE {alias}")
+        conn.isolation_level = isolation_level
+        db.close()
+        for path in intermediates:
+            os.remove(path)
+
+    return merged_files
+
+
+def build_index_parallel(
+    root_dir: str,
+    db_path: str,
+    file_filter: str = "*.py",
+    workers: Optional[int] = None,
+    chunk_size: int = 64
+) -> Dict:
+    """
+    并行构建符号索引
+
+    Args:
+        root_dir: 要索引的根目录
+        db_path: 主库路径
+        file_filter: 文件匹配模式
+        workers: 工作进程数，默认CPU核数
+        chunk_size: 每个任务包含的文件数
+
+    Returns:
+        {"files": 扫描到的文件数, "indexed": 成功索引数, "shards": 分片数, "removed": 移除的文件数,
+         "errors": [(file_path, error), ...]}
+    """
+    files = scan_directory(root_dir, file_filter)
+    workers = workers or os.cpu_count() or 1
+    shard_dir = tempfile.mkdtemp(prefix="symbol-shards-", dir=os.path.dirname(os.path.abspath(db_path)))
+    try:
+        shard_paths = set()
+        indexed = 0
+        errors = []
+        chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shard_dir,)) as pool:
+            for shard_path, count, chunk_errors in pool.map(_index_chunk, chunks, [root_dir] * len(chunks)):
+                shard_paths.add(shard_path)
+                indexed += count
+                errors.extend(chunk_errors)
+
+        if shard_paths:
+            merge_shards(db_path, sorted(shard_paths))
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    removed = remove_missing_files(db_path, root_dir, files)
+    return {"files": len(files), "indexed": indexed, "shards": len(shard_paths), "removed": removed,
+            "errors": errors}
+
+
+def remove_missing_files(db_path: str, root_dir: str, files: List[str]) -> int:
+    """
+    从主库中移除根目录下本次扫描没有产生的文件（已从磁盘删除或不再匹配文件模式）
+
+    Args:
+        db_path: 主库路径
+        root_dir: 索引的根目录
+        files: 本次扫描到的文件（绝对路径）
+
+    Returns:
+        移除的文件数
+    """
+    root_path = Path(root_dir).resolve()
+    scanned = set(files)
+    with SymbolDatabase(db_path) as db:
+        missing = [
+            file["file_path"] for file in db.get_all_files()
+            if Path(file["file_path"]).is_relative_to(root_path) and file["file_path"] not in scanned
+        ]
+        for file_path in missing:
+            db.remove_file(file_path)
+    return len(missing)
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="并行分片构建符号索引")
+    parser.add_argument("directory", help="要索引的根目录")
+    parser.add_argument("--db", default="symbols.db", help="主库路径")
+    parser.add_argument("-g", "--glob", default="*.py", help="文件匹配模式")
+    parser.add_argument("-j", "--workers", type=int, help="工作进程数，默认CPU核数")
+    parser.add_argument("--chunk-size", type=int, default=64, help="每个任务包含的文件数")
+    args = parser.parse_args()
+
+    stats = build_index_parallel(args.directory, args.db, args.glob, args.workers, args.chunk_size)
+    print(f"扫描 {stats['files']} 个文件，成功索引 {stats['indexed']} 个，使用 {stats['shards']} 个分片，"
+          f"移除 {stats['removed']} 个已删除的文件")
+    for file_path, error in stats["errors"]:
+        print(f"错误: {file_path}: {error}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,687 @@
+"""
+本模块提供分阶段、有界队列连接的流水线索引器
+
+    python -m indexer.pipeline <目录> [--parse-workers 8] [--embed-concurrency 4] [--queue-size 64] ...
+
+逐文件串行地扫描、解析、生成描述、嵌入、写入时，最慢的阶段（通常是嵌入接口）会拖住其它所有阶段。
+流水线把索引拆成四个阶段，阶段之间用有界队列连接：
+
+    扫描线程 -> 解析进程池（解析、生成描述、切块） -> 异步批量嵌入 -> SQLite 写入线程
+
+- 解析在进程池中执行，与嵌入请求完全重叠，同时在途的解析任务数有上限
+- 嵌入阶段跨文件凑批，最多 embed_concurrency 个请求并发
+- SQLite 和向量集合只由写入线程修改，每批文件的向量一次 upsert
+- 下游变慢时队列写满，上游阻塞等待（背压），内存占用不随仓库大小增长
+- 每个文件完成的阶段记入检查点日志，向量经发件箱写入（见 indexer.journal）；
+  中断或取消的运行在下次启动时从检查点继续
+
+增量模式下跳过修改时间早于上次索引时间的文件；无论是否增量，磁盘上已删除的文件
+都会从符号库和向量存储中移除。不嵌入时仍在的符号沿用已有的向量ID，需要删除的向量留在发件箱中，
+在下一次嵌入的运行开始时应用。
+
+进度以事件字典回调（命令行以 JSON Lines 输出到标准输出，每行一个事件）；
+每个阶段维护吞吐计数，定期以 stats 事件输出：
+
+    {"event": "scan", "files": 120, "skipped": 100, "removed": 1, "resumed": 0}
+    {"event": "file", "path": "pkg/a.py", "current": 1, "total": 20, "symbols": 14}
+    {"event": "error", "path": "pkg/b.py", "error": "..."}
+    {"event": "stats", "stages": [{"name": "parse", "items": 120, "errors": 0, "busy": 3.1, "rate": 40.2}, ...]}
+    {"event": "done", "files": 20, "indexed": 19, "errors": 1, "symbols": 230, "embedded": 210, "canceled": false,
+     "elapsed": 3.2, ...}
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from db.SymbolVectorStore import make_vector_id
+from db.chunking import chunk_records, count_tokens
+from db.config import EMBEDDING_CHUNK_TOKENS, EMBEDDING_CONCURRENCY
+from db.sqlite import SymbolDatabase
+from db.workspace import project_id
+from indexer.journal import IndexJournal
+from symbol.file_utils import scan_directory
+from symbol.symbols import extract_file_symbols
+from ui.functions.config import (SYMBOLS_DB_FILE_PATH, VECTOR_STORE_PATH, EMBEDDING_BATCH_SIZE,
+                                 EMBEDDING_BATCH_TOKENS)
+from ui.functions.vector_store import describe_symbol, get_vector_store, symbol_metadata
+
+STAGES = ("scan", "parse", "embed", "write")
+
+# 阶段结束标记，沿队列向下游传递
+_DONE = None
+
+
+def collect_files(root_dir: str, include: Iterable[str] = ("*.py",), exclude: Iterable[str] = ()) -> List[str]:
+    """
+    按包含/排除模式收集要索引的文件
+
+    Args:
+        root_dir: 根目录
+        include: glob 模式（匹配相对路径），满足任一即包含
+        exclude: glob 模式（匹配 posix 格式的相对路径），满足任一即排除
+
+    Returns:
+        排序后的绝对路径列表
+    """
+    root_path = Path(root_dir).resolve()
+    files = set()
+    for pattern in include:
+        files.update(scan_directory(root_path, pattern))
+    exclude = list(exclude)
+    if exclude:
+        files = {
+            file_path for file_path in files
+            if not any(fnmatch.fnmatch(Path(file_path).relative_to(root_path).as_posix(), pattern)
+                       for pattern in exclude)
+        }
+    return sorted(files)
+
+
+def is_unchanged(file_path: str, indexed: Optional[Dict]) -> bool:
+    """文件的修改时间早于上次索引时间"""
+    if not indexed or not indexed.get("last_updated"):
+        return False
+    try:
+        last_updated = datetime.fromisoformat(indexed["last_updated"])
+    except ValueError:
+        return False
+    return datetime.fromtimestamp(os.path.getmtime(file_path)) < last_updated
+
+
+def carry_vector_ids(db: SymbolDatabase, file_path: str, symbols: List) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    不嵌入时按符号名沿用文件已有的向量ID
+
+    Args:
+        db: 符号数据库
+        file_path: 文件路径
+        symbols: 新的解析结果 [(symbol_name, details), ...]
+
+    Returns:
+        ([(符号名, 向量ID)], 文件中已消失符号的向量ID列表)
+    """
+    existing = db.get_file_vector_id_map(file_path)
+    names = {name for name, _ in symbols}
+    vector_ids = [(name, existing[name]) for name in names if name in existing]
+    return vector_ids, [doc_id for name, doc_id in existing.items() if name not in names]
+
+
+def _print_jsonl(event: Dict):
+    print(json.dumps(event, ensure_ascii=False), flush=True)
+
+
+def _print_text(event: Dict):
+    kind = event["event"]
+    if kind == "scan":
+        print(f"扫描到 {event['files']} 个文件，跳过未变更 {event['skipped']} 个，移除已删除 {event['removed']} 个，"
+              f"按检查点跳过 {event.get('resumed', 0)} 个")
+    elif kind == "file":
+        print(f"[{event['current']}/{event['total']}] {event['path']} ({event['symbols']} 个符号)")
+    elif kind == "error":
+        print(f"错误: {event['path'] or event.get('stage')}: {event['error']}", file=sys.stderr)
+    elif kind == "stats":
+        print("  ".join(f"{stage['name']}: {stage['items']} ({stage['rate']}/s)" for stage in event["stages"]))
+    elif kind == "done":
+        print(f"完成: 索引 {event['indexed']}/{event['files']} 个文件，{event['symbols']} 个符号，"
+              f"嵌入 {event['embedded']} 条，失败 {event['errors']} 个，耗时 {event['elapsed']} 秒")
+
+
+PROGRESS_PRINTERS = {
+    "jsonl": _print_jsonl,
+    "text": _print_text,
+    "none": lambda event: None,
+}
+
+
+def _parse_file(file_path: str, root_dir: str, project: str, max_chunk_tokens: int, embed: bool) -> Dict:
+    """
+    在工作进程中解析一个文件，并生成其符号的描述和待嵌入的块
+
+    Returns:
+        {"path", "relative_path", "mtime", "symbols", "error", "busy",
+         "vector_ids": [(符号名, 向量ID)]（不嵌入时为 None）,
+         "chunks": [(块ID, 块文本, 块元数据, token数)], "chunk_counts": {向量ID: 块数}}
+    """
+    started = time.monotonic()
+    relative_path = Path(file_path).relative_to(root_dir).as_posix()
+    item = {"path": file_path, "relative_path": relative_path, "mtime": None, "symbols": None, "error": None,
+            "vector_ids": None, "chunks": [], "chunk_counts": {}}
+    try:
+        item["mtime"] = os.path.getmtime(file_path)
+        symbols = extract_file_symbols(file_path)
+        if embed:
+            vector_ids = []
+            for name, detail in symbols:
+                description = describe_symbol(detail, name)
+                if not description:
+                    continue
+                # 确定性ID，重复索引时覆盖旧向量
+                doc_id = make_vector_id(project, relative_path, name)
+                metadata = {"symbol": name, **symbol_metadata(project, relative_path, detail)}
+                records = chunk_records(doc_id, description, metadata, max_chunk_tokens)
+                item["chunks"].extend((chunk_id, text, chunk_metadata, count_tokens(text))
+                                      for chunk_id, text, chunk_metadata in records)
+                item["chunk_counts"][doc_id] = len(records)
+                vector_ids.append((name, doc_id))
+            item["vector_ids"] = vector_ids
+        item["symbols"] = symbols
+    except Exception as e:
+        item["error"] = str(e)
+    item["busy"] = time.monotonic() - started
+    return item
+
+
+def _split_requests(chunks: List[tuple], max_size: int, max_tokens: int) -> List[List[tuple]]:
+    """按条数和 token 数上限把块切分为多次请求"""
+    requests, current, tokens = [], [], 0
+    for chunk in chunks:
+        if current and (len(current) >= max_size or tokens + chunk[3] > max_tokens):
+            requests.append(current)
+            current, tokens = [], 0
+        current.append(chunk)
+        tokens += chunk[3]
+    if current:
+        requests.append(current)
+    return requests
+
+
+class StageCounter:
+    """
+    单个阶段的吞吐计数（可在多个线程中累加）
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, items: int = 1, busy: float = 0.0, errors: int = 0):
+        """
+        Args:
+            items: 处理完成的条数（文件数）
+            busy: 处理耗时（秒）；并发执行时各任务分别累加，可超过墙钟时间
+            errors: 失败条数
+        """
+        with self._lock:
+            self.items += items
+            self.busy += busy
+            self.errors += errors
+
+    def snapshot(self) -> Dict:
+        """
+        Returns:
+            {"name", "items", "errors", "busy": 累计耗时, "rate": 每秒处理条数}
+        """
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        with self._lock:
+            return {"name": self.name, "items": self.items, "errors": self.errors,
+                    "busy": round(self.busy, 3), "rate": round(self.items / elapsed, 1)}
+
+
+class IndexingPipeline:
+    """
+    扫描 -> 解析 -> 嵌入 -> 写入 的流水线索引器（每次索引创建一个实例）
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        db_path: str = SYMBOLS_DB_FILE_PATH,
+        include: Iterable[str] = ("*.py",),
+        exclude: Iterable[str] = (),
+        parse_workers: Optional[int] = None,
+        embed: bool = True,
+        embed_batch_size: int = EMBEDDING_BATCH_SIZE,
+        embed_batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+        embed_concurrency: int = EMBEDDING_CONCURRENCY,
+        queue_size: int = 64,
+        vector_store_path: Optional[str] = None,
+        incremental: bool = False,
+        resume: bool = True,
+        progress: Optional[Callable[[Dict], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        stats_interval: float = 1.0
+    ):
+        """
+        Args:
+            root_dir: 要索引的根目录
+            db_path: 符号库路径
+            include: 包含的 glob 模式
+            exclude: 排除的 glob 模式
+            parse_workers: 解析进程数，默认CPU核数（在途解析任务最多为其 2 倍）
+            embed: 是否嵌入符号描述；为 False 时只更新符号库，仍在的符号沿用已有的向量ID，
+                需要删除的向量留在发件箱中
+            embed_batch_size: 每个嵌入请求的最多条数（块数）
+            embed_batch_tokens: 每个嵌入请求的 token 数上限
+            embed_concurrency: 并发的嵌入请求数
+            queue_size: 扫描->解析、解析->嵌入 队列的容量（文件数）；嵌入->写入 队列容量为 2 倍并发请求数（批数）
+            vector_store_path: 向量存储目录，默认使用共享的向量存储（VECTOR_STORE_PATH）
+            incremental: 是否跳过上次索引后未修改的文件
+            resume: 是否从该目录上次未完成的运行继续；为 False 时放弃其检查点
+            progress: 可选，进度回调，参数为事件字典；在多个阶段线程中调用（已串行化）
+            cancel: 可选，取消事件；置位后各阶段丢弃尚未处理的文件，已完成嵌入的批次仍会写入，
+                下次运行从检查点继续
+            stats_interval: stats 事件的间隔（秒）
+        """
+        self.root_path = Path(root_dir).resolve()
+        self.project = project_id(self.root_path)
+        self.db_path = db_path
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.embed = embed
+        self.embed_batch_size = embed_batch_size
+        self.embed_batch_tokens = embed_batch_tokens
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.max_chunk_tokens = min(EMBEDDING_CHUNK_TOKENS, embed_batch_tokens)
+        self.incremental = incremental
+        self.resume = resume
+        self.run_id: Optional[int] = None
+        self._checkpoints: Dict[str, tuple] = {}
+        self.cancel = cancel or threading.Event()
+        self.stats_interval = stats_interval
+        self.store = None
+        if embed:
+            self.store = get_vector_store() if vector_store_path is None else get_vector_store(vector_store_path)
+
+        self.counters = {name: StageCounter(name) for name in STAGES}
+        self._parse_queue = queue.Queue(queue_size)
+        self._embed_queue = queue.Queue(queue_size)
+        self._write_queue = queue.Queue(2 * self.embed_concurrency)
+        self._finished = set()
+        self._abort = threading.Event()
+        self._failure: Optional[BaseException] = None
+        self._progress = progress or (lambda event: None)
+        self._progress_lock = threading.Lock()
+        self.stats = {"event": "done", "files": 0, "indexed": 0, "errors": 0, "symbols": 0, "embedded": 0,
+                      "requests": 0, "resumed": 0, "replayed": 0, "canceled": False}
+
+    # ========== 阶段之间的协作 ==========
+
+    def _emit(self, event: Dict):
+        with self._progress_lock:
+            self._progress(event)
+
+    def _stopped(self) -> bool:
+        """已取消或有阶段失败，上游不再产生新的工作"""
+        return self.cancel.is_set() or self._abort.is_set()
+
+    def _fail(self, stage: str, error: BaseException):
+        """记录阶段失败并通知其它阶段停止"""
+        if self._failure is None:
+            self._failure = error
+        self._emit({"event": "error", "path": None, "stage": stage, "error": str(error)})
+        self._abort.set()
+
+    def _get(self, source: queue.Queue):
+        """从队列取一项，取到结束标记时记下该队列已结束"""
+        item = source.get()
+        if item is _DONE:
+            self._finished.add(id(source))
+        return item
+
+    def _drain(self, source: queue.Queue):
+        """丢弃队列中剩余的项直到结束标记（阶段失败后使上游的阻塞写入能够返回）"""
+        while id(source) not in self._finished:
+            self._get(source)
+
+    # ========== 阶段 ==========
+
+    def _scan(self):
+        """
+        扫描阶段：收集文件，移除已删除文件，按增量模式过滤
+
+        有检查点且文件未再修改时跳过已完成的阶段：written 的文件跳过，parsed 的文件直接交给嵌入阶段；
+        其余文件逐个放入解析队列。
+        """
+        counter = self.counters["scan"]
+        try:
+            with SymbolDatabase(self.db_path) as db:
+                journal = IndexJournal(db)
+                indexed = {
+                    file["file_path"]: file for file in db.get_all_files()
+                    if Path(file["file_path"]).is_relative_to(self.root_path)
+                }
+                files = collect_files(self.root_path, self.include, self.exclude)
+                removed = [file_path for file_path in indexed if not os.path.exists(file_path)]
+                for file_path in removed:
+                    self._write_queue.put({"remove": file_path})
+                skipped = 0
+                if self.incremental:
+                    pending = [file_path for file_path in files
+                               if not is_unchanged(file_path, indexed.get(file_path))]
+                    skipped = len(files) - len(pending)
+                    files = pending
+                checkpoints = {}
+                for file_path in files:
+                    checkpoint = self._checkpoints.get(file_path)
+                    if checkpoint and checkpoint[1] == os.path.getmtime(file_path):
+                        checkpoints[file_path] = checkpoint[0]
+                files = [file_path for file_path in files if checkpoints.get(file_path) != "written"]
+                resumed = sum(stage == "written" for stage in checkpoints.values())
+                self.stats["files"] = len(files)
+                self.stats["resumed"] = resumed
+                self._emit({"event": "scan", "files": len(files) + skipped + resumed, "skipped": skipped,
+                            "removed": len(removed), "resumed": resumed})
+                for file_path in files:
+                    if self._stopped():
+                        break
+                    stage = checkpoints.get(file_path)
+                    item = journal.load_payload(self.run_id, file_path) if stage == "parsed" and self.embed else None
+                    if item is None:
+                        self._parse_queue.put(file_path)
+                    else:
+                        item["resumed"] = stage
+                        self._embed_queue.put(item)
+                    counter.add()
+        except Exception as e:
+            self._fail("scan", e)
+        finally:
+            self._parse_queue.put(_DONE)
+
+    def _parse(self):
+        """解析阶段：在进程池中解析文件，完成顺序放入嵌入队列"""
+        counter = self.counters["parse"]
+        max_inflight = 2 * self.parse_workers
+        try:
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+                inflight = set()
+                exhausted = False
+                while not exhausted or inflight:
+                    while not exhausted and len(inflight) < max_inflight:
+                        try:
+                            # 有在途任务时不长时间阻塞，以便及时转发解析结果
+                            file_path = self._parse_queue.get(timeout=0.01) if inflight else self._parse_queue.get()
+                        except queue.Empty:
+                            break
+                        if file_path is _DONE:
+                            self._finished.add(id(self._parse_queue))
+                            exhausted = True
+                        elif not self._stopped():
+                            inflight.add(pool.submit(_parse_file, file_path, str(self.root_path), self.project,
+                                                     self.max_chunk_tokens, self.embed))
+                    if self._stopped():
+                        for future in inflight:
+                            future.cancel()
+                    if not inflight:
+                        continue
+                    done, inflight = wait(inflight, timeout=0.05, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future.cancelled():
+                            continue
+                        item = future.result()
+                        counter.add(busy=item.pop("busy"), errors=int(item["error"] is not None))
+                        self._embed_queue.put(item)
+        except Exception as e:
+            self._fail("parse", e)
+        finally:
+            self._drain(self._parse_queue)
+            self._embed_queue.put(_DONE)
+
+    def _embed_stage(self):
+        """嵌入阶段（独立线程中的事件循环）"""
+        try:
+            asyncio.run(self._embed_async())
+        except Exception as e:
+            self._fail("embed", e)
+        finally:
+            self._drain(self._embed_queue)
+            self._write_queue.put(_DONE)
+
+    async def _embed_async(self):
+        """跨文件凑批，并发请求数达到上限时暂停读取上游"""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.embed_concurrency)
+        tasks = set()
+        with ThreadPoolExecutor(self.embed_concurrency, thread_name_prefix="pipeline-embed") as executor:
+            async def submit(files: List[Dict]):
+                # 先记录解析检查点（与批次经同一队列，写入阶段按顺序处理）；
+                # 传副本，嵌入失败时对原解析结果的修改不会进入检查点
+                parsed = [dict(item) for item in files if not item.get("resumed")]
+                if parsed:
+                    await loop.run_in_executor(None, self._write_queue.put, {"parsed": parsed})
+                await semaphore.acquire()
+                task = asyncio.create_task(self._embed_batch(files, executor))
+                tasks.add(task)
+                task.add_done_callback(lambda done: (tasks.discard(done), semaphore.release()))
+
+            batch, chunks, tokens = [], 0, 0
+            while True:
+                item = await loop.run_in_executor(None, self._get, self._embed_queue)
+                if item is _DONE:
+                    break
+                if self._stopped():
+                    continue
+                if not item["chunks"]:
+                    # 解析失败、不嵌入或没有可嵌入的符号，直接交给写入阶段
+                    await loop.run_in_executor(None, self._write_queue.put, {"files": [item]})
+                    continue
+                batch.append(item)
+                chunks += len(item["chunks"])
+                tokens += sum(chunk[3] for chunk in item["chunks"])
+                if chunks >= self.embed_batch_size or tokens >= self.embed_batch_tokens:
+                    await submit(batch)
+                    batch, chunks, tokens = [], 0, 0
+            if batch and not self._stopped():
+                await submit(batch)
+            if tasks:
+                await asyncio.gather(*tasks)
+
+    async def _embed_batch(self, files: List[Dict], executor: ThreadPoolExecutor):
+        """嵌入一批文件的全部块，结果交给写入阶段；失败时这些文件记为错误（符号库保持原状，检查点停在 parsed）"""
+        loop = asyncio.get_running_loop()
+        counter = self.counters["embed"]
+        chunks = [chunk for item in files for chunk in item["chunks"]]
+        started = time.monotonic()
+        batch = {"files": files}
+        try:
+            parts = []
+            for request in _split_requests(chunks, self.embed_batch_size, self.embed_batch_tokens):
+                parts.append(await loop.run_in_executor(
+                    executor, self.store.embed_texts, [text for _, text, _, _ in request]
+                ))
+            self.stats["requests"] += len(parts)
+            batch.update(
+                ids=[chunk_id for chunk_id, _, _, _ in chunks],
+                documents=[text for _, text, _, _ in chunks],
+                metadatas=[metadata for _, _, metadata, _ in chunks],
+                embeddings=np.concatenate(parts)
+            )
+            counter.add(items=len(files), busy=time.monotonic() - started)
+        except Exception as e:
+            for item in files:
+                item["error"] = f"嵌入失败: {e}"
+            counter.add(items=0, busy=time.monotonic() - started, errors=len(files))
+        await loop.run_in_executor(None, self._write_queue.put, batch)
+
+    def _write(self):
+        """写入阶段：唯一修改 SQLite 和向量集合的线程"""
+        counter = self.counters["write"]
+        try:
+            with SymbolDatabase(self.db_path) as db:
+                journal = IndexJournal(db)
+                while True:
+                    batch = self._get(self._write_queue)
+                    if batch is _DONE:
+                        break
+                    started = time.monotonic()
+                    written = self._write_batch(db, journal, batch)
+                    counter.add(items=written, busy=time.monotonic() - started)
+        except Exception as e:
+            self._fail("write", e)
+        finally:
+            self._drain(self._write_queue)
+
+    def _write_batch(self, db: SymbolDatabase, journal: IndexJournal, batch: Dict) -> int:
+        """
+        写入一批文件，返回写入的文件数
+
+        1. 逐个文件：块向量、多余旧块和已消失符号的删除写入发件箱，检查点推进到 written，
+           写入符号（一个事务）；写入失败时整个事务回滚，发件箱中不会留下该文件的向量
+        2. 把发件箱应用到向量集合
+        任一步骤之后中断，下次运行都能从日志和发件箱恢复。
+        """
+        if "parsed" in batch:
+            journal.record(self.run_id, batch["parsed"], "parsed")
+            return 0
+
+        if "remove" in batch:
+            # 不嵌入时留在发件箱中，下一次嵌入的运行开始时应用
+            journal.enqueue_deletes(db.get_file_vector_ids(batch["remove"]))
+            db.remove_file(batch["remove"])
+            db.conn.commit()
+            self._apply_outbox(journal)
+            return 1
+
+        written = 0
+        # 批次的块按文件顺序排列，每个文件占连续的一段
+        offset = 0
+        for item in batch["files"]:
+            error = item["error"]
+            chunks = slice(offset, offset + len(item["chunks"]) if batch.get("ids") else offset)
+            offset = chunks.stop
+            if error is None:
+                try:
+                    vector_ids = item["vector_ids"]
+                    if vector_ids is None:
+                        # 不嵌入时仍在的符号沿用已有的向量ID
+                        vector_ids, stale = carry_vector_ids(db, item["path"], item["symbols"])
+                    else:
+                        stale = set(db.get_file_vector_ids(item["path"])) - {id for _, id in vector_ids}
+                    if chunks.stop > chunks.start:
+                        journal.enqueue_upserts(batch["ids"][chunks], batch["embeddings"][chunks],
+                                                batch["documents"][chunks], batch["metadatas"][chunks])
+                        journal.enqueue_trims(item["chunk_counts"])
+                    # 删除文件中已消失符号的向量
+                    journal.enqueue_deletes(stale)
+                    journal.record(self.run_id, [item], "written", commit=False)
+                    # 提交时日志、发件箱和符号一起生效
+                    db.upsert_file_symbols(item["path"], item["symbols"], vector_ids, item["relative_path"])
+                except Exception as e:
+                    db.conn.rollback()
+                    error = str(e)
+            if error is not None:
+                self.stats["errors"] += 1
+                self._emit({"event": "error", "path": item["relative_path"], "error": error})
+                continue
+            written += 1
+            self.stats["indexed"] += 1
+            self.stats["symbols"] += len(item["symbols"])
+            self.stats["embedded"] += chunks.stop - chunks.start
+            self._emit({"event": "file", "path": item["relative_path"],
+                        "current": self.stats["indexed"] + self.stats["errors"],
+                        "total": self.stats["files"], "symbols": len(item["symbols"])})
+        self._apply_outbox(journal)
+        return written
+
+    def _apply_outbox(self, journal: IndexJournal):
+        if self.store is not None:
+            journal.apply_outbox(self.store)
+
+    # ========== 运行 ==========
+
+    def stage_stats(self) -> List[Dict]:
+        """各阶段的吞吐计数快照"""
+        return [self.counters[name].snapshot() for name in STAGES]
+
+    def run(self) -> Dict:
+        """
+        运行流水线直到所有阶段结束
+
+        Returns:
+            done 事件字典，另含 requests（嵌入请求数）、resumed（按检查点跳过的文件数）、
+            replayed（启动时重放的发件箱操作数）和 stages（各阶段计数）
+
+        Raises:
+            任一阶段的异常（其余阶段停止后抛出）
+        """
+        started = time.monotonic()
+        with SymbolDatabase(self.db_path) as db:
+            journal = IndexJournal(db)
+            # 上次运行中断时残留的向量操作
+            if self.store is not None:
+                self.stats["replayed"] = journal.apply_outbox(self.store)
+            self.run_id, resumed = journal.begin_run(str(self.root_path), self.resume)
+            self._checkpoints = journal.checkpoints(self.run_id) if resumed else {}
+
+        threads = [
+            threading.Thread(target=self._scan, name="pipeline-scan", daemon=True),
+            threading.Thread(target=self._parse, name="pipeline-parse", daemon=True),
+            threading.Thread(target=self._embed_stage, name="pipeline-embed", daemon=True),
+            threading.Thread(target=self._write, name="pipeline-write", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            threads[-1].join(self.stats_interval)
+            self._emit({"event": "stats", "stages": self.stage_stats()})
+        for thread in threads:
+            thread.join()
+        if self._failure is not None:
+            raise self._failure
+
+        self.stats["canceled"] = self.cancel.is_set()
+        # 取消或有文件嵌入失败时保留检查点，下次运行继续
+        if not self.stats["canceled"] and not self.counters["embed"].errors:
+            with SymbolDatabase(self.db_path) as db:
+                IndexJournal(db).finish_run(self.run_id)
+        self.stats["stages"] = self.stage_stats()
+        self.stats["elapsed"] = round(time.monotonic() - started, 3)
+        self._emit(self.stats)
+        return self.stats
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="流水线索引器（解析与嵌入并行）")
+    parser.add_argument("directory", help="要索引的根目录")
+    parser.add_argument("--db", default=SYMBOLS_DB_FILE_PATH, help="符号库路径")
+    parser.add_argument("--vector-store", help=f"向量存储目录，默认 {VECTOR_STORE_PATH}")
+    parser.add_argument("-i", "--include", action="append", help="包含的 glob 模式（可重复），默认 *.py")
+    parser.add_argument("-x", "--exclude", action="append", default=[], help="排除的 glob 模式（可重复）")
+    parser.add_argument("-j", "--parse-workers", type=int, help="解析进程数，默认CPU核数")
+    parser.add_argument("--embed-concurrency", type=int, default=EMBEDDING_CONCURRENCY, help="并发的嵌入请求数")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="每个嵌入请求的最多条数")
+    parser.add_argument("--embed-batch-tokens", type=int, default=EMBEDDING_BATCH_TOKENS,
+                        help="每个嵌入请求的 token 数上限")
+    parser.add_argument("--queue-size", type=int, default=64, help="阶段之间队列的容量（文件数）")
+    parser.add_argument("--no-embed", action="store_true", help="只更新符号库，不生成向量")
+    parser.add_argument("--incremental", action="store_true", help="跳过上次索引后未修改的文件")
+    parser.add_argument("--no-resume", action="store_true", help="放弃上次未完成运行的检查点，从头索引")
+    parser.add_argument("--progress", choices=sorted(PROGRESS_PRINTERS), default="jsonl", help="进度输出格式")
+    args = parser.parse_args()
+
+    IndexingPipeline(
+        args.directory,
+        db_path=args.db,
+        include=args.include or ["*.py"],
+        exclude=args.exclude,
+        parse_workers=args.parse_workers,
+        embed=not args.no_embed,
+        embed_batch_size=args.embed_batch_size,
+        embed_batch_tokens=args.embed_batch_tokens,
+        embed_concurrency=args.embed_concurrency,
+        queue_size=args.queue_size,
+        vector_store_path=args.vector_store,
+        incremental=args.incremental,
+        resume=not args.no_resume,
+        progress=PROGRESS_PRINTERS[args.progress]
+    ).run()
+
+
+if __name__ == "__main__":
+    _main()
@@ -532,6 +532,21 @@ def flatten_class_symbols(symbol_metadata: dict) -> None:
     for class_name, class_meta in classes_to_process:
         _flatten_class(class_name, class_meta, symbol_metadata)
 
+def extract_file_symbols(file_path: str, exclude_imports: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    提取文件的导出符号并展平类成员，结果可直接写入 SymbolDatabase.upsert_file_symbols
+    
+    参数:
+        file_path: Python 文件路径
+        exclude_imports: 是否排除导入的符号（数据库不接受 import 类型）
+    
+    返回:
+        [(symbol_name, details), ...]，类成员以 ClassName.member_name 形式追加在后
+    """
+    symbols = find_exported_symbols_with_doc(file_path, exclude_imports)
+    flatten_class_symbols(symbols)
+    return symbols
+
 # 使用示例
 if __name__ == "__main__":
     # 获取所有导出符号的详细信息（包含函数签名）
@@ -0,0 +1,225 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import numpy as np
+import pytest
+
+import db.async_embedding_client as client_module
+from db.async_embedding_client import AsyncEmbeddingClient, EmbeddingRequestError, TokenBucket
+
+_real_sleep = asyncio.sleep
+
+
+class FakeClock:
+    """替换 time.monotonic 和 asyncio.sleep：睡眠只推进虚拟时间并记录时长"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+        await _real_sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(client_module.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    # 退避抖动取上限，结果确定
+    monkeypatch.setattr(client_module.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def _vector(text: str) -> list:
+    """桩接口返回的向量：第一维是文本编号"""
+    return [float(text.split("-")[1]), 1.0, 2.0]
+
+
+def _ok(body: dict, reverse: bool = False) -> httpx.Response:
+    vectors = [_vector(text) for text in body["input"]]
+    if body.get("encoding_format") == "base64":
+        vectors = [base64.b64encode(np.asarray(v, dtype="<f4").tobytes()).decode() for v in vectors]
+    data = [{"index": i, "embedding": v} for i, v in enumerate(vectors)]
+    if reverse:
+        data.reverse()
+    return httpx.Response(200, json={"data": data})
+
+
+def _client(handler, **kwargs) -> AsyncEmbeddingClient:
+    options = dict(model="stub", api_key="stub", base_url="http://stub/v1", dimensions=None,
+                   requests_per_minute=None, tokens_per_minute=None, base_delay=0.5, max_delay=30.0,
+                   batch_size=4, min_batch_size=1, max_concurrency=1, use_base64=True)
+    options.update(kwargs)
+    return AsyncEmbeddingClient(transport=httpx.MockTransport(handler), **options)
+
+
+def _texts(count: int) -> list:
+    return [f"text-{i}" for i in range(count)]
+
+
+def _embed(client: AsyncEmbeddingClient, texts: list) -> np.ndarray:
+    async def run():
+        async with client:
+            return await client.embed_array(texts)
+    return asyncio.run(run())
+
+
+def test_429_waits_for_retry_after(clock):
+    responses = [httpx.Response(429, headers={"Retry-After": "3"}, json={"error": "rate"})]
+
+    def handler(request):
+        return responses.pop() if responses else _ok(json.loads(request.content))
+
+    client = _client(handler)
+    vectors = _embed(client, _texts(2))
+    assert vectors[:, 0].tolist() == [0.0, 1.0]
+    assert client.throttled == 1 and client.retries == 1 and client.requests == 2
+    # Retry-After 加最多 base_delay 的抖动
+    assert clock.sleeps == [3.5]
+
+
+def test_5xx_backs_off_exponentially_until_max_retries(clock):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    client = _client(handler, max_retries=3)
+    with pytest.raises(EmbeddingRequestError):
+        _embed(client, _texts(2))
+    assert len(calls) == 4
+    assert client.retries == 3
+    assert clock.sleeps == [0.5, 1.0, 2.0]
+
+
+def test_backoff_is_capped_by_max_delay(clock):
+    client = _client(lambda request: httpx.Response(500), max_retries=4, base_delay=1.0, max_delay=3.0)
+    with pytest.raises(EmbeddingRequestError):
+        _embed(client, _texts(1))
+    assert clock.sleeps == [1.0, 2.0, 3.0, 3.0]
+
+
+def test_timeout_is_retried(clock):
+    failures = [httpx.ReadTimeout("slow")]
+
+    def handler(request):
+        if failures:
+            raise failures.pop()
+        return _ok(json.loads(request.content))
+
+    client = _client(handler)
+    vectors = _embed(client, _texts(3))
+    assert vectors[:, 0].tolist() == [0.0, 1.0, 2.0]
+    assert client.retries == 1
+    assert clock.sleeps == [0.5]
+
+
+def test_413_splits_the_batch(clock):
+    sizes = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        sizes.append(len(body["input"]))
+        if len(body["input"]) > 2:
+            return httpx.Response(413)
+        return _ok(body)
+
+    client = _client(handler, batch_size=8)
+    vectors = _embed(client, _texts(8))
+    assert vectors[:, 0].tolist() == list(range(8))
+    # 两半并发发送，直到批次不超过 2 条
+    assert sizes == [8, 4, 4, 2, 2, 2, 2]
+    assert client.retries == 0
+
+
+def test_adaptive_batch_grows_when_fast_and_shrinks_when_slow(clock):
+    latency = {"value": 0.1}
+    sizes = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        sizes.append(len(body["input"]))
+        clock.now += latency["value"]
+        return _ok(body)
+
+    client = _client(handler, batch_size=4, max_batch_size=12, target_latency=1.0)
+    _embed(client, _texts(52))
+    # 延迟低于目标的一半时每批增大（至少 +1，最多到 max_batch_size）
+    assert sizes == [4, 5, 6, 7, 8, 10, 12]
+    assert client.batch_size == 12
+
+    sizes.clear()
+    latency["value"] = 5.0
+    _embed(client, _texts(30))
+    # 延迟超过目标时乘性减小，不低于 min_batch_size
+    assert sizes == [12, 8, 5, 3, 2]
+    assert client.batch_size == 1
+
+
+def test_token_bucket_paces_requests(clock):
+    async def run():
+        bucket = TokenBucket(rate=2.0, capacity=2.0)
+        for _ in range(6):
+            await bucket.acquire(1)
+    asyncio.run(run())
+    # 桶满时立即获得 2 个，其余 4 个按每秒 2 个补充
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_request_rate_limit_applies_to_batches(clock):
+    client = _client(lambda request: _ok(json.loads(request.content)), requests_per_minute=6,
+                     batch_size=1, max_batch_size=1)
+    _embed(client, _texts(3))
+    # 6 次/分钟 = 0.1 次/秒，容量 1：第一个请求立即发送，之后每个等待 10 秒
+    assert clock.now == pytest.approx(20.0)
+
+
+def test_rows_keep_input_order_under_concurrency(clock):
+    delays = iter(np.random.default_rng(0).uniform(0, 1, 100))
+
+    async def handler(request):
+        # 各批次以不同的顺序完成，data 也以逆序返回
+        await asyncio.sleep(float(next(delays)))
+        return _ok(json.loads(request.content), reverse=True)
+
+    client = _client(handler, batch_size=3, max_concurrency=4)
+    vectors = _embed(client, _texts(50))
+    assert vectors.shape == (50, 3)
+    assert vectors[:, 0].tolist() == list(range(50))
+
+
+def test_400_about_encoding_format_falls_back_to_floats(clock):
+    formats = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        formats.append(body.get("encoding_format"))
+        if "encoding_format" in body:
+            return httpx.Response(400, json={"error": {"message": "unsupported value", "param": "encoding_format"}})
+        return _ok(body)
+
+    client = _client(handler)
+    vectors = _embed(client, _texts(2))
+    assert vectors[:, 0].tolist() == [0.0, 1.0]
+    assert formats == ["base64", None]
+    assert client.use_base64 is False
+
+
+def test_other_400_is_raised_without_disabling_base64(clock):
+    def handler(request):
+        return httpx.Response(400, json={"error": {"message": "input is too long", "param": "input"}})
+
+    client = _client(handler)
+    with pytest.raises(EmbeddingRequestError):
+        _embed(client, _texts(2))
+    assert client.use_base64 is True
+    assert client.retries == 0
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from db.embedding_writer import EmbeddingBatchWriter
+
+
+class _Store:
+    """向量存储替身：记录写入，可设置嵌入失败的次数"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.written = {}
+
+    def embed_texts(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("embedding service unavailable")
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+    def upsert_embeddings(self, ids, embeddings, documents, metadatas):
+        self.written.update(zip(ids, documents))
+
+    def delete_stale_chunks(self, counts):
+        pass
+
+    def delete_symbols(self, ids):
+        for doc_id in ids:
+            self.written.pop(doc_id, None)
+
+
+def test_failed_flush_keeps_the_batch_for_retry():
+    store = _Store(failures=1)
+    writer = EmbeddingBatchWriter(store, max_batch_size=10)
+    writer.add("a", "def a(): pass", doc_id="id-a")
+    writer.add("b", "def b(): pass", doc_id="id-b")
+
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert writer.pending == 2
+    assert store.written == {}
+
+    assert writer.flush() == 2
+    assert set(store.written) == {"id-a", "id-b"}
+    assert writer.pending == 0
+
+
+def test_failed_auto_flush_propagates_from_add():
+    store = _Store(failures=1)
+    writer = EmbeddingBatchWriter(store, max_batch_size=1)
+    writer.add("a", "def a(): pass", doc_id="id-a")
+    with pytest.raises(RuntimeError):
+        writer.add("b", "def b(): pass", doc_id="id-b")
+    assert writer.pending == 1
+
+    writer.add("b", "def b(): pass", doc_id="id-b")
+    writer.flush()
+    assert set(store.written) == {"id-a", "id-b"}
@@ -0,0 +1,47 @@
+import numpy as np
+
+from db.ivf_index import IVFVectorIndex
+
+
+def _two_cluster_index(path) -> IVFVectorIndex:
+    """两个簇：id0、id1 靠近 x 轴，id2、id3 靠近 y 轴"""
+    index = IVFVectorIndex(str(path), nprobe=1, n_lists=2, train_size=4)
+    index.upsert(
+        ["id0", "id1", "id2", "id3"],
+        [[1.0, 0.05, 0.0], [1.0, -0.05, 0.0], [0.05, 1.0, 0.0], [-0.05, 1.0, 0.0]]
+    )
+    assert index.trained
+    return index
+
+
+def test_upsert_keeps_rows_that_stay_in_their_cluster(tmp_path):
+    index = _two_cluster_index(tmp_path)
+    row0, row1 = index._ids["id0"], index._ids["id1"]
+    cluster = int(index._assignments[row1])
+
+    # id0 移到另一个簇，id1 在同一批次中重写但留在原簇
+    index.upsert(["id0", "id1"], [[0.0, 1.0, 0.02], [1.0, -0.04, 0.0]])
+
+    assert int(index._assignments[row0]) != cluster
+    assert int(index._assignments[row1]) == cluster
+    assert row1 in index._postings[cluster]
+    assert row0 not in index._postings[cluster]
+    assert sum(len(p) for p in index._postings) == 4
+
+    result = index.query([[1.0, -0.04, 0.0]], n_results=1, include=("distances",))
+    assert result["ids"] == [["id1"]]
+    assert result["distances"][0][0] < 1e-6
+    index.close()
+
+
+def test_postings_match_rebuild_after_mixed_upserts(tmp_path):
+    index = _two_cluster_index(tmp_path)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        index.upsert(["id0", "id1", "id2", "id3"], rng.normal(size=(4, 3)))
+    rebuilt = [np.sort(p) for p in index._postings]
+    index.close()
+
+    reopened = IVFVectorIndex(str(tmp_path), nprobe=1, n_lists=2, train_size=4)
+    assert [np.sort(p).tolist() for p in reopened._postings] == [p.tolist() for p in rebuilt]
+    reopened.close()
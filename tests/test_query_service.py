@@ -0,0 +1,39 @@
+from db.SymbolVectorStore import SymbolVectorStore
+from db.embedding_backends import HashingEmbeddingBackend
+from db.query_service import SemanticQueryService
+
+
+def _store(path) -> SymbolVectorStore:
+    return SymbolVectorStore(persist_path=str(path), embedding_backend=HashingEmbeddingBackend(),
+                             vector_backend="numpy")
+
+
+def _symbols(first: str, second: str):
+    return [{"id": "id1", "symbol": first, "summary": f"{first} parses configuration files"},
+            {"id": "id2", "symbol": second, "summary": f"{second} renders html templates"}]
+
+
+def test_overwrite_from_another_instance_invalidates_result_cache(tmp_path):
+    store = _store(tmp_path)
+    store.batch_insert_symbols(_symbols("alpha", "beta"))
+    service = SemanticQueryService(store)
+    assert service.query("parses configuration files", top_k=1)[0]["symbol"] == "alpha"
+
+    # 另一个实例（如另一个进程中的索引器）以相同ID覆盖向量，集合条数不变
+    other = _store(tmp_path)
+    other.batch_insert_symbols(_symbols("beta", "alpha"))
+    assert other.collection.count() == store.collection.count()
+
+    assert store.query_symbols("parses configuration files", top_k=1)[0]["symbol"] == "beta"
+    assert service.query("parses configuration files", top_k=1)[0]["symbol"] == "beta"
+
+
+def test_unchanged_collection_keeps_result_cache(tmp_path):
+    store = _store(tmp_path)
+    store.batch_insert_symbols(_symbols("alpha", "beta"))
+    service = SemanticQueryService(store)
+    version = store.collection_version()
+    service.query("parses configuration files", top_k=1)
+    assert _store(tmp_path).collection_version() == version
+    service.query("parses configuration files", top_k=1)
+    assert service.metrics()["result_hits"] == 1
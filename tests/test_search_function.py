@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+
+import pytest
+
+import ui.functions.search_function as search_function
+from db.sqlite import SymbolDatabase
+
+
+class _Service:
+    """语义检索替身：返回固定结果、抛出异常或阻塞到超时"""
+
+    def __init__(self, hits=(), error=None, block=None):
+        self.hits, self.error, self.block = list(hits), error, block
+
+    def query(self, query_text, top_k, **filters):
+        if self.block is not None:
+            self.block.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.hits
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SymbolDatabase(str(tmp_path / "symbols.db"))
+    source = tmp_path / "mod.py"
+    source.write_text("")
+    db.upsert_file_symbols(str(source), [("load_config", {"type": "function"})], [("load_config", "v1")], "mod.py")
+    yield db
+    db.close()
+
+
+def _use(monkeypatch, service):
+    monkeypatch.setattr(search_function, "get_query_service", lambda: service)
+
+
+def test_semantic_errors_propagate(monkeypatch, db):
+    _use(monkeypatch, _Service(error=RuntimeError("missing api key")))
+    with pytest.raises(RuntimeError, match="missing api key"):
+        search_function.hybrid_search("load_config", db)
+
+
+def test_lexical_errors_other_than_interrupt_propagate(monkeypatch, db):
+    _use(monkeypatch, _Service())
+    db.conn.execute("DROP TABLE symbols")
+    with pytest.raises(sqlite3.OperationalError, match="no such table"):
+        search_function.hybrid_search("load_config", db)
+
+
+def test_interrupted_lexical_search_is_skipped(monkeypatch, db):
+    _use(monkeypatch, _Service(hits=[{"id": "v1", "symbol": "load_config", "summary": "", "score": 0.9}]))
+
+    def interrupted(*args, **kwargs):
+        raise sqlite3.OperationalError("interrupted")
+
+    monkeypatch.setattr(db, "search_symbols_ranked", interrupted)
+    results = search_function.hybrid_search("load_config", db)
+    assert [(row["symbol_name"], row["sources"]) for row in results] == [("load_config", "semantic")]
+
+
+def test_semantic_timeout_is_skipped(monkeypatch, db):
+    release = threading.Event()
+    _use(monkeypatch, _Service(block=release))
+    try:
+        results = search_function.hybrid_search("load_config", db, budget_ms=50)
+    finally:
+        release.set()
+    assert [(row["symbol_name"], row["sources"]) for row in results] == [("load_config", "lexical")]
@@ -0,0 +1,26 @@
+from db.sqlite import SymbolDatabase
+
+
+def _db(tmp_path, names) -> SymbolDatabase:
+    db = SymbolDatabase(str(tmp_path / "symbols.db"))
+    source = tmp_path / "mod.py"
+    source.write_text("")
+    db.upsert_file_symbols(str(source), [(name, {"type": "function"}) for name in names], None, "mod.py")
+    return db
+
+
+def test_ranked_search_matches_underscore_literally(tmp_path):
+    db = _db(tmp_path, ["get_file", "getXfile", "get_file_path", "load_get_file"])
+    results = db.search_symbols_ranked("get_file")
+    assert [(row["symbol_name"], row["rank"]) for row in results] == [
+        ("get_file", 0), ("get_file_path", 2), ("load_get_file", 3)
+    ]
+    db.close()
+
+
+def test_ranked_search_escapes_percent_and_backslash(tmp_path):
+    db = _db(tmp_path, ["get_file", "ratio%", "a\\b"])
+    assert db.search_symbols_ranked("%")[0]["symbol_name"] == "ratio%"
+    assert len(db.search_symbols_ranked("%")) == 1
+    assert [row["symbol_name"] for row in db.search_symbols_ranked("a\\b")] == ["a\\b"]
+    db.close()
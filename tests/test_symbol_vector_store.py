@@ -0,0 +1,51 @@
+import os
+
+from db.SymbolVectorStore import SymbolVectorStore
+from db.embedding_backends import HashingEmbeddingBackend
+
+
+def _store(path) -> SymbolVectorStore:
+    return SymbolVectorStore(persist_path=str(path), embedding_backend=HashingEmbeddingBackend(),
+                             vector_backend="numpy")
+
+
+def _rebuild(store: SymbolVectorStore, symbols):
+    staging = store.create_staging()
+    staging.batch_insert_symbols([{"symbol": name, "summary": f"def {name}(): pass"} for name in symbols])
+    store.promote(staging, expected_count=len(symbols))
+
+
+def test_promote_keeps_previous_generation_for_other_processes(tmp_path):
+    writer = _store(tmp_path)
+    writer.batch_insert_symbols([{"symbol": "old_symbol", "summary": "def old_symbol(): pass"}])
+    reader = _store(tmp_path)
+    base = writer.base_collection_name
+
+    _rebuild(writer, ["parse_file", "load_config"])
+    assert writer.collection_name == f"{base}__v1"
+    # 旧集合仍在，尚未跟随指针的实例照常读取
+    assert os.path.isdir(tmp_path / base)
+    assert reader.collection_name == base
+    assert reader.collection.count() == 1
+
+    # 访问时跟随指针切换到新集合
+    reader.collection_version()
+    assert reader.collection_name == f"{base}__v1"
+    assert {hit["symbol"] for hit in reader.query_symbols("parse file", top_k=2)} == {"parse_file", "load_config"}
+
+    # 下一次切换删除再上一代的集合
+    _rebuild(writer, ["parse_file"])
+    assert writer.collection_name == f"{base}__v2"
+    assert not os.path.exists(tmp_path / base)
+    assert os.path.isdir(tmp_path / f"{base}__v1")
+    assert reader.query_symbols("parse file", top_k=2)[0]["symbol"] == "parse_file"
+    assert reader.collection_name == f"{base}__v2"
+
+
+def test_explicit_collection_does_not_follow_pointer(tmp_path):
+    writer = _store(tmp_path)
+    pinned = SymbolVectorStore(collection_name=writer.collection_name, persist_path=str(tmp_path),
+                               embedding_backend=HashingEmbeddingBackend(), vector_backend="numpy")
+    _rebuild(writer, ["parse_file"])
+    pinned.collection_version()
+    assert pinned.collection_name == writer.base_collection_name
@@ -4,4 +4,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 SYMBOLS_DB_FILE_PATH= os.getenv("SYMBOLS_DB_FILE_PATH", "symbols.db")
-VECTOR_STORE_PATH= os.getenv("VECTOR_STORE_PATH", "symbol_store_db")
\ No newline at end of file
+VECTOR_STORE_PATH= os.getenv("VECTOR_STORE_PATH", "symbol_store_db")
+SEARCH_PAGE_SIZE= int(os.getenv("SEARCH_PAGE_SIZE", "200"))
+EMBEDDING_BATCH_SIZE= int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_BATCH_TOKENS= int(os.getenv("EMBEDDING_BATCH_TOKENS", "8000"))
+HYBRID_SEARCH_BUDGET_MS= int(os.getenv("HYBRID_SEARCH_BUDGET_MS", "500"))
+CLICK_STORE_PATH= os.getenv("CLICK_STORE_PATH", "symbol_clicks.db")
+RERANK_CANDIDATES= int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BUDGET_MS= int(os.getenv("RERANK_BUDGET_MS", "20"))
\ No newline at end of file
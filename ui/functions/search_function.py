@@ -1,25 +1,165 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 from typing import Dict, List, Optional
 
-from db.SymbolVectorStore import SymbolVectorStore
-from ui.functions.config import VECTOR_STORE_PATH
+from db.sqlite import SymbolDatabase
+from ui.functions.config import HYBRID_SEARCH_BUDGET_MS, RERANK_CANDIDATES, RERANK_BUDGET_MS
+from ui.functions.vector_store import get_query_service, get_reranker
+
+# 语义检索在后台线程执行（SQLite 连接只能在创建它的线程中使用，词法检索留在调用线程）
+_semantic_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="semantic-search")
 
 
 def query_symbols(
-        query_text: str, 
+        query_text: str,
         top_k: int = 5,
-        where: Optional[Dict] = None
+        where: Optional[Dict] = None,
+        rerank: bool = False,
+        candidates: int = RERANK_CANDIDATES,
+        budget_ms: int = RERANK_BUDGET_MS,
+        db: Optional[SymbolDatabase] = None,
+        **filters
     ) -> List[Dict]:
         """
         查询相似符号
-        
+
         Args:
             query_text: 查询文本
             top_k: 返回结果数量
             where: 过滤条件
+            rerank: 是否两阶段检索：先取回 candidates 个候选，再用本地特征重排
+            candidates: 重排的候选数
+            budget_ms: 重排的延迟预算（毫秒）
+            db: 可选，符号数据库；提供时按向量ID一次批量回表，返回完整的符号记录
+            **filters: 过滤参数 project/path_prefix/symbol_type/parent_class/language，
+                在向量检索内部生效
         Returns:
-            相似符号列表，包含符号、摘要和相似度分数
+            相似符号列表，包含文档ID、符号、摘要和相似度分数（重排时另有 rerank_score）；
+            提供 db 时为 SQLite 中的符号字段、file_path、relative_path 以及 id、score
         """
-        # with SymbolVectorStore(persist_path = VECTOR_STORE_PATH) as store:
-        store = SymbolVectorStore(persist_path = VECTOR_STORE_PATH)
-        results = store.query_symbols(query_text, top_k, where)
-        return results
\ No newline at end of file
+        limit = max(candidates, top_k) if rerank else top_k
+        hits = get_query_service().query(query_text, limit, where, **filters)
+        if db is not None:
+            hits = hydrate_hits(hits, db)
+        if not rerank:
+            return hits
+        return get_reranker().rerank(query_text, hits, top_k, budget_ms)
+
+
+def hydrate_hits(hits: List[Dict], db: SymbolDatabase) -> List[Dict]:
+    """
+    把向量检索结果替换为 SQLite 中的完整符号记录（一次按 vector_store_id 的 IN 查询）
+
+    Args:
+        hits: query_symbols 格式的结果
+        db: 符号数据库
+
+    Returns:
+        与 hits 顺序一致的列表，每项为符号字段、file_path、relative_path 以及 id、score、chunk_id；
+        没有对应 SQLite 记录的结果只包含 symbol_name 和 summary
+    """
+    if not hits:
+        return []
+    rows = db.get_symbols_by_vector_ids([hit["id"] for hit in hits])
+    hydrated = []
+    for hit in hits:
+        row = rows.get(hit["id"]) or {"symbol_name": hit["symbol"], "summary": hit["summary"]}
+        extra = {key: value for key, value in hit.items() if key not in ("symbol", "summary")}
+        hydrated.append({**row, **extra})
+    return hydrated
+
+
+@contextmanager
+def _sqlite_deadline(db: SymbolDatabase, deadline: float):
+    """超过截止时间时中断该连接上正在执行的查询（抛出 sqlite3.OperationalError）"""
+    db.conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+    try:
+        yield
+    finally:
+        db.conn.set_progress_handler(None, 0)
+
+
+def _symbol_key(symbol: Dict):
+    """去重键：同一文件中的同名符号视为同一个"""
+    return symbol.get("file_path"), symbol.get("symbol_name")
+
+
+def hybrid_search(
+    query_text: str,
+    db: SymbolDatabase,
+    top_k: int = 20,
+    budget_ms: int = HYBRID_SEARCH_BUDGET_MS,
+    rrf_k: int = 60,
+    candidates: int = 50,
+    **filters
+) -> List[Dict]:
+    """
+    混合检索：词法（符号名）与语义（向量）检索并发执行，按倒数排名融合（RRF）合并
+
+    每条结果的融合分数为 Σ 1 / (rrf_k + 名次)。两路检索共享同一个延迟预算，
+    超时的一路不参与融合（语义检索超时时其后台请求继续执行但结果被丢弃）；
+    其他错误（表结构错误、API 密钥缺失、鉴权失败等）照常抛出。
+
+    Args:
+        query_text: 查询文本
+        db: 符号数据库（在调用线程中使用）
+        top_k: 返回结果数量
+        budget_ms: 延迟预算（毫秒）
+        rrf_k: RRF 平滑常数
+        candidates: 每路检索取回的候选数
+        **filters: 语义检索的过滤参数 project/path_prefix/symbol_type/parent_class/language
+            （词法检索只应用单个 symbol_type）
+
+    Returns:
+        按融合分数降序的符号列表，包含 SQLite 中的符号字段、file_path、relative_path，
+        以及 rrf_score、sources（命中的检索方式）、semantic_score；
+        没有对应 SQLite 记录的向量结果只包含 symbol_name 和 summary
+
+    Raises:
+        两路检索中超时以外的异常
+    """
+    deadline = time.monotonic() + budget_ms / 1000
+    semantic_future = _semantic_executor.submit(get_query_service().query, query_text, candidates, **filters)
+
+    lexical = []
+    try:
+        with _sqlite_deadline(db, deadline):
+            symbol_type = filters.get("symbol_type")
+            lexical = db.search_symbols_ranked(
+                query_text, symbol_type=symbol_type if isinstance(symbol_type, str) else None, limit=candidates
+            )
+    except sqlite3.OperationalError as e:
+        if str(e) != "interrupted":
+            raise
+        # 超出预算被中断，忽略词法结果
+        lexical = []
+
+    semantic = []
+    try:
+        semantic = semantic_future.result(timeout=max(deadline - time.monotonic(), 0))
+    except FutureTimeoutError:
+        semantic_future.cancel()
+
+    # 语义结果按向量ID回表读取完整的符号信息
+    hydrated = db.get_symbols_by_vector_ids([hit["id"] for hit in semantic]) if semantic else {}
+
+    fused: Dict = {}
+    for rank, symbol in enumerate(lexical, 1):
+        entry = fused.setdefault(_symbol_key(symbol), {**symbol, "rrf_score": 0.0, "sources": []})
+        entry["rrf_score"] += 1.0 / (rrf_k + rank)
+        entry["sources"].append("lexical")
+    for rank, hit in enumerate(semantic, 1):
+        symbol = hydrated.get(hit["id"]) or {"symbol_name": hit["symbol"], "summary": hit["summary"]}
+        entry = fused.setdefault(_symbol_key(symbol), {**symbol, "rrf_score": 0.0, "sources": []})
+        if "semantic" in entry["sources"]:
+            continue  # 同一符号的多条向量只计最好的名次
+        entry["rrf_score"] += 1.0 / (rrf_k + rank)
+        entry["sources"].append("semantic")
+        entry["semantic_score"] = hit["score"]
+
+    results = sorted(fused.values(), key=lambda entry: entry["rrf_score"], reverse=True)[:top_k]
+    for entry in results:
+        entry["sources"] = "+".join(entry["sources"])
+    return results
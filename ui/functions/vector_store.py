@@ -1,12 +1,115 @@
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional
 from symbol.symbols import format_signature
 import db.SymbolVectorStore  as vectorDB
-from ui.functions.config import VECTOR_STORE_PATH
+from db.embedding_writer import EmbeddingBatchWriter
+from db.query_service import SemanticQueryService
+from db.reranker import ClickStore, LocalReranker
+from db.sqlite import SymbolDatabase
+from db.workspace import project_id
+from ui.functions.config import (VECTOR_STORE_PATH, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_TOKENS, CLICK_STORE_PATH,
+                                 SYMBOLS_DB_FILE_PATH)
 
-def store_symbol(symbol_info: dict,symbol_name:str,):
+@lru_cache(maxsize=None)
+def get_vector_store(persist_path: str = VECTOR_STORE_PATH) -> vectorDB.SymbolVectorStore:
+    """
+    获取长期复用的向量存储（同一路径只创建一次OpenAI客户端和Chroma客户端）
+    """
+    return vectorDB.SymbolVectorStore(persist_path = persist_path)
+
+@lru_cache(maxsize=None)
+def get_query_service() -> SemanticQueryService:
+    """
+    获取长期复用的语义查询服务（带查询向量和结果缓存）
+    """
+    return SemanticQueryService(get_vector_store())
+
+@lru_cache(maxsize=None)
+def get_click_store() -> ClickStore:
+    """
+    获取长期复用的符号点击计数
+    """
+    return ClickStore(CLICK_STORE_PATH)
+
+@lru_cache(maxsize=None)
+def get_reranker() -> LocalReranker:
+    """
+    获取长期复用的本地重排器（使用点击计数特征）
+    """
+    return LocalReranker(get_click_store())
+
+def create_embedding_writer() -> EmbeddingBatchWriter:
+    """创建使用共享向量存储的批量嵌入写入器"""
+    return EmbeddingBatchWriter(
+        get_vector_store(),
+        max_batch_size=EMBEDDING_BATCH_SIZE,
+        max_batch_tokens=EMBEDDING_BATCH_TOKENS
+    )
+
+def rebuild_vector_store(
+    db_path: str = SYMBOLS_DB_FILE_PATH,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Optional[int]:
+    """
+    蓝绿重建向量集合：按 SQLite 中的符号重新嵌入到新版本集合，校验后原子切换
+    
+    重建期间搜索继续使用旧集合；新集合的符号数与 SQLite 中带向量ID的符号数一致时才切换，
+    否则抛出 ValueError 并保留旧集合。重建期间不应同时运行索引。
+    
+    参数:
+        db_path: 符号数据库路径
+        progress: 可选，回调 progress(已处理文件数, 文件总数)
+        cancel: 可选，取消事件；在文件之间检查，置位后丢弃新集合，活动集合不变
+    
+    返回:
+        新集合中的符号数；被取消时为 None
+    """
+    live = get_vector_store()
+    staging = live.create_staging()
+    writer = EmbeddingBatchWriter(
+        staging,
+        max_batch_size=EMBEDDING_BATCH_SIZE,
+        max_batch_tokens=EMBEDDING_BATCH_TOKENS
+    )
+    with SymbolDatabase(db_path) as db:
+        files = db.get_all_files()
+        for i, file in enumerate(files):
+            if cancel is not None and cancel.is_set():
+                live.discard_staging(staging)
+                return None
+            relative_path = file["relative_path"] or Path(file["file_path"]).name
+            # 由绝对路径去掉相对路径部分得到项目根目录
+            root = Path(file["file_path"])
+            for _ in Path(relative_path).parts:
+                root = root.parent
+            project = project_id(root)
+            for symbol in db.get_file_symbols(file["file_path"])["symbols"]:
+                doc_id = symbol.pop("vector_store_id")
+                if not doc_id:
+                    continue
+                if symbol["type"] == "module_doc":
+                    symbol["type"] = "module"
+                if "." in symbol["name"] and symbol["type"] in ("method", "attribute", "class"):
+                    symbol["from-class"] = symbol["name"].rsplit(".", 1)[0]
+                queue_symbol(writer, symbol, symbol["name"], doc_id,
+                             symbol_metadata(project, relative_path, symbol))
+            if progress:
+                progress(i + 1, len(files))
+        writer.flush()
+        expected = db.count_vector_ids()
+    live.promote(staging, expected)
+    return expected
+
+def store_symbol(symbol_info: dict,symbol_name:str,doc_id:str=None,metadata:dict=None):
     """
     存储符号及其详细信息到向量数据库
     
     参数:
+        doc_id: 可选，向量ID（由 make_vector_id 生成时重复索引会覆盖而不是新增）
+        metadata: 可选，向量元数据（由 symbol_metadata 生成，查询时可按其过滤）
         symbol_info: 符号信息字典，结构如下:
         {
             "name": str,           # 符号名称
@@ -18,19 +121,62 @@ def store_symbol(symbol_info: dict,symbol_name:str,):
             "annotation": str      # 仅变量/属性，类型注解
         }
     """
-    if symbol_name:
-        symbol_info["name"]=symbol_name
     # 构建符号的完整描述文本
-    description = _build_symbol_description(symbol_info)
+    description = describe_symbol(symbol_info, symbol_name)
     if not description:
         return {"status": "fail", "symbol": symbol_info["name"], "type": symbol_info["type"]}
 
     # 调用向量存储插入函数
-    store = vectorDB.SymbolVectorStore(persist_path = VECTOR_STORE_PATH)
-    id=store.insert_symbol(symbol_info["name"], description)
+    store = get_vector_store()
+    id=store.insert_symbol(symbol_info["name"], description, doc_id, metadata)
     
     return {"status": "success", "symbol": symbol_info["name"], "type": symbol_info["type"],"id":id}
 
+def queue_symbol(writer: EmbeddingBatchWriter, symbol_info: dict, symbol_name: str, doc_id: str = None,
+                 metadata: dict = None):
+    """
+    将符号加入批量嵌入写入器，返回值与 store_symbol 相同
+    
+    嵌入和写入在批次满或 writer.flush() 时进行，返回的ID立即可用于写入SQLite。
+    """
+    description = describe_symbol(symbol_info, symbol_name)
+    if not description:
+        return {"status": "fail", "symbol": symbol_info["name"], "type": symbol_info["type"]}
+
+    id=writer.add(symbol_info["name"], description, metadata=metadata, doc_id=doc_id)
+    return {"status": "success", "symbol": symbol_info["name"], "type": symbol_info["type"],"id":id}
+
+def describe_symbol(symbol_info: dict, symbol_name: str = None) -> Optional[str]:
+    """
+    生成符号的嵌入描述文本（与 store_symbol/queue_symbol 写入的文本一致）
+    
+    参数:
+        symbol_info: 符号信息字典，提供 symbol_name 时其 name 字段被覆盖
+        symbol_name: 可选，限定符号名
+    
+    返回:
+        描述文本；没有可用文档的符号为 None（不生成向量）
+    """
+    if symbol_name:
+        symbol_info["name"]=symbol_name
+    return _build_symbol_description(symbol_info)
+
+def symbol_metadata(project: str, relative_path: str, symbol_info: dict) -> dict:
+    """
+    由符号信息构建向量元数据（项目、相对路径、逐级目录、语言、符号类型、所属类）
+
+    Args:
+        project: 项目标识
+        relative_path: 文件相对项目根目录的路径（posix格式）
+        symbol_info: 符号信息字典（flatten_class_symbols 展平的成员带有 from-class 字段）
+    """
+    return vectorDB.make_vector_metadata(
+        project,
+        relative_path,
+        symbol_type=symbol_info.get("type"),
+        parent_class=symbol_info.get("from-class")
+    )
+
 def _build_symbol_description(symbol_info: dict) -> str:
     """将符号信息转换为描述文本，处理缺失字段"""
     name = symbol_info.get("name", "unnamed_symbol")
@@ -10,8 +10,6 @@ ui= {
         "LABEL_FILE_FILTER": "File Filter",
         "LABEL_FILE_EXTENSIONS": "File Extensions:",
         "DEFAULT_FILE_EXTENSION": "*.py",
-        "LABEL_INDEX_OPTIONS": "Indexing Options",
-        "CHECKBOX_INCLUDE_DOCSTRINGS": "Include Docstrings",
         "STATUS_READY": "Ready",
         "BUTTON_START_INDEXING": "Start Indexing",
         "BUTTON_CANCEL": "Cancel",
@@ -19,6 +17,7 @@ ui= {
         "STATUS_PROCESSING_FILE": "Processing: {filename} ({current}/{total})",
         "STATUS_INDEXING_COMPLETE": "Indexing Complete",
         "STATUS_INDEXING_CANCELED": "Indexing Canceled",
+        "STATUS_CANCELING": "Canceling...",
         "STATUS_INDEXING_ERROR": "Indexing Error",
         "TITLE_ERROR": "Error",
         "MESSAGE_NO_DIRECTORY_SELECTED": "Please select a directory to index",
@@ -27,7 +26,11 @@ ui= {
         "TITLE_COMPLETE": "Complete",
         "MESSAGE_INDEXING_SUCCESS": "Successfully indexed {count} files",
         "ERROR_PROCESSING_FILE": "Error processing file {file}: {error}",
-        "ERROR_INDEXING_FAILED": "Indexing failed: {error}"
+        "ERROR_INDEXING_FAILED": "Indexing failed: {error}",
+        "BUTTON_REBUILD_VECTORS": "Rebuild Vectors",
+        "STATUS_REBUILDING_VECTORS": "Rebuilding vectors in background: {current}/{total} files",
+        "MESSAGE_REBUILD_SUCCESS": "Vector collection rebuilt with {count} symbols",
+        "ERROR_REBUILD_FAILED": "Vector rebuild failed, the previous collection is still in use: {error}"
     },
     "SYMBOL_ANALYZER": {
         "LABEL_TARGET_DIRECTORY": "Target Directory:",
@@ -42,8 +45,10 @@ ui= {
     },
     "SEARCH_PANEL": {
         'search': "Search",
+        'load_more': "Load More",
         'text_search': "Text Search",
         'semantic_search': "Semantic Search",
+        'hybrid_search': "Hybrid Search",
         'name': "Name",
         'type': "Type",
         'location': "Location",
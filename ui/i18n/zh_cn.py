@@ -12,8 +12,6 @@ ui = {
     "LABEL_FILE_FILTER": "文件过滤",
     "LABEL_FILE_EXTENSIONS": "文件扩展名:",
     "DEFAULT_FILE_EXTENSION": "*.py",
-    "LABEL_INDEX_OPTIONS": "索引选项",
-    "CHECKBOX_INCLUDE_DOCSTRINGS": "包含文档字符串",
     "STATUS_READY": "准备就绪",
     "BUTTON_START_INDEXING": "开始索引",
     "BUTTON_CANCEL": "取消",
@@ -21,6 +19,7 @@ ui = {
     "STATUS_PROCESSING_FILE": "正在处理: {filename} ({current}/{total})",
     "STATUS_INDEXING_COMPLETE": "索引完成",
     "STATUS_INDEXING_CANCELED": "索引已取消",
+    "STATUS_CANCELING": "正在取消...",
     "STATUS_INDEXING_ERROR": "索引出错",
     "TITLE_ERROR": "错误",
     "MESSAGE_NO_DIRECTORY_SELECTED": "请选择要索引的目录",
@@ -29,7 +28,11 @@ ui = {
     "TITLE_COMPLETE": "完成",
     "MESSAGE_INDEXING_SUCCESS": "成功索引 {count} 个文件",
     "ERROR_PROCESSING_FILE": "处理文件 {file} 时出错: {error}",
-    "ERROR_INDEXING_FAILED": "索引过程中出错: {error}"
+    "ERROR_INDEXING_FAILED": "索引过程中出错: {error}",
+    "BUTTON_REBUILD_VECTORS": "重建向量",
+    "STATUS_REBUILDING_VECTORS": "正在后台重建向量: {current}/{total} 个文件",
+    "MESSAGE_REBUILD_SUCCESS": "向量集合已重建，共 {count} 个符号",
+    "ERROR_REBUILD_FAILED": "向量重建失败，仍在使用原集合: {error}"
 },
     "SYMBOL_ANALYZER": {
         "LABEL_TARGET_DIRECTORY": "目标目录:",
@@ -44,8 +47,10 @@ ui = {
     },
     "SEARCH_PANEL": {
             'search': "搜索",
+            'load_more': "加载更多",
             'text_search': "文本搜索",
             'semantic_search': "语义搜索",
+            'hybrid_search': "混合搜索",
             'name': "名称",
             'type': "类型",
             'location': "位置",
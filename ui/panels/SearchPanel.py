@@ -1,11 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from db.Sqlite import SymbolDatabase
-from ui.functions.search_function import query_symbols
+from db.query_cache import CachedSymbolDatabase
+from ui.functions.search_function import query_symbols, hybrid_search
+from ui.functions.vector_store import get_click_store
 from ui.core.IPanel import IPanel
 from typing import List, Dict, Any
 import ui.core.i18n as i18n
-from ui.functions.config import SYMBOLS_DB_FILE_PATH 
+from ui.functions.config import SYMBOLS_DB_FILE_PATH, SEARCH_PAGE_SIZE
 
 locale=i18n.display_dict.get("SEARCH_PANEL")
 
@@ -13,9 +14,11 @@ class SearchPanel(IPanel):
     def __init__(self, master):
         super().__init__(master)
         self.master = master
-        self.db = SymbolDatabase(SYMBOLS_DB_FILE_PATH)  # 使用默认数据库路径
+        self.db = CachedSymbolDatabase(SYMBOLS_DB_FILE_PATH)  # 带查询缓存，重建索引后自动失效
         self.frame = ttk.Frame(self.master)
         self.current_results = []
+        self.next_cursor = None
+        self.current_query = None
         
         # 国际化字符串字典
         self.i18n = locale
@@ -41,6 +44,13 @@ class SearchPanel(IPanel):
             command=self.do_search
         )
         
+        self.load_more_button = ttk.Button(
+            self.search_frame,
+            text=self.i18n['load_more'],
+            command=self.load_more,
+            state='disabled'
+        )
+        
         # 搜索选项
         self.search_type = tk.StringVar(value="text")
         self.text_search_radio = ttk.Radiobutton(
@@ -55,6 +65,12 @@ class SearchPanel(IPanel):
             variable=self.search_type,
             value="semantic"
         )
+        self.hybrid_search_radio = ttk.Radiobutton(
+            self.search_frame,
+            text=self.i18n['hybrid_search'],
+            variable=self.search_type,
+            value="hybrid"
+        )
         
         # 结果列表
         self.result_tree = ttk.Treeview(
@@ -91,8 +107,10 @@ class SearchPanel(IPanel):
         self.search_frame.grid(row=0, column=0, sticky='ew', padx=5, pady=5)
         self.search_entry.grid(row=0, column=0, padx=5)
         self.search_button.grid(row=0, column=1, padx=5)
+        self.load_more_button.grid(row=0, column=2, padx=5)
         self.text_search_radio.grid(row=1, column=0, sticky='w')
         self.semantic_search_radio.grid(row=1, column=1, sticky='w')
+        self.hybrid_search_radio.grid(row=1, column=2, sticky='w')
         
         # 结果和详情布局
         self.result_tree.grid(row=1, column=0, sticky='nsew', padx=5)
@@ -111,11 +129,19 @@ class SearchPanel(IPanel):
         
         try:
             if self.search_type.get() == "text":
-                # 文本搜索（支持模糊匹配）
-                self.current_results = self.db.search_symbols_by_name(query)
+                # 文本搜索（支持模糊匹配），按页加载
+                page = self.db.search_symbols_page(query, page_size=SEARCH_PAGE_SIZE)
+                self.current_query = query
+                self.current_results = page["results"]
+                self.next_cursor = page["next_cursor"]
+            elif self.search_type.get() == "hybrid":
+                # 词法 + 语义混合搜索（RRF融合）
+                self.current_results = hybrid_search(query, self.db, top_k=20)
+                self.next_cursor = None
             else:
-                # 语义向量搜索
-                self.current_results = query_symbols(query, top_k=10)
+                # 语义向量搜索（取回更多候选后本地重排）
+                self.current_results = query_symbols(query, top_k=10, rerank=True, db=self.db)
+                self.next_cursor = None
             
             self.display_results()
         except Exception as e:
@@ -124,12 +150,32 @@ class SearchPanel(IPanel):
                 self.i18n['search_error'].format(error=str(e))
             )
 
+    def load_more(self):
+        """加载文本搜索的下一页结果"""
+        if not self.next_cursor:
+            return
+        try:
+            page = self.db.search_symbols_page(
+                self.current_query, page_size=SEARCH_PAGE_SIZE, cursor=self.next_cursor
+            )
+        except Exception as e:
+            messagebox.showerror(
+                self.i18n['error'], 
+                self.i18n['search_error'].format(error=str(e))
+            )
+            return
+        start = len(self.current_results)
+        self.current_results.extend(page["results"])
+        self.next_cursor = page["next_cursor"]
+        self.append_results(start)
+
     def display_results(self):
         """显示搜索结果"""
         self.result_tree.delete(*self.result_tree.get_children())
         
         # 收集所有可能的字段名（按字母排序保证列顺序一致）
         all_keys = sorted({key for symbol in self.current_results for key in symbol.keys()})
+        self.result_columns = all_keys
 
         # 配置Treeview列（假设第一个字段是symbol_name作为主列）
         self.result_tree["columns"] = all_keys[:]  # 排除主列
@@ -142,19 +188,24 @@ class SearchPanel(IPanel):
             self.result_tree.column(col, width=100, stretch=True)  # 可拉伸列
 
         # 插入数据
-        for i,symbol in enumerate(self.current_results):
-            # 按all_keys顺序获取值，未找到字段则填空字符串
-            row_values = [symbol.get(key, '') for key in all_keys[:]]
+        self.append_results(0)
+                
+        # 绑定选择事件
+        self.result_tree.bind('<<TreeviewSelect>>', self.show_details)
+
+    def append_results(self, start: int):
+        """将 current_results 中从 start 开始的结果追加到列表"""
+        for i, symbol in enumerate(self.current_results[start:], start):
+            # 按列顺序获取值，未找到字段则填空字符串
+            row_values = [symbol.get(key, '') for key in self.result_columns]
             
             self.result_tree.insert(
                 '', 'end',
-                text=str(i),  # 主列显示symbol_name
+                text=str(i),  # 主列显示结果序号
                 values=tuple(row_values),  # 所有其他字段值
                 # tags=(symbol.get('symbol_type', '')),
             )
-                
-        # 绑定选择事件
-        self.result_tree.bind('<<TreeviewSelect>>', self.show_details)
+        self.load_more_button.config(state='normal' if self.next_cursor else 'disabled')
 
     def show_details(self, event):
         """显示选中符号的详细信息"""
@@ -167,6 +218,10 @@ class SearchPanel(IPanel):
         symbol_info = self.current_results[int(symbol_index)]
         if not symbol_info:
             return
+        # 点击次数作为语义搜索重排的特征
+        vector_id = symbol_info.get('vector_store_id') or symbol_info.get('id')
+        if vector_id:
+            get_click_store().record(vector_id)
             
         self.detail_text.config(state='normal')
         self.detail_text.delete(1.0, tk.END)
@@ -1,10 +1,10 @@
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
-from ui.functions.vector_store import store_symbol
-from db.Sqlite import SymbolDatabase
-from symbol.file_utils import scan_directory
-from symbol.symbols import find_exported_symbols_with_doc, flatten_class_symbols
+from indexer.pipeline import IndexingPipeline
+from ui.functions.vector_store import rebuild_vector_store
 import ui.core.i18n as i18n
 from ui.functions.config import SYMBOLS_DB_FILE_PATH 
 
@@ -66,22 +66,6 @@ class IndexingPanel:
         self.filter_entry.insert(0, locale["DEFAULT_FILE_EXTENSION"])
         self.filter_entry.grid(row=1, column=0, sticky=tk.EW)
         
-        # 索引选项
-        self.options_frame = ttk.LabelFrame(
-            self.frame, 
-            text=locale["LABEL_INDEX_OPTIONS"], 
-            padding=10
-        )
-        self.options_frame.pack(fill=tk.X, padx=5, pady=5)
-        
-        self.include_docs = tk.BooleanVar(value=True)
-        self.docs_check = ttk.Checkbutton(
-            self.options_frame, 
-            text=locale["CHECKBOX_INCLUDE_DOCSTRINGS"],
-            variable=self.include_docs
-        )
-        self.docs_check.grid(row=0, column=0, sticky=tk.W)
-        
         # 进度条
         self.progress_frame = ttk.Frame(self.frame)
         self.progress_frame.pack(fill=tk.X, padx=5, pady=10)
@@ -113,12 +97,20 @@ class IndexingPanel:
         )
         self.cancel_button.pack(side=tk.LEFT, padx=5)
         
+        self.rebuild_button = ttk.Button(
+            self.button_frame, 
+            text=locale["BUTTON_REBUILD_VECTORS"], 
+            command=self.start_rebuild
+        )
+        self.rebuild_button.pack(side=tk.LEFT, padx=5)
+        
         # 配置网格权重
         self.dir_frame.columnconfigure(0, weight=1)
         self.filter_frame.columnconfigure(0, weight=1)
         
         # 初始化状态
         self.is_indexing = False
+        self._cancel_event = None
         
     def browse_directory(self):
         """打开目录选择对话框"""
@@ -128,7 +120,7 @@ class IndexingPanel:
             self.dir_entry.insert(0, dir_path)
     
     def start_indexing(self):
-        """开始索引过程"""
+        """在后台线程中索引目录，进度经队列传回主线程"""
         if self.is_indexing:
             return
             
@@ -141,95 +133,154 @@ class IndexingPanel:
                 locale["MESSAGE_NO_DIRECTORY_SELECTED"]
             )
             return
-            
-        try:
-            self.is_indexing = True
-            self.index_button.config(state=tk.DISABLED)
-            self.status_label.config(text=locale["STATUS_SCANNING_DIRECTORY"])
-            self.master.update()
-            
-            # 扫描目录
-            files = scan_directory(dir_path, file_filter)
-            total_files = len(files)
-            
-            if not total_files:
-                messagebox.showinfo(
-                    locale["TITLE_INFO"],
-                    locale["MESSAGE_NO_MATCHING_FILES"]
-                )
-                return
-                
-            self.progress["maximum"] = total_files
-            self.progress["value"] = 0
-            
-            # 处理每个文件
-            for i, file_path in enumerate(files):
-                if not self.is_indexing:
-                    break
-                    
-                # 更新状态文本
-                status_text = locale["STATUS_PROCESSING_FILE"].format(
-                    filename=Path(file_path).name,
-                    current=i+1,
-                    total=total_files
-                )
-                self.status_label.config(text=status_text)
-                self.progress["value"] = i + 1
-                self.master.update()
-                
-                try:
-                    # 提取符号
-                    symbols = find_exported_symbols_with_doc(file_path, self.include_docs.get())
-                    flatten_class_symbols(symbols)
-                    
-                    vector_ids=[]
-                    # 存储到向量数据库
-                    for name, detail in symbols:
-                        result = store_symbol(detail, name)
-                        if result.get("status") == "success":
-                            # 将存储的符号信息添加到向量ID列表
-                            vector_ids.append((name, result["id"]))
-                        else:
-                            print(locale["ERROR_PROCESSING_FILE"].format(
-                                file=file_path, 
-                                error= name
-                            ))
-
-                    # 存储到数据库
-                    relative_path = Path(file_path).relative_to(dir_path).as_posix()
-                    with SymbolDatabase(SYMBOLS_DB_FILE_PATH) as db:
-                        db.upsert_file_symbols(file_path, symbols,vector_ids, relative_path)
-                        
-                except Exception as e:
-                    # 记录错误但不中断整个索引过程
-                    print(locale["ERROR_PROCESSING_FILE"].format(
-                        file=file_path, 
-                        error=str(e.with_traceback(e.args)))
-                    )
-            
-            if self.is_indexing:
-                messagebox.showinfo(
-                    locale["TITLE_COMPLETE"],
-                    locale["MESSAGE_INDEXING_SUCCESS"].format(count=total_files)
-                )
-                self.status_label.config(text=locale["STATUS_INDEXING_COMPLETE"])
-            
-        except Exception as e:
+        
+        self.is_indexing = True
+        self.index_button.config(state=tk.DISABLED)
+        self.rebuild_button.config(state=tk.DISABLED)
+        self.status_label.config(text=locale["STATUS_SCANNING_DIRECTORY"])
+        self.progress["value"] = 0
+        self._cancel_event = threading.Event()
+        self._events = queue.Queue()
+        
+        def run():
+            try:
+                IndexingPipeline(
+                    dir_path,
+                    db_path=SYMBOLS_DB_FILE_PATH,
+                    include=[file_filter or "*"],
+                    progress=self._events.put,
+                    cancel=self._cancel_event
+                ).run()
+            except Exception as e:
+                self._events.put({"event": "failed", "error": str(e)})
+        
+        threading.Thread(target=run, daemon=True, name="indexing").start()
+        self._poll_indexing()
+    
+    def _poll_indexing(self):
+        """
+        在主线程中取出全部进度事件（Tk 控件只能在主线程更新）
+        
+        每次轮询只按最后一个文件事件重绘一次，重绘频率与索引吞吐无关。
+        """
+        latest = None
+        finished = None
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event["event"]
+            if kind == "scan":
+                self.progress["maximum"] = max(event["files"] - event["skipped"] - event["resumed"], 1)
+            elif kind == "file":
+                latest = event
+            elif kind == "error":
+                print(locale["ERROR_PROCESSING_FILE"].format(file=event["path"], error=event["error"]))
+            elif kind in ("done", "failed"):
+                finished = event
+        
+        if latest is not None and not self._cancel_event.is_set():
+            self.progress["value"] = latest["current"]
+            self.status_label.config(text=locale["STATUS_PROCESSING_FILE"].format(
+                filename=Path(latest["path"]).name,
+                current=latest["current"],
+                total=latest["total"]
+            ))
+        if finished is None:
+            self.master.after(100, self._poll_indexing)
+            return
+        
+        self.is_indexing = False
+        self.index_button.config(state=tk.NORMAL)
+        self.rebuild_button.config(state=tk.NORMAL)
+        if finished["event"] == "failed":
             messagebox.showerror(
                 locale["TITLE_ERROR"],
-                locale["ERROR_INDEXING_FAILED"].format(error=str(e))
+                locale["ERROR_INDEXING_FAILED"].format(error=finished["error"])
             )
             self.status_label.config(text=locale["STATUS_INDEXING_ERROR"])
-            
-        finally:
-            self.is_indexing = False
-            self.index_button.config(state=tk.NORMAL)
+        elif finished["canceled"]:
+            self.status_label.config(text=locale["STATUS_INDEXING_CANCELED"])
+        elif not finished["files"]:
+            self.status_label.config(text=locale["STATUS_READY"])
+            messagebox.showinfo(
+                locale["TITLE_INFO"],
+                locale["MESSAGE_NO_MATCHING_FILES"]
+            )
+        else:
+            self.status_label.config(text=locale["STATUS_INDEXING_COMPLETE"])
+            messagebox.showinfo(
+                locale["TITLE_COMPLETE"],
+                locale["MESSAGE_INDEXING_SUCCESS"].format(count=finished["indexed"])
+            )
     
-    def cancel_indexing(self):
-        """取消索引过程"""
+    def start_rebuild(self):
+        """在后台线程中蓝绿重建向量集合（期间语义搜索继续使用旧集合）"""
         if self.is_indexing:
-            self.is_indexing = False
+            return
+        self.is_indexing = True
+        self.index_button.config(state=tk.DISABLED)
+        self.rebuild_button.config(state=tk.DISABLED)
+        self._rebuild_state = {"current": 0, "total": 0, "result": None, "error": None, "done": False}
+        # 取消按钮对重建同样有效（不能沿用上一次索引的取消事件）
+        self._cancel_event = threading.Event()
+        cancel = self._cancel_event
+        
+        def progress(current, total):
+            self._rebuild_state.update(current=current, total=total)
+        
+        def run():
+            try:
+                self._rebuild_state["result"] = rebuild_vector_store(SYMBOLS_DB_FILE_PATH, progress, cancel)
+            except Exception as e:
+                self._rebuild_state["error"] = e
+            finally:
+                self._rebuild_state["done"] = True
+        
+        threading.Thread(target=run, daemon=True, name="vector-rebuild").start()
+        self._poll_rebuild()
+    
+    def _poll_rebuild(self):
+        """在主线程中轮询重建进度（Tk 控件只能在主线程更新）"""
+        state = self._rebuild_state
+        if not state["done"]:
+            if not self._cancel_event.is_set():
+                self.progress["maximum"] = max(state["total"], 1)
+                self.progress["value"] = state["current"]
+                self.status_label.config(text=locale["STATUS_REBUILDING_VECTORS"].format(
+                    current=state["current"], total=state["total"]
+                ))
+            self.master.after(200, self._poll_rebuild)
+            return
+        self.is_indexing = False
+        self.index_button.config(state=tk.NORMAL)
+        self.rebuild_button.config(state=tk.NORMAL)
+        if state["error"] is not None:
+            self.status_label.config(text=locale["STATUS_INDEXING_ERROR"])
+            messagebox.showerror(
+                locale["TITLE_ERROR"],
+                locale["ERROR_REBUILD_FAILED"].format(error=str(state["error"]))
+            )
+        elif state["result"] is None:
             self.status_label.config(text=locale["STATUS_INDEXING_CANCELED"])
+        else:
+            self.status_label.config(text=locale["STATUS_INDEXING_COMPLETE"])
+            messagebox.showinfo(
+                locale["TITLE_COMPLETE"],
+                locale["MESSAGE_REBUILD_SUCCESS"].format(count=state["result"])
+            )
+    
+    def cancel_indexing(self):
+        """
+        取消索引或向量重建
+        
+        索引时各阶段丢弃尚未处理的文件，下次索引同一目录时从检查点继续；
+        重建时在下一个文件前停止并丢弃新集合。
+        """
+        if self.is_indexing and self._cancel_event is not None:
+            self._cancel_event.set()
+            self.status_label.config(text=locale["STATUS_CANCELING"])
     
     def get_frame(self):
         """返回面板框架"""